@@ -27,7 +27,7 @@ experiment = Experiment([simulation])
 # Configure Simulation & Experiment engine
 simulation.engine = experiment.engine
 # experiment.engine.backend = Backend.SINGLE_PROCESS
-experiment.engine.deepcopy = True
+experiment.engine.deepcopy = False
 experiment.engine.drop_substeps = True
 experiment.engine.raise_exceptions = True
 
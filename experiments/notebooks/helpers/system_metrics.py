@@ -401,27 +401,110 @@ def calculate_VaR(df, state_variable, alpha, timesteps):
                 final_value = df_run[state_variable].iloc[-1]
                 q = returns.quantile(1 - alpha)
                 value_at_risk = abs(final_value * q) * np.sqrt(timesteps)
+                weight = get_likelihood_ratio_weight(df_run)
 
-                result = pd.DataFrame({'simulation': [simulation], 'subset': [subset], 'run': [run], 'VaR': [value_at_risk], 'q': [q]})
+                result = pd.DataFrame({'simulation': [simulation], 'subset': [subset], 'run': [run], 'VaR': [value_at_risk], 'q': [q], 'weight': [weight]})
                 results = pd.concat([results, result])
 
     return results.reset_index(drop=True)
 
 
 def calculate_VaR_threshold_probability(df, threshold):
+    """
+    Estimate the probability of the per-run VaR return quantile `q` (see `calculate_VaR(...)`) being at or above a threshold,
+    weighting runs by their importance sampling likelihood ratio weight, and the standard error of the estimate.
+    """
     results = pd.DataFrame()
     
     for subset in df.subset.unique():
         df_subset = df.query("subset == @subset")
         
         df_threshold = df_subset["q"] >= threshold
-        probability = df_threshold.sum() / len(df_threshold)
+        probability, standard_error = estimate_weighted_probability(df_threshold, df_subset.get("weight"))
         
-        result = pd.DataFrame({'subset': [subset], 'threshold': [threshold], 'probability': [probability]})
+        result = pd.DataFrame({'subset': [subset], 'threshold': [threshold], 'probability': [probability], 'standard_error': [standard_error]})
         results = pd.concat([results, result])
     
     return results.reset_index(drop=True)
 
+
+# +
+# importance sampling
+# -
+
+def get_likelihood_ratio_weight(df_run):
+    """Get the importance sampling likelihood ratio weight of a run, 1 if the run is not importance sampled"""
+    if 'likelihood_ratio_weight' not in df_run:
+        return 1.0
+    return df_run['likelihood_ratio_weight'].iloc[0]
+
+
+def estimate_weighted_probability(events, weights=None):
+    """
+    Estimate the probability of an event from a boolean indicator per run, as the weighted mean `mean(weights * events)`,
+    an unbiased estimate under importance sampling, and the standard error of the estimate.
+    """
+    events = np.asarray(events, dtype=float)
+    weights = np.ones_like(events) if weights is None else np.asarray(weights, dtype=float)
+    weighted_events = weights * events
+
+    probability = weighted_events.mean()
+    standard_error = weighted_events.std(ddof=1) / np.sqrt(len(events)) if len(events) > 1 else np.nan
+
+    return probability, standard_error
+
+
+def calculate_weighted_quantile(values, weights, q):
+    """Calculate the q-quantile of values, weighting each value by its importance sampling likelihood ratio weight"""
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    order = np.argsort(values)
+    cumulative_weights = np.cumsum(weights[order]) / weights.sum()
+    index = min(np.searchsorted(cumulative_weights, q), len(values) - 1)
+
+    return values[order][index]
+
+
+def calculate_threshold_probability(df, variable, threshold, below=True):
+    """
+    Estimate the probability, for each subset, of a State Variable crossing a threshold at any timestep of a run,
+    e.g. `collateralization_ratio` falling below 1, weighting runs by their importance sampling likelihood ratio weight.
+    """
+    results = pd.DataFrame()
+
+    for subset in df.subset.unique():
+        df_subset = df.query("subset == @subset")
+        df_runs = df_subset.groupby('run')
+        events = (df_runs[variable].min() < threshold) if below else (df_runs[variable].max() > threshold)
+        weights = df_runs.apply(get_likelihood_ratio_weight)
+        probability, standard_error = estimate_weighted_probability(events, weights)
+
+        result = pd.DataFrame({'subset': [subset], 'variable': [variable], 'threshold': [threshold], 'probability': [probability], 'standard_error': [standard_error]})
+        results = pd.concat([results, result])
+
+    return results.reset_index(drop=True)
+
+
+def calculate_weighted_VaR(df, state_variable, alpha):
+    """
+    Calculate the VaR of a State Variable at confidence level alpha for each subset,
+    as the alpha-quantile of the loss from the initial to the final value across runs,
+    weighting runs by their importance sampling likelihood ratio weight.
+    """
+    results = pd.DataFrame()
+
+    for subset in df.subset.unique():
+        df_subset = df.query("subset == @subset")
+        df_runs = df_subset.groupby('run')
+        losses = df_runs[state_variable].first() - df_runs[state_variable].last()
+        weights = df_runs.apply(get_likelihood_ratio_weight)
+        value_at_risk = calculate_weighted_quantile(losses, weights, alpha)
+
+        result = pd.DataFrame({'subset': [subset], 'alpha': [alpha], 'VaR': [value_at_risk]})
+        results = pd.concat([results, result])
+
+    return results.reset_index(drop=True)
+
 def get_data_to_plot(df, df_var, run, subset):
     pcv_ret = df.query('run == @run and subset == @subset')['total_pcv'].pct_change()
     var = df_var.query('run == @run and subset == @subset')['VaR'].iloc[0]
@@ -506,3 +589,66 @@ def make_PCVaR_plot(df, df_var, max_rows):
     fig.show()
 
 
+# +
+# variance reduction
+# -
+
+def get_values_at_timestep(df, timestep=-1):
+    timestep = df['timestep'].max() if timestep == -1 else timestep
+    return df.query('timestep == @timestep')
+
+
+def estimate_mean_standard_error(df, variable, sampling_method='monte_carlo', timestep=-1, replication_key='subset'):
+    """
+    Estimate the mean of a variable across runs at a given timestep, and the standard error of the estimate,
+    for a given `sampling_method` System Parameter (see `model.stochastic_processes.sampling_methods`):
+    * monte_carlo: from the independent runs
+    * antithetic: from the independent antithetic pairs of runs (1, 2), (3, 4), ...
+    * sobol: from the independent scrambled Sobol replications, e.g. the subsets of a `seed` parameter sweep
+    """
+    df_ = get_values_at_timestep(df, timestep)
+    runs = len(df_)
+
+    if sampling_method == 'antithetic':
+        samples = df_.groupby(['subset', (df_['run'] + 1) // 2])[variable].mean()
+    elif sampling_method == 'sobol':
+        samples = df_.groupby(replication_key)[variable].mean()
+        assert len(samples) > 1, 'At least two independent Sobol replications are required'
+    else:
+        samples = df_[variable]
+
+    mean = samples.mean()
+    standard_error = samples.std(ddof=1) / np.sqrt(len(samples))
+
+    return mean, standard_error, runs
+
+
+def compute_variance_reduction(df_monte_carlo, df_reduced, variables, sampling_method, timestep=-1, replication_key='subset'):
+    """
+    Compare the variance of the mean estimates of each variable, e.g. `collateralization_ratio` and `protocol_profit`,
+    between plain Monte Carlo runs and runs using a variance reduction `sampling_method`.
+
+    The variance reduction factor is the ratio of the estimator variances per run,
+    i.e. the factor by which fewer runs are required to reach the same confidence interval as plain Monte Carlo.
+    """
+    results = []
+
+    for variable in variables:
+        mean_mc, standard_error_mc, runs_mc = estimate_mean_standard_error(
+            df_monte_carlo, variable, 'monte_carlo', timestep)
+        mean, standard_error, runs = estimate_mean_standard_error(
+            df_reduced, variable, sampling_method, timestep, replication_key)
+
+        results.append({
+            'variable': variable,
+            'sampling_method': sampling_method,
+            'mean_monte_carlo': mean_mc,
+            'standard_error_monte_carlo': standard_error_mc,
+            'runs_monte_carlo': runs_mc,
+            'mean': mean,
+            'standard_error': standard_error,
+            'runs': runs,
+            'variance_reduction_factor': (standard_error_mc**2 * runs_mc) / (standard_error**2 * runs),
+        })
+
+    return pd.DataFrame(results)
@@ -3,7 +3,8 @@ import numpy as np
 from radcad.core import generate_parameter_sweep
 
 from model.system_parameters import parameters, Parameters, pcv_deposit_keys, user_deposit_keys
-from model.types import PCVDeposit, UserDeposit
+from model.types import PCVDeposit, UserDeposit, LiquidityPoolRegistry
+from model.state_update_blocks import lookbacks
 
 
 def assign_parameters(df: pd.DataFrame, parameters: Parameters, set_params=[]):
@@ -27,21 +28,40 @@ def post_process(df: pd.DataFrame, drop_timestep_zero=True, parameters=parameter
         'target_stable_pcv_ratio',
         'target_rebalancing_condition',
         'rebalancing_period',
+        'pcv_rebalancing_execution_duration',
+        'pcv_rebalancing_slippage_threshold',
     ])
 
     # Set DataFrame index
     df = df.set_index("timestamp", drop=False)
 
     # Disaggregate PCV Deposit State Variables
-    for key in pcv_deposit_keys:
+    # NOTE Deposit State Variables are already disaggregated by the batched engine, see `model.batch.engine`
+    for key in [key for key in pcv_deposit_keys if key in df]:
         for variable in PCVDeposit(asset="", deposit_location="").__dict__.keys():
             df[key + ('_' if not variable.startswith('_') else '') + variable] = df.apply(lambda row: getattr(row[key], variable), axis=1)
     # Disaggregate User Deposit State Variables
-    for key in user_deposit_keys:
+    for key in [key for key in user_deposit_keys if key in df]:
         for variable in UserDeposit(asset="", deposit_location="").__dict__.keys():
             df[key + ('_' if not variable.startswith('_') else '') + variable] = df.apply(lambda row: getattr(row[key], variable), axis=1)
     # Remove Deposit instances from state
-    df = df.drop(pcv_deposit_keys + user_deposit_keys, axis=1)
+    df = df.drop([key for key in pcv_deposit_keys + user_deposit_keys if key in df], axis=1)
+    # Disaggregate Liquidity Pool Registry State Variable
+    # NOTE The registry is already disaggregated by the batched engine, see `model.batch.engine`
+    # NOTE Pools may differ between parameter sweep subsets, with fields of absent pools set to NaN
+    if "liquidity_pool_registry" in df:
+        registries = df["liquidity_pool_registry"]
+        pool_index = {key: index for index, key in enumerate(dict.fromkeys(key for registry in registries for key in registry.keys))}
+        data = np.full((len(df), len(LiquidityPoolRegistry.fields), len(pool_index)), np.nan)
+        for row, registry in enumerate(registries):
+            data[row][:, [pool_index[key] for key in registry.keys]] = registry.data
+        df = pd.concat([df.drop("liquidity_pool_registry", axis=1), pd.DataFrame({
+            pool_key + '_' + field: data[:, field_index, index]
+            for pool_key, index in pool_index.items()
+            for field_index, field in enumerate(LiquidityPoolRegistry.fields)
+        }, index=df.index)], axis=1)
+    # Remove State History from state, see `model.utils.lookback(...)`
+    df = df.drop([lookback.key for lookback in lookbacks if lookback.key in df], axis=1)
 
     # Calculate metrics
     df["pcv_yield_ratio"] = df["pcv_yield"] / df["total_user_circulating_fei"] * 365 / df["dt"]
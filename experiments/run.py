@@ -5,6 +5,7 @@ import time
 
 from experiments.default_experiment import experiment
 from experiments.post_processing import post_process
+import model.batch.engine as batch_engine
 
 # Configure logging framework
 # e.g. Use logging.debug(...) to log to log file
@@ -43,6 +44,34 @@ def run(executable=experiment):
     return df, executable.exceptions
 
 
+def run_batched(executable=experiment):
+    """
+    Run an experiment using the batched engine, where all Monte Carlo runs of a subset are executed at once.
+    See `model.batch` for details.
+    """
+    logging.info("Running experiment (batched)")
+    start_time = time.time()
+
+    df = batch_engine.run(executable)
+
+    experiment_duration = time.time() - start_time
+    logging.info(f"Experiment complete in {experiment_duration} seconds")
+
+    logging.info("Post-processing results")
+
+    try:
+        parameters = executable.simulations[0].model.params
+    except:
+        parameters = executable.model.params
+
+    df = post_process(df.copy(), parameters=parameters)
+
+    post_processing_duration = time.time() - start_time - experiment_duration
+    logging.info(f"Post-processing complete in {post_processing_duration} seconds")
+
+    return df, executable.exceptions
+
+
 if __name__ == '__main__':
     df, _exceptions = run()
     print(df)
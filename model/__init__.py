@@ -6,6 +6,7 @@ __version__ = "0.0.0"
 from radcad import Model
 
 from model.system_parameters import parameters
+from model.state_cloner import StateDict
 
 # from model.state_variables import initial_state
 from model.state_update_blocks import state_update_blocks
@@ -15,6 +16,7 @@ from model.state_update_blocks import state_update_blocks
 model = Model(
     params=parameters,
     # Initial state is configured in the initialization.py module
-    initial_state={},  # initial_state
+    # NOTE StateDict copies the State Variables using a cloner specialised for the State Schema, see `model.state_cloner`
+    initial_state=StateDict(),  # initial_state
     state_update_blocks=state_update_blocks,
 )
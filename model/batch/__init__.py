@@ -0,0 +1,7 @@
+"""# Batched Monte Carlo Execution
+A batched execution mode for the model, where the State Variables of all Monte Carlo runs of a subset
+are stored as `(runs,)` shaped Numpy arrays, and each State Update Block in `model.state_update_blocks`
+has an equivalent array kernel in `model.batch.kernels` that advances every run at once.
+
+See `model.batch.engine` for how to execute a radCAD `Experiment` or `Simulation` using the batched engine.
+"""
@@ -0,0 +1,268 @@
+"""# Batched Engine
+A minimal simulation engine that executes all Monte Carlo runs of each parameter subset of a radCAD `Experiment` or `Simulation` at once,
+using the array kernels defined in `model.batch.kernels`.
+
+The Initial State of each run is configured using the same radCAD `before_subset` hook as the default radCAD engine
+(see `model.initialization.setup_initial_state(...)`), before being stacked into `(runs,)` shaped arrays.
+
+The results are returned as a Pandas DataFrame in the same row order as the radCAD engine with `drop_substeps=True`,
+with Deposit and Liquidity Pool Registry State Variables already disaggregated into the columns created in `experiments.post_processing.post_process(...)`.
+
+As in the radCAD engine, a run that fails with an exception returns partial results up to the last completed timestep,
+and the exception of each run is recorded in the `exceptions` attribute of the executable,
+unless the engine is configured to raise exceptions (`Engine.raise_exceptions`).
+"""
+
+import copy
+import logging
+import traceback
+from numbers import Number
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from radcad import Context, Experiment, Simulation
+from radcad.core import generate_parameter_sweep
+
+from model.types import Deposit, DepositLedger, FrozenDeposit, LiquidityPoolRegistry, RingBuffer
+import model.batch.kernels as kernels
+
+
+def stack_initial_states(initial_states: List[dict]) -> dict:
+    """## Stack Initial States
+    Stack the Initial State of each Monte Carlo run into a single batched state,
+    where numerical State Variables become `(runs,)` shaped arrays, all Deposits are stored in a single `DepositLedger` State Variable `deposit_ledger`,
+    the `LiquidityPoolRegistry` State Variable arrays have shape `(pools, runs)`,
+    State History `RingBuffer` values have shape `(*value shape, runs)`, and all other State Variables (e.g. lists of State Variable keys) are shared between runs.
+    """
+    state = {
+        "deposit_ledger": DepositLedger.stack(
+            [
+                DepositLedger(
+                    {
+                        key: value
+                        for key, value in initial_state.items()
+                        if isinstance(value, (Deposit, FrozenDeposit))
+                    }
+                )
+                for initial_state in initial_states
+            ]
+        )
+    }
+    for key, value in initial_states[0].items():
+        values = [initial_state[key] for initial_state in initial_states]
+        if isinstance(value, (Deposit, FrozenDeposit)):
+            continue
+        elif isinstance(value, Number) and not isinstance(value, bool):
+            state[key] = np.array(values, dtype=float)
+        elif isinstance(value, np.ndarray):
+            state[key] = np.stack(values)
+        elif isinstance(value, LiquidityPoolRegistry):
+            state[key] = LiquidityPoolRegistry.stack(values)
+        elif isinstance(value, RingBuffer):
+            # State History with values of shape `(*value shape, runs)`
+            history = value.__class__(window=value.window)
+            for history_values in np.stack([history.to_array() for history in values], axis=-1):
+                history = history.append(history_values)
+            state[key] = history
+        else:
+            state[key] = value
+    return state
+
+
+def select_runs(state: dict, index: np.ndarray) -> dict:
+    """## Select Runs
+    Select the Monte Carlo runs at the batch indices passed from a batched state, see `stack_initial_states(...)`.
+    """
+    runs = len(state["run"])
+    selected_state = {}
+    for key, value in state.items():
+        if isinstance(value, (DepositLedger, LiquidityPoolRegistry)):
+            data = value.data[..., index]
+            value = value.copy()
+            value.data = data
+        elif isinstance(value, RingBuffer):
+            value = value.select(index)
+        elif isinstance(value, np.ndarray) and value.ndim and len(value) == runs:
+            value = value[index]
+        selected_state[key] = value
+    return selected_state
+
+
+def run_subset(
+    initial_state: dict,
+    params: dict,
+    timesteps: int,
+    state_update_blocks=kernels.state_update_blocks,
+    raise_exceptions: bool = True,
+) -> Tuple[List[dict], Dict[int, Tuple[Exception, str]]]:
+    """## Run Subset
+    Execute all Monte Carlo runs of a parameter subset, given a batched Initial State (see `stack_initial_states(...)`),
+    returning the batched state history with one entry for each timestep, including the Initial State.
+
+    When a kernel raises `model.batch.kernels.RunExceptions`, the failed runs are no longer updated,
+    and the timestep is executed again for the remaining runs, so that each entry of the state history
+    only includes the runs that completed the timestep. Unless `raise_exceptions` is set, in which case the exception is raised.
+
+    Returns:
+        A tuple of the batched state history, and the exception and traceback of each failed run by `run` State Variable
+    """
+    state = {**initial_state, "substep": 0, "timestep": 0}
+    state_history = [state]
+    exceptions = {}
+
+    for timestep in range(timesteps):
+        previous_state = state
+        while len(previous_state["run"]):
+            # NOTE Kernels update the Deposit ledger in place, so a copy is made for each timestep
+            state = {**previous_state, "deposit_ledger": previous_state["deposit_ledger"].copy()}
+            try:
+                for substep, kernel in enumerate(state_update_blocks):
+                    updates = kernel(params, substep, state_history, state)
+                    # NOTE Timestep is updated after each State Update Block, as in radCAD
+                    state = {**state, **updates, "substep": substep + 1, "timestep": timestep + 1}
+                break
+            except kernels.RunExceptions as run_exceptions:
+                if raise_exceptions:
+                    raise run_exceptions.exceptions[min(run_exceptions.exceptions)]
+                runs = previous_state["run"]
+                for index, exception in run_exceptions.exceptions.items():
+                    logging.warning(
+                        f"Run {runs[index]} failed at timestep {timestep + 1}: {exception!r}"
+                    )
+                    exceptions[int(runs[index])] = (exception, traceback.format_exc())
+                # Stop updating the failed runs, and execute the timestep again for the remaining runs
+                previous_state = select_runs(
+                    previous_state,
+                    np.setdiff1d(np.arange(len(runs)), list(run_exceptions.exceptions)),
+                )
+        else:
+            # All runs failed
+            break
+        state_history.append(state)
+
+    return state_history, exceptions
+
+
+def state_history_to_dataframe(state_history: List[dict]) -> pd.DataFrame:
+    """## State History to DataFrame
+    Convert a batched state history into a DataFrame with one row for each run and timestep, ordered by run and then timestep.
+    Failed runs only have rows up to the last completed timestep, see `run_subset(...)`.
+    """
+    runs = [len(state["run"]) for state in state_history]
+    # Rows are collected by timestep and then run, and ordered by run and then timestep
+    order = np.argsort(np.concatenate([state["run"] for state in state_history]), kind="stable")
+    columns = {}
+
+    def add_column(key, values):
+        if isinstance(values[-1], np.ndarray) and values[-1].ndim and len(values[-1]) == runs[-1]:
+            if values[-1].ndim == 1:
+                # Per-run scalar State Variable
+                columns[key] = np.concatenate(values)[order]
+            else:
+                # Per-run array State Variable e.g. `capital_allocation_target_weights`
+                rows = [row for value in values for row in value]
+                columns[key] = [rows[row] for row in order]
+        else:
+            # Shared State Variable
+            rows = [value for value, count in zip(values, runs) for _ in range(count)]
+            columns[key] = [rows[row] for row in order]
+
+    for key, value in state_history[0].items():
+        if isinstance(value, DepositLedger):
+            # Disaggregate Deposits: see `experiments.post_processing.post_process(...)` for naming convention
+            for index, deposit_key in enumerate(value.keys):
+                columns[deposit_key + "_asset"] = value.assets[index]
+                columns[deposit_key + "_deposit_location"] = value.deposit_locations[index]
+                for field_index, field in enumerate(DepositLedger.fields):
+                    add_column(
+                        deposit_key + "_" + field,
+                        [state[key].data[field_index, index] for state in state_history],
+                    )
+        elif isinstance(value, LiquidityPoolRegistry):
+            # Disaggregate Liquidity Pools: see `experiments.post_processing.post_process(...)` for naming convention
+            for index, pool_key in enumerate(value.keys):
+                for field_index, field in enumerate(LiquidityPoolRegistry.fields):
+                    add_column(
+                        pool_key + "_" + field,
+                        [state[key].data[field_index, index] for state in state_history],
+                    )
+        else:
+            add_column(key, [state[key] for state in state_history])
+
+    return pd.DataFrame(columns)
+
+
+def run(executable: Union[Experiment, Simulation], state_update_blocks=kernels.state_update_blocks):
+    """## Run
+    Execute a radCAD `Experiment` or `Simulation` using the batched engine, returning a Pandas DataFrame of results.
+
+    Only the `before_subset` hook is supported, and the Simulation's State Update Blocks are assumed to be
+    the default `model.state_update_blocks` with equivalent array kernels in `state_update_blocks`.
+
+    The exception of each run, or `None`, is recorded in the `exceptions` attribute of the executable as in radCAD.
+    """
+    simulations = executable.simulations if isinstance(executable, Experiment) else [executable]
+    raise_exceptions = executable.engine.raise_exceptions
+
+    results = []
+    exceptions = []
+    for simulation_index, simulation in enumerate(simulations):
+        runs = simulation.runs
+        timesteps = simulation.timesteps
+        initial_state = copy.deepcopy(simulation.model.initial_state)
+        params = copy.deepcopy(simulation.model.params)
+        param_sweep = generate_parameter_sweep(params)
+
+        for subset_index, param_set in enumerate(param_sweep if param_sweep else [params]):
+            initial_states = []
+            for run_index in range(runs):
+                context = Context(
+                    simulation_index,
+                    run_index,
+                    subset_index,
+                    timesteps,
+                    initial_state,
+                    param_set,
+                )
+                executable._before_subset(context=context)
+                initial_states.append(copy.deepcopy(initial_state))
+
+            batched_initial_state = {
+                **stack_initial_states(initial_states),
+                "simulation": simulation_index,
+                "subset": subset_index,
+                "run": np.arange(1, runs + 1),
+            }
+            state_history, subset_exceptions = run_subset(
+                batched_initial_state,
+                param_set,
+                timesteps,
+                state_update_blocks,
+                raise_exceptions,
+            )
+            results.append(state_history_to_dataframe(state_history))
+            for run_index in range(runs):
+                exception, trace = subset_exceptions.get(run_index + 1, (None, None))
+                exceptions.append(
+                    {
+                        "exception": exception,
+                        "traceback": trace,
+                        "simulation": simulation_index,
+                        "run": run_index,
+                        "subset": subset_index,
+                        "timesteps": timesteps,
+                        "parameters": param_set,
+                        "initial_state": initial_states[run_index],
+                    }
+                )
+
+    # Order results and exceptions by simulation, run, and subset, as in radCAD
+    df = pd.concat(results, ignore_index=True)
+    df = df.sort_values(["simulation", "run", "subset"], kind="mergesort", ignore_index=True)
+    executable.exceptions = sorted(
+        exceptions,
+        key=lambda exception: (exception["simulation"], exception["run"], exception["subset"]),
+    )
+
+    return df
@@ -0,0 +1,1037 @@
+"""# Batched Array Kernels
+Array kernel equivalents of the model's State Update Blocks defined in `model.state_update_blocks`.
+
+Each kernel takes the same arguments as a radCAD Policy Function, `(params, substep, state_history, previous_state)`,
+where each State Variable in `previous_state` is a Numpy array with a leading axis of Monte Carlo runs,
+and returns a dictionary of State Variable updates for all runs of a subset.
+
+All PCV and User Deposits are stored in a single `model.types.DepositLedger` State Variable, `deposit_ledger`,
+with field arrays of shape `(deposits, runs)`. Kernels update the ledger in place using Deposit views (see `model.types.DepositView`),
+and the engine copies the ledger once per timestep so that previously recorded states in `state_history` remain valid.
+
+Policies that look back in time read the same State History `RingBuffer` State Variables as in radCAD (see `model.utils.lookback(...)`),
+with values of shape `(*value shape, runs)`, rather than reading `state_history`.
+
+Where the equivalent radCAD Policy raises an exception for some runs, the kernel raises a `RunExceptions` exception
+before updating the state, and the engine stops updating the failed runs (see `model.batch.engine.run_subset(...)`).
+
+When updating a Policy or State Update Function in `model.parts`, the relevant kernel should be updated to match.
+"""
+
+import datetime
+import logging
+from typing import Dict
+
+import numpy as np
+
+from model.types import (
+    DepositLedger,
+    LiquidityPoolRegistry,
+    RollingRegressionBuffer,
+    RollingStatisticsBuffer,
+)
+from model.exogenous_processes import ExogenousProcess
+from model.constants import blocks_per_year
+from model.parts.fei_capital_allocation import (
+    compute_capital_allocation_net_balance_change,
+    get_rebalance_solver,
+)
+from model.parts.pcv_management import get_pcv_rebalancing_trade, get_pcv_rebalancing_tranche
+from model.state_update_blocks import lookbacks
+import model.parts.liquidity_pools as liquidity_pools
+import model.parts.uniswap as uniswap
+
+
+class RunExceptions(Exception):
+    """## Run Exceptions
+    Raised by a kernel, before updating the state of any run, for the Monte Carlo runs
+    where the equivalent radCAD Policy raises an exception.
+    """
+
+    def __init__(self, exceptions: Dict[int, Exception]):
+        """
+        Args:
+            exceptions (Dict[int, Exception]): The exception of each failed run, by index of the run in the batch
+        """
+        super().__init__(exceptions)
+        self.exceptions = exceptions
+
+
+# Helper functions
+
+
+def sample_process(process, runs: np.ndarray, timestep) -> np.ndarray:
+    """## Sample Process
+    Sample a System Parameter process with signature `process(run, timestep)` for all runs,
+    using vectorised array access for an `ExogenousProcess`.
+    """
+    if isinstance(process, ExogenousProcess):
+        return process.sample(runs, timestep)
+    return np.array([process(run, timestep) for run in runs], dtype=float)
+
+
+def get_total_fei_balance(ledger: DepositLedger) -> np.ndarray:
+    """See `model.parts.liquidity_pools.get_total_fei_balance(...)`"""
+    return ledger.sum(["fei_liquidity_pool_user_deposit", "fei_liquidity_pool_pcv_deposit"])
+
+
+def get_total_volatile_asset_balance(ledger: DepositLedger) -> np.ndarray:
+    """See `model.parts.liquidity_pools.get_total_volatile_asset_balance(...)`"""
+    return ledger.sum(
+        ["volatile_liquidity_pool_user_deposit", "volatile_liquidity_pool_pcv_deposit"]
+    )
+
+
+def get_capital_allocation_yield_rates(params, state) -> np.ndarray:
+    """See `model.parts.fei_capital_allocation.get_capital_allocation_yield_rates(...)`"""
+    return state["deposit_ledger"].field(
+        "yield_rate", params["capital_allocation_fei_deposit_variables"]
+    )
+
+
+lookback_values = {
+    "capital_allocation_yield_rate_history": get_capital_allocation_yield_rates,
+}
+"""Array equivalents of the Lookback value functions, by State History key, see `model.utils.lookback(...)`"""
+
+
+# Array kernels, in order of `model.state_update_blocks`
+
+
+def kernel_simulation_accounting(params, substep, state_history, previous_state):
+    """See `model.utils.update_timestamp(...)` and `model.utils.update_history(...)`"""
+    dt = params["dt"]
+    date_start = params["date_start"]
+    timestep = previous_state["timestep"]
+
+    # Record the State History of Policies that look back in time, with values of shape `(*value shape, runs)`
+    history_updates = {
+        lookback.key: previous_state[lookback.key].append(
+            previous_state[lookback.value]
+            if isinstance(lookback.value, str)
+            else lookback_values[lookback.key](params, previous_state)
+        )
+        for lookback in lookbacks
+    }
+
+    return {
+        "timestamp": date_start + datetime.timedelta(days=timestep * dt),
+        **history_updates,
+    }
+
+
+def kernel_fei_accounting(params, substep, state_history, previous_state):
+    """See `model.parts.accounting.policy_fei_accounting(...)`"""
+    fei_money_market_utilization = previous_state["fei_money_market_utilization"]
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+
+    fei_money_market_pcv_balance = ledger["fei_money_market_pcv_deposit"].balance
+    fei_money_market_user_balance = ledger["fei_money_market_user_deposit"].balance
+
+    total_protocol_owned_fei = ledger.sum(
+        ["fei_idle_pcv_deposit", "fei_liquidity_pool_pcv_deposit"]
+    ) + fei_money_market_pcv_balance * (1 - fei_money_market_utilization)
+    total_user_circulating_fei = (
+        ledger.sum(
+            [
+                "fei_idle_user_deposit",
+                "fei_savings_user_deposit",
+                "fei_liquidity_pool_user_deposit",
+            ]
+        )
+        + fei_money_market_user_balance * (1 - fei_money_market_utilization)
+        + fei_money_market_pcv_balance * fei_money_market_utilization
+    )
+
+    return {
+        "total_protocol_owned_fei": total_protocol_owned_fei,
+        "total_user_circulating_fei": total_user_circulating_fei,
+        "total_fei_supply": total_protocol_owned_fei + total_user_circulating_fei,
+    }
+
+
+def kernel_pcv_accounting(params, substep, state_history, previous_state):
+    """See `model.parts.accounting.policy_pcv_accounting(...)`"""
+    stable_asset_price = previous_state["stable_asset_price"]
+    volatile_asset_price = previous_state["volatile_asset_price"]
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+
+    total_stable_asset_pcv_balance = ledger.sum(
+        ["stable_idle_pcv_deposit", "stable_yield_bearing_pcv_deposit"]
+    )
+    total_volatile_asset_pcv_balance = ledger.sum(
+        [
+            "volatile_idle_pcv_deposit",
+            "volatile_yield_bearing_pcv_deposit",
+            "volatile_liquidity_pool_pcv_deposit",
+        ]
+    )
+    total_stable_asset_pcv = total_stable_asset_pcv_balance * stable_asset_price
+    total_volatile_asset_pcv = total_volatile_asset_pcv_balance * volatile_asset_price
+
+    return {
+        "total_stable_asset_pcv_balance": total_stable_asset_pcv_balance,
+        "total_volatile_asset_pcv_balance": total_volatile_asset_pcv_balance,
+        "total_stable_asset_pcv": total_stable_asset_pcv,
+        "total_volatile_asset_pcv": total_volatile_asset_pcv,
+        "total_pcv": total_stable_asset_pcv + total_volatile_asset_pcv,
+    }
+
+
+def kernel_system_metrics(params, substep, state_history, previous_state):
+    """See `model.parts.system_metrics.policy_system_metrics(...)`"""
+    dt = params["dt"]
+
+    total_pcv = previous_state["total_pcv"]
+    total_stable_asset_pcv = previous_state["total_stable_asset_pcv"]
+    total_user_circulating_fei = previous_state["total_user_circulating_fei"]
+    fei_price = previous_state["fei_price"]
+    pcv_yield = previous_state["pcv_yield"]
+    psm_mint_redeem_fees = previous_state["psm_mint_redeem_fees"]
+
+    return {
+        "stable_backing_ratio": total_stable_asset_pcv / total_user_circulating_fei,
+        "stable_pcv_ratio": total_stable_asset_pcv / total_pcv,
+        "collateralization_ratio": total_pcv / total_user_circulating_fei,
+        "pcv_yield_rate": pcv_yield / total_pcv * 365 / dt,
+        "protocol_equity": total_pcv - (total_user_circulating_fei * fei_price),
+        "protocol_revenue": pcv_yield + psm_mint_redeem_fees,
+    }
+
+
+def kernel_price_processes(params, substep, state_history, previous_state):
+    """See `model.parts.price_processes`"""
+    dt = params["dt"]
+    runs = previous_state["run"]
+    timestep = previous_state["timestep"]
+
+    return {
+        "fei_price": sample_process(params["fei_price_process"], runs, timestep * dt),
+        "stable_asset_price": sample_process(
+            params["stable_asset_price_process"], runs, timestep * dt
+        ),
+        "volatile_asset_price": sample_process(
+            params["volatile_asset_price_process"], runs, timestep * dt
+        ),
+    }
+
+
+def kernel_constant_function_market_maker(params, substep, state_history, previous_state):
+    """See `model.parts.liquidity_pools.policy_constant_function_market_maker(...)`"""
+    dt = params["dt"]
+    liquidity_pool_trading_fee = params["liquidity_pool_trading_fee"]
+
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    liquidity_pool_registry: LiquidityPoolRegistry = previous_state["liquidity_pool_registry"]
+    fei_price = previous_state["fei_price"]
+    volatile_asset_price = previous_state["volatile_asset_price"]
+
+    current_fei_balance = get_total_fei_balance(ledger)
+    current_volatile_asset_balance = get_total_volatile_asset_balance(ledger)
+
+    protocol_liquidity_share = (
+        ledger["fei_liquidity_pool_pcv_deposit"].balance / current_fei_balance
+    )
+
+    # Pools with shape (1 + registry pools, runs), with the FEI-Volatile Liquidity Pool at index 0
+    pools = liquidity_pools.constant_function_market_maker(
+        **liquidity_pools.get_liquidity_pools(
+            previous_state,
+            liquidity_pool_registry,
+            dt,
+            fei_balance=current_fei_balance,
+            asset_balance=current_volatile_asset_balance,
+            invariant=previous_state["liquidity_pool_invariant"],
+            trading_fee=liquidity_pool_trading_fee,
+            asset_price=volatile_asset_price,
+            asset_price_reference=previous_state["liquidity_pool_volatile_asset_price_reference"],
+        ),
+        fei_price=fei_price,
+        dt=dt,
+    )
+    updated_fei_balance = pools["fei_balance"][0]
+    updated_volatile_asset_balance = pools["asset_balance"][0]
+
+    # Update PCV Deposit and User Deposit LP balances and yield rates
+    ledger["volatile_liquidity_pool_pcv_deposit"].set_balance(
+        updated_volatile_asset_balance * protocol_liquidity_share, volatile_asset_price
+    )
+    ledger["fei_liquidity_pool_pcv_deposit"].set_balance(
+        updated_fei_balance * protocol_liquidity_share, fei_price
+    )
+    ledger["volatile_liquidity_pool_user_deposit"].set_balance(
+        updated_volatile_asset_balance * (1 - protocol_liquidity_share), volatile_asset_price
+    )
+    ledger["fei_liquidity_pool_user_deposit"].set_balance(
+        updated_fei_balance * (1 - protocol_liquidity_share), fei_price
+    )
+    for key in [
+        "fei_liquidity_pool_pcv_deposit",
+        "volatile_liquidity_pool_pcv_deposit",
+        "fei_liquidity_pool_user_deposit",
+        "volatile_liquidity_pool_user_deposit",
+    ]:
+        ledger[key].yield_rate = pools["effective_yield_rate"][0]
+
+    delta_fei_balance = pools["delta_fei_balance"].sum(axis=0)
+
+    return {
+        "liquidity_pool_fei_source_sink": -delta_fei_balance,
+        "fei_minted_redeemed": delta_fei_balance,
+        "liquidity_pool_invariant": pools["invariant"][0],
+        "liquidity_pool_tvl": pools["tvl"][0],
+        "liquidity_pool_impermanent_loss": pools["impermanent_loss"][0],
+        "liquidity_pool_trading_fees": pools["trading_fees"][0],
+        "liquidity_pool_registry": liquidity_pools.update_liquidity_pool_registry(
+            liquidity_pool_registry, pools
+        ),
+    }
+
+
+def kernel_peg_stability_module(params, substep, state_history, previous_state):
+    """See `model.parts.peg_stability_module.policy_peg_stability_module(...)`"""
+    psm_mint_fee = params["psm_mint_fee"]
+    psm_redeem_fee = params["psm_redeem_fee"]
+
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    fei_minted_redeemed = previous_state["fei_minted_redeemed"]
+    active_psm_pcv_deposit_keys = previous_state["active_psm_pcv_deposit_keys"]
+    fei_price = previous_state["fei_price"]
+
+    if not active_psm_pcv_deposit_keys:
+        logging.warning("No active PSM PCV Deposit set!")
+        return {}
+
+    active_psm_pcv_deposits = [ledger[key] for key in active_psm_pcv_deposit_keys]
+    pcv_asset_prices = [
+        previous_state[deposit.asset + "_asset_price"] for deposit in active_psm_pcv_deposits
+    ]
+    mint_redeem_pcv_asset_balances = [
+        fei_minted_redeemed * fei_price / pcv_asset_price for pcv_asset_price in pcv_asset_prices
+    ]
+
+    # Minting: select first active PSM PCV Deposit
+    minting = fei_minted_redeemed >= 0
+    # Redeeming: select first eligible (i.e. with enough balance) active PSM PCV Deposit
+    eligible = np.stack(
+        [
+            deposit.balance >= np.abs(balance)
+            for deposit, balance in zip(active_psm_pcv_deposits, mint_redeem_pcv_asset_balances)
+        ]
+    )
+    selected_index = np.where(minting, 0, eligible.argmax(axis=0))
+
+    # Runs that fail to redeem, where the radCAD Policy raises an exception
+    ineligible = ~(minting | eligible.any(axis=0))
+    insufficient = np.zeros_like(minting)
+    for index, (deposit, balance) in enumerate(
+        zip(active_psm_pcv_deposits, mint_redeem_pcv_asset_balances)
+    ):
+        insufficient |= (selected_index == index) & ~minting & ~(np.abs(balance) < deposit.balance)
+    if np.any(ineligible | insufficient):
+        raise RunExceptions(
+            {
+                index: Exception("Insufficient PCV for redemption")
+                if ineligible[index]
+                else AssertionError("Insufficient PCV for redemption")
+                for index in np.flatnonzero(ineligible | insufficient)
+            }
+        )
+
+    for index, (deposit, pcv_asset_price, balance) in enumerate(
+        zip(active_psm_pcv_deposits, pcv_asset_prices, mint_redeem_pcv_asset_balances)
+    ):
+        selected = selected_index == index
+        redeeming = selected & ~minting
+        deposit.deposit(balance, pcv_asset_price, where=selected & minting)
+        deposit.withdraw(np.abs(balance), pcv_asset_price, where=redeeming)
+
+    psm_mint_redeem_fees = np.where(
+        minting, psm_mint_fee * fei_minted_redeemed, psm_redeem_fee * np.abs(fei_minted_redeemed)
+    )
+
+    return {"psm_mint_redeem_fees": psm_mint_redeem_fees}
+
+
+def kernel_money_market(params, substep, state_history, previous_state):
+    """See `model.parts.money_markets.policy_money_market(...)`"""
+    dt = params["dt"]
+    base_rate_per_block = params["base_rate_per_block"]
+    multiplier_per_block = params["multiplier_per_block"]
+    jump_multiplier_per_block = params["jump_multiplier_per_block"]
+    kink = params["money_market_kink"]
+    reserve_factor = params["money_market_reserve_factor"]
+    money_market_utilization_rate_process = params["money_market_utilization_rate_process"]
+
+    runs = previous_state["run"]
+    timestep = previous_state["timestep"]
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    volatile_asset_price_history: RollingRegressionBuffer = previous_state[
+        "volatile_asset_price_history"
+    ]
+
+    balance = ledger.sum(["fei_money_market_pcv_deposit", "fei_money_market_user_deposit"])
+
+    # Volatile asset price trend risk metric = price slope / average price
+    va_price_mean = (
+        previous_state["volatile_asset_price_mean"] * (timestep - 1)
+        + previous_state["volatile_asset_price"]
+    ) / timestep
+    # Least-squares slope of the volatile asset price window excluding the most recent price,
+    # calculated in O(1) from the rolling sufficient statistics of each run
+    va_price_slope = np.zeros(len(runs)) + (
+        volatile_asset_price_history.slope(exclude_latest=True) if timestep > 2 else 0
+    )
+    va_risk_metric = -va_price_slope / va_price_mean
+    # Min-max normalization
+    va_risk_metric_min = np.minimum(
+        va_risk_metric, previous_state["volatile_asset_risk_metric_min"]
+    )
+    va_risk_metric_max = np.maximum(
+        va_risk_metric, previous_state["volatile_asset_risk_metric_max"]
+    )
+    va_risk_metric_range = va_risk_metric_max - va_risk_metric_min
+    with np.errstate(divide="ignore", invalid="ignore"):
+        va_risk_metric = np.where(
+            va_risk_metric_range != 0,
+            (va_risk_metric - va_risk_metric_min) / va_risk_metric_range,
+            va_risk_metric,
+        )
+    va_risk_metric = np.nan_to_num(va_risk_metric, posinf=0, neginf=0)
+
+    # Utilization rate stochastic process
+    max_risk_discount = 0.5
+    utilization_rate = sample_process(money_market_utilization_rate_process, runs, timestep) * (
+        1 - max_risk_discount * va_risk_metric
+    )
+    borrowed = balance * utilization_rate
+
+    borrowing_interest_rate = (
+        (
+            multiplier_per_block * np.minimum(utilization_rate, kink)
+            + jump_multiplier_per_block * np.maximum(0, utilization_rate - kink)
+            + base_rate_per_block
+        )
+        * blocks_per_year
+        * dt
+    )
+    supply_interest_rate = borrowing_interest_rate * utilization_rate * (1 - reserve_factor)
+    effective_yield_rate = utilization_rate * supply_interest_rate
+    ledger["fei_money_market_pcv_deposit"].yield_rate = effective_yield_rate
+    ledger["fei_money_market_user_deposit"].yield_rate = effective_yield_rate
+
+    return {
+        "volatile_asset_risk_metric": va_risk_metric,
+        "volatile_asset_risk_metric_min": va_risk_metric_min,
+        "volatile_asset_risk_metric_max": va_risk_metric_max,
+        "volatile_asset_price_mean": va_price_mean,
+        "fei_money_market_borrowed": borrowed,
+        "fei_money_market_utilization": utilization_rate,
+        "fei_money_market_borrow_rate": borrowing_interest_rate,
+        "fei_money_market_supply_rate": supply_interest_rate,
+    }
+
+
+def kernel_yield_accrual(params, substep, state_history, previous_state):
+    """See `model.parts.pcv_yield.policy_yield_accrual(...)`"""
+    dt = params["dt"]
+
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    liquidity_pool_trading_fees = previous_state["liquidity_pool_trading_fees"]
+
+    protocol_liquidity_share = ledger[
+        "fei_liquidity_pool_pcv_deposit"
+    ].balance / get_total_fei_balance(ledger)
+
+    yield_accrued = ledger.accrue_yield(
+        [
+            "stable_yield_bearing_pcv_deposit",
+            "volatile_yield_bearing_pcv_deposit",
+            "fei_money_market_pcv_deposit",
+        ],
+        period_in_days=dt,
+        asset_prices=np.stack(
+            [
+                previous_state["stable_asset_price"],
+                previous_state["volatile_asset_price"],
+                previous_state["fei_price"],
+            ]
+        ),
+    )
+
+    return {
+        "pcv_yield": yield_accrued.sum(axis=0)
+        + protocol_liquidity_share * liquidity_pool_trading_fees,
+    }
+
+
+def kernel_yield_management(params, substep, state_history, previous_state):
+    """See `model.parts.pcv_yield.policy_withdraw_yield(...)` and `model.parts.pcv_yield.policy_reinvest_yield(...)`"""
+    dt = params["dt"]
+    yield_withdrawal_period = params["yield_withdrawal_period"]
+    yield_reinvest_period = params["yield_reinvest_period"]
+
+    timestep = previous_state["timestep"]
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+
+    for asset in ["stable", "volatile"]:
+        asset_price = previous_state[asset + "_asset_price"]
+        yield_bearing_pcv_deposit = ledger[asset + "_yield_bearing_pcv_deposit"]
+        if yield_withdrawal_period and timestep % yield_withdrawal_period / dt == 0:
+            # Periodic yield withdrawal
+            yield_bearing_pcv_deposit.transfer_yield(
+                to=ledger[asset + "_idle_pcv_deposit"],
+                amount=yield_bearing_pcv_deposit.yield_accrued,
+                asset_price=asset_price,
+            )
+        if yield_reinvest_period and timestep % yield_reinvest_period / dt == 0:
+            # Periodic yield reinvestment
+            yield_bearing_pcv_deposit.transfer_yield(
+                to=yield_bearing_pcv_deposit,
+                amount=yield_bearing_pcv_deposit.yield_accrued,
+                asset_price=asset_price,
+            )
+
+    return {}
+
+
+def pcv_deposit_rebalancing_strategy(
+    previous_state,
+    total_stable_asset_balance_change,
+    total_volatile_asset_balance_change,
+    where=True,
+):
+    """See `model.parts.pcv_management.pcv_deposit_rebalancing_strategy(...)`"""
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    volatile_asset_price = previous_state["volatile_asset_price"]
+    stable_asset_price = previous_state["stable_asset_price"]
+
+    volatile_to_stable = (total_stable_asset_balance_change >= 0) & (
+        total_volatile_asset_balance_change < 0
+    )
+    for (sell_keys, buy_key, sell_asset_price, buy_asset_price, balance_change, direction) in [
+        # PCV movement from volatile to stable
+        (
+            ["volatile_idle_pcv_deposit", "volatile_yield_bearing_pcv_deposit"],
+            "stable_idle_pcv_deposit",
+            volatile_asset_price,
+            stable_asset_price,
+            np.abs(total_volatile_asset_balance_change),
+            where & volatile_to_stable,
+        ),
+        # PCV movement from stable to volatile
+        (
+            ["stable_idle_pcv_deposit", "stable_yield_bearing_pcv_deposit"],
+            "volatile_idle_pcv_deposit",
+            stable_asset_price,
+            volatile_asset_price,
+            np.abs(total_stable_asset_balance_change),
+            where & ~volatile_to_stable,
+        ),
+    ]:
+        # Try rebalance PCV from deposits in order of priority
+        for deposit in [ledger[key] for key in sell_keys]:
+            active = direction & (balance_change != 0)
+            # Transfer yield to deposit balance
+            deposit.transfer_yield(
+                to=deposit,
+                amount=deposit.yield_accrued,
+                asset_price=sell_asset_price,
+                where=active & (deposit.yield_rate > 0),
+            )
+            transfer_balance = np.where(active, np.minimum(balance_change, deposit.balance), 0)
+            deposit.transfer(
+                to=ledger[buy_key],
+                amount=transfer_balance,
+                from_asset_price=sell_asset_price,
+                to_asset_price=buy_asset_price,
+                where=active,
+            )
+            balance_change = balance_change - transfer_balance
+        if np.any(direction & (balance_change > 0)):
+            logging.debug("Not enough balance across all sell side deposits to rebalance!")
+
+
+def get_pcv_rebalancing_balance(ledger: DepositLedger, keys) -> np.ndarray:
+    """See `model.parts.pcv_management.get_pcv_rebalancing_balance(...)`"""
+    yield_accrued = ledger.field("yield_accrued", keys)
+    yield_rate = ledger.field("yield_rate", keys)
+    return ledger.sum(keys) + np.where(yield_rate > 0, yield_accrued, 0).sum(axis=0)
+
+
+def withdraw_pcv_deposits(ledger: DepositLedger, keys, amount, asset_price, where):
+    """See `model.parts.pcv_management.withdraw_pcv_deposits(...)`"""
+    for deposit in [ledger[key] for key in keys]:
+        active = where & (amount != 0)
+        # Transfer yield to deposit balance
+        deposit.transfer_yield(
+            to=deposit,
+            amount=deposit.yield_accrued,
+            asset_price=asset_price,
+            where=active & (deposit.yield_rate > 0),
+        )
+        withdrawal = np.where(active, np.minimum(amount, deposit.balance), 0)
+        deposit.withdraw(withdrawal, asset_price, where=active)
+        amount = amount - withdrawal
+    if np.any(where & (amount > 0)):
+        logging.debug("Not enough balance across all sell side deposits to rebalance!")
+
+
+def pcv_deposit_rebalancing_trade(
+    params,
+    previous_state,
+    total_stable_asset_balance_change,
+    total_volatile_asset_balance_change,
+    where,
+):
+    """See `model.parts.pcv_management.pcv_deposit_rebalancing_trade(...)`"""
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    volatile_asset_price = previous_state["volatile_asset_price"]
+    stable_asset_price = previous_state["stable_asset_price"]
+    fei_price = previous_state["fei_price"]
+
+    current_fei_balance = get_total_fei_balance(ledger)
+    current_volatile_asset_balance = get_total_volatile_asset_balance(ledger)
+    protocol_liquidity_share = (
+        ledger["fei_liquidity_pool_pcv_deposit"].balance / current_fei_balance
+    )
+
+    (
+        updated_fei_balance,
+        updated_volatile_asset_balance,
+        volatile_asset_balance_change,
+        fei_minted_redeemed,
+    ) = get_pcv_rebalancing_trade(
+        total_stable_asset_balance_change,
+        total_volatile_asset_balance_change,
+        stable_asset_price=stable_asset_price,
+        fei_price=fei_price,
+        fei_balance=current_fei_balance,
+        volatile_asset_balance=current_volatile_asset_balance,
+        trade_fee=params["liquidity_pool_trading_fee"],
+    )
+
+    volatile_to_stable = (total_stable_asset_balance_change >= 0) & (
+        total_volatile_asset_balance_change < 0
+    )
+    # PCV movement from volatile to stable
+    withdraw_pcv_deposits(
+        ledger,
+        ["volatile_idle_pcv_deposit", "volatile_yield_bearing_pcv_deposit"],
+        np.abs(volatile_asset_balance_change),
+        volatile_asset_price,
+        where & volatile_to_stable,
+    )
+    # PCV movement from stable to volatile
+    stable_asset_balance_change = np.abs(total_stable_asset_balance_change)
+    withdraw_pcv_deposits(
+        ledger,
+        ["stable_idle_pcv_deposit", "stable_yield_bearing_pcv_deposit"],
+        stable_asset_balance_change,
+        stable_asset_price,
+        where & ~volatile_to_stable,
+    )
+    ledger["stable_idle_pcv_deposit"].deposit(
+        stable_asset_balance_change, stable_asset_price, where=where & ~volatile_to_stable
+    )
+    ledger["volatile_idle_pcv_deposit"].deposit(
+        volatile_asset_balance_change, volatile_asset_price, where=where & ~volatile_to_stable
+    )
+
+    # Update PCV Deposit and User Deposit LP balances
+    ledger["fei_liquidity_pool_pcv_deposit"].set_balance(
+        updated_fei_balance * protocol_liquidity_share, fei_price, where=where
+    )
+    ledger["volatile_liquidity_pool_pcv_deposit"].set_balance(
+        updated_volatile_asset_balance * protocol_liquidity_share,
+        volatile_asset_price,
+        where=where,
+    )
+    ledger["fei_liquidity_pool_user_deposit"].set_balance(
+        updated_fei_balance * (1 - protocol_liquidity_share), fei_price, where=where
+    )
+    ledger["volatile_liquidity_pool_user_deposit"].set_balance(
+        updated_volatile_asset_balance * (1 - protocol_liquidity_share),
+        volatile_asset_price,
+        where=where,
+    )
+
+    return {
+        "liquidity_pool_invariant": np.where(
+            where,
+            updated_fei_balance * updated_volatile_asset_balance,
+            previous_state["liquidity_pool_invariant"],
+        ),
+        "fei_minted_redeemed": np.where(
+            where,
+            previous_state["fei_minted_redeemed"] + fei_minted_redeemed,
+            previous_state["fei_minted_redeemed"],
+        ),
+    }
+
+
+def kernel_pcv_rebalancing(params, substep, state_history, previous_state):
+    """See `model.parts.pcv_management.policy_pcv_rebalancing_target_stable_backing(...)`,
+    `model.parts.pcv_management.policy_pcv_rebalancing_target_stable_pcv(...)`,
+    and `model.parts.pcv_management.execute_pcv_rebalancing_order(...)`"""
+    dt = params["dt"]
+    rebalancing_period = params["rebalancing_period"]
+    target_stable_backing_ratio = params["target_stable_backing_ratio"]
+    target_stable_pcv_ratio = params["target_stable_pcv_ratio"]
+    target_rebalancing_condition = params["target_rebalancing_condition"]
+    execution_duration = params["pcv_rebalancing_execution_duration"]
+
+    timestep = previous_state["timestep"]
+    volatile_asset_price = previous_state["volatile_asset_price"]
+    stable_asset_price = previous_state["stable_asset_price"]
+
+    rebalancing_orders = []
+    if timestep % rebalancing_period / dt == 0:
+        if target_stable_backing_ratio:
+            stable_asset_target_value_change = (
+                target_stable_backing_ratio * previous_state["total_user_circulating_fei"]
+            ) - previous_state["total_stable_asset_pcv"]
+            rebalancing_orders.append(
+                (
+                    stable_asset_target_value_change / stable_asset_price,
+                    -stable_asset_target_value_change / volatile_asset_price,
+                    target_rebalancing_condition(
+                        previous_state["stable_backing_ratio"], target_stable_backing_ratio
+                    ),
+                )
+            )
+        if target_stable_pcv_ratio:
+            stable_pcv_ratio = previous_state["stable_pcv_ratio"]
+            total_pcv = previous_state["total_pcv"]
+            stable_allocation_pct_change = target_stable_pcv_ratio - stable_pcv_ratio
+            volatile_allocation_pct_change = (1 - target_stable_pcv_ratio) - (1 - stable_pcv_ratio)
+            rebalancing_orders.append(
+                (
+                    stable_allocation_pct_change * total_pcv / stable_asset_price,
+                    volatile_allocation_pct_change * total_pcv / volatile_asset_price,
+                    target_rebalancing_condition(stable_pcv_ratio, target_stable_pcv_ratio),
+                )
+            )
+
+    if execution_duration is None:
+        for rebalancing_order in rebalancing_orders:
+            pcv_deposit_rebalancing_strategy(previous_state, *rebalancing_order)
+        return {}
+
+    if not (target_stable_backing_ratio or target_stable_pcv_ratio):
+        return {}
+
+    # A new order replaces any outstanding order
+    order_stable_asset_balance = previous_state["pcv_rebalancing_order_stable_asset_balance"]
+    order_volatile_asset_balance = previous_state["pcv_rebalancing_order_volatile_asset_balance"]
+    order_timesteps_remaining = previous_state["pcv_rebalancing_order_timesteps_remaining"]
+    for (stable_asset_balance, volatile_asset_balance, where) in rebalancing_orders:
+        order_stable_asset_balance = np.where(
+            where, stable_asset_balance, order_stable_asset_balance
+        )
+        order_volatile_asset_balance = np.where(
+            where, volatile_asset_balance, order_volatile_asset_balance
+        )
+        order_timesteps_remaining = np.where(
+            where, max(int(execution_duration / dt), 1), order_timesteps_remaining
+        )
+
+    # Execute the tranche of each outstanding order for this timestep, within the slippage threshold
+    active = order_timesteps_remaining > 0
+    tranche_stable_asset_balance = np.divide(
+        order_stable_asset_balance,
+        order_timesteps_remaining,
+        out=np.zeros_like(order_stable_asset_balance),
+        where=active,
+    )
+    tranche_volatile_asset_balance = np.divide(
+        order_volatile_asset_balance,
+        order_timesteps_remaining,
+        out=np.zeros_like(order_volatile_asset_balance),
+        where=active,
+    )
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    fill, slippage = get_pcv_rebalancing_tranche(
+        tranche_stable_asset_balance,
+        tranche_volatile_asset_balance,
+        stable_asset_price=stable_asset_price,
+        fei_price=previous_state["fei_price"],
+        fei_balance=get_total_fei_balance(ledger),
+        volatile_asset_balance=get_total_volatile_asset_balance(ledger),
+        trade_fee=params["liquidity_pool_trading_fee"],
+        slippage_threshold=params["pcv_rebalancing_slippage_threshold"],
+        stable_asset_pcv_balance=get_pcv_rebalancing_balance(
+            ledger, ["stable_idle_pcv_deposit", "stable_yield_bearing_pcv_deposit"]
+        ),
+        volatile_asset_pcv_balance=get_pcv_rebalancing_balance(
+            ledger, ["volatile_idle_pcv_deposit", "volatile_yield_bearing_pcv_deposit"]
+        ),
+    )
+    fill = np.where(active, fill, 0)
+    slippage = np.where(active, slippage, 0)
+    liquidity_pool_updates = pcv_deposit_rebalancing_trade(
+        params,
+        previous_state,
+        fill * tranche_stable_asset_balance,
+        fill * tranche_volatile_asset_balance,
+        active & (fill != 0),
+    )
+    order_stable_asset_balance = order_stable_asset_balance - fill * tranche_stable_asset_balance
+    order_volatile_asset_balance = (
+        order_volatile_asset_balance - fill * tranche_volatile_asset_balance
+    )
+    order_timesteps_remaining = np.where(active, order_timesteps_remaining - 1, 0)
+
+    completed = order_timesteps_remaining == 0
+    if np.any(
+        active
+        & completed
+        & ((order_stable_asset_balance != 0) | (order_volatile_asset_balance != 0))
+    ):
+        logging.debug("PCV rebalancing order remainder cancelled at slippage threshold")
+
+    return {
+        **liquidity_pool_updates,
+        "pcv_rebalancing_order_stable_asset_balance": np.where(
+            completed, 0.0, order_stable_asset_balance
+        ),
+        "pcv_rebalancing_order_volatile_asset_balance": np.where(
+            completed, 0.0, order_volatile_asset_balance
+        ),
+        "pcv_rebalancing_order_timesteps_remaining": order_timesteps_remaining,
+        "pcv_rebalancing_slippage": slippage,
+    }
+
+
+def kernel_fei_savings_deposit(params, substep, state_history, previous_state):
+    """See `model.parts.fei_savings_deposit`"""
+    dt = params["dt"]
+    fei_savings_rate_process = params["fei_savings_rate_process"]
+
+    runs = previous_state["run"]
+    timestep = previous_state["timestep"]
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+
+    fei_savings_rate = sample_process(fei_savings_rate_process, runs, timestep * dt)
+    ledger["fei_savings_user_deposit"].yield_rate = fei_savings_rate
+
+    return {"fei_savings_rate": fei_savings_rate}
+
+
+def kernel_capital_allocation_endogenous_weight_update(
+    params, substep, state_history, previous_state
+):
+    """See `model.parts.fei_capital_allocation.policy_fei_capital_allocation_endogenous_weight_update(...)`"""
+    fei_deposit_variables = params["capital_allocation_fei_deposit_variables"]
+    moving_average_window = params["capital_allocation_yield_rate_moving_average_window"]
+
+    volatile_asset_risk_metric = previous_state["volatile_asset_risk_metric"]
+    # Yield rate history with values of shape (deposits, runs)
+    yield_history: RollingStatisticsBuffer = previous_state["capital_allocation_yield_rate_history"]
+
+    yield_vector = np.maximum(yield_history.sum() / moving_average_window, 1e-18)
+
+    # Calculate yield volatility risk
+    yield_risk = yield_history.std() / (yield_history.mean + 1e-18)
+
+    # Calculate volatile asset risk
+    volatile_asset_risk_override = [
+        "fei_liquidity_pool_user_deposit",
+        "fei_money_market_user_deposit",
+    ]
+    volatile_asset_risk = np.stack(
+        [
+            volatile_asset_risk_metric
+            if key in volatile_asset_risk_override
+            else np.zeros_like(volatile_asset_risk_metric)
+            for key in fei_deposit_variables
+        ]
+    )
+
+    # Calculate risk vector
+    risk_vector = 1 + volatile_asset_risk + yield_risk
+
+    assert np.all(yield_vector.sum(axis=0) > 0), "zero or negative yield vector sum"
+    assert np.all(risk_vector.sum(axis=0) > 0), "zero or negative risk vector sum"
+
+    # Calculate target weights: weight = yield / (1 + risk)
+    target_weights = yield_vector / risk_vector
+
+    assert np.all(target_weights.sum(axis=0) >= 0), "zero or negative weights sum"
+
+    # Target weights with shape (runs, deposits)
+    return {
+        "capital_allocation_target_weights": (target_weights / target_weights.sum(axis=0)).T,
+    }
+
+
+def compute_capital_allocation_rebalance_matrix(
+    target_fei_allocation,
+    current_fei_allocation,
+    total_fei,
+    rebalance_rate=1,
+):
+    """See `model.parts.fei_capital_allocation.compute_capital_allocation_rebalance_matrix(...)`"""
+    allocation_pct_change = target_fei_allocation - current_fei_allocation
+    total_fei_deposit_balance_change = (
+        rebalance_rate * allocation_pct_change * total_fei[:, np.newaxis]
+    )
+
+    number_of_deposits = total_fei_deposit_balance_change.shape[-1]
+    solver = get_rebalance_solver(number_of_deposits)
+    rebalance_matrix = solver.solve(total_fei_deposit_balance_change)
+
+    return rebalance_matrix, total_fei_deposit_balance_change
+
+
+def update_fei_liquidity(previous_state, user_fei_balance_delta):
+    """See `model.parts.liquidity_pools.update_fei_liquidity(...)`"""
+    liquidity_pool_invariant = previous_state["liquidity_pool_invariant"]
+    liquidity_pool_liquidity_tokens = previous_state["liquidity_pool_liquidity_tokens"]
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    fei_price = previous_state["fei_price"]
+    volatile_asset_price = previous_state["volatile_asset_price"]
+
+    total_fei_balance = get_total_fei_balance(ledger)
+    total_volatile_asset_balance = get_total_volatile_asset_balance(ledger)
+
+    assert np.all(
+        np.isclose(total_volatile_asset_balance * total_fei_balance, liquidity_pool_invariant)
+    ), "Constant product invariant broken"
+
+    adding = user_fei_balance_delta > 0
+    removing = user_fei_balance_delta < 0
+    add_dr, add_ds, add_dv = uniswap.add_liquidity(
+        reserve_balance=total_volatile_asset_balance,
+        supply_balance=total_fei_balance,
+        voucher_balance=liquidity_pool_liquidity_tokens,
+        tokens=user_fei_balance_delta,
+        value=user_fei_balance_delta * fei_price / volatile_asset_price,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tokens = (
+            np.abs(user_fei_balance_delta) * liquidity_pool_liquidity_tokens / total_fei_balance
+        )
+    remove_dr, remove_ds, remove_dv = uniswap.remove_liquidity(
+        reserve_balance=total_volatile_asset_balance,
+        supply_balance=total_fei_balance,
+        voucher_balance=liquidity_pool_liquidity_tokens,
+        tokens=tokens,
+    )
+
+    assert np.all((add_dr >= 0) & (add_ds >= 0) & (add_dv >= 0) | ~adding)
+    assert np.all((remove_dr <= 0) & (remove_ds <= 0) & (remove_dv <= 0) | ~removing)
+
+    liquidity_pool_liquidity_tokens = liquidity_pool_liquidity_tokens + np.where(
+        adding, add_dv, np.where(removing, remove_dv, 0)
+    )
+    volatile_liquidity_pool_user_deposit = ledger["volatile_liquidity_pool_user_deposit"]
+    volatile_liquidity_pool_user_deposit.deposit(add_dr, volatile_asset_price, where=adding)
+    volatile_liquidity_pool_user_deposit.withdraw(
+        np.abs(remove_dr), volatile_asset_price, where=removing
+    )
+    fei_liquidity_pool_user_deposit = ledger["fei_liquidity_pool_user_deposit"]
+    fei_liquidity_pool_user_deposit.deposit(add_ds, fei_price, where=adding)
+    fei_liquidity_pool_user_deposit.withdraw(np.abs(remove_ds), fei_price, where=removing)
+
+    liquidity_pool_invariant = np.where(
+        adding | removing,
+        get_total_fei_balance(ledger) * get_total_volatile_asset_balance(ledger),
+        liquidity_pool_invariant,
+    )
+
+    return {
+        "liquidity_pool_invariant": liquidity_pool_invariant,
+        "liquidity_pool_liquidity_tokens": liquidity_pool_liquidity_tokens,
+    }
+
+
+def kernel_capital_allocation_rebalancing(params, substep, state_history, previous_state):
+    """See `model.parts.fei_capital_allocation.policy_fei_capital_allocation_rebalancing(...)`"""
+    dt = params["dt"]
+    rebalance_duration = params["capital_allocation_rebalance_duration"]
+    fei_deposit_variables = params["capital_allocation_fei_deposit_variables"]
+
+    ledger: DepositLedger = previous_state["deposit_ledger"]
+    target_weights = previous_state["capital_allocation_target_weights"]
+    fei_price = previous_state["fei_price"]
+
+    # Calculate current weights, with shape (runs, deposits)
+    current_deposit_balances = ledger.field("balance", fei_deposit_variables).T
+    total_fei = current_deposit_balances.sum(axis=-1)
+    current_weights = current_deposit_balances / total_fei[:, np.newaxis]
+
+    assert np.all(np.abs(current_weights.sum(axis=-1) - 1) < 1e-3), "Percentage calculation error"
+
+    # Calculate deltas for rebalancing
+    rebalance_rate = np.sqrt(dt / rebalance_duration)
+    total_fei_deposit_balance_change = (
+        rebalance_rate * (target_weights - current_weights) * total_fei[:, np.newaxis]
+    )
+
+    # NOTE The FEI Liquidity Pool User Deposit is restored after rebalancing,
+    # and instead updated by adding or removing liquidity, see `update_fei_liquidity(...)`
+    liquidity_pool_user_deposit_index = ledger.index["fei_liquidity_pool_user_deposit"]
+    liquidity_pool_user_deposit = ledger.data[:, liquidity_pool_user_deposit_index].copy()
+
+    # Apply the net balance change of each deposit, clipped against available balances
+    net_balance_change = compute_capital_allocation_net_balance_change(
+        current_deposit_balances, total_fei_deposit_balance_change
+    )
+    new_deposit_balances = np.maximum(current_deposit_balances + net_balance_change, 0)
+    for index, key in enumerate(fei_deposit_variables):
+        ledger[key].set_balance(new_deposit_balances[:, index], fei_price)
+
+    new_capital_allocation = ledger.field("balance", fei_deposit_variables).T
+
+    # Check constraints
+    rebalance_remainder = (
+        current_deposit_balances + total_fei_deposit_balance_change
+    ) - new_capital_allocation
+    rebalance_remainder[np.isclose(rebalance_remainder, 0)] = 0
+    rebalance_remainder_tolerance = 0.001  # % of deposit balance
+    rebalance_remainder_pct = rebalance_remainder / (current_deposit_balances + 1e-9)
+    if np.any(rebalance_remainder_pct > rebalance_remainder_tolerance):
+        logging.debug("Capital allocation rebalancing: movement of FEI unallocated")
+
+    assert np.all(np.abs(new_capital_allocation.sum(axis=-1) - total_fei) < 1e-3), "Summation error"
+
+    updates = {
+        "capital_allocation_rebalance_remainder": rebalance_remainder,
+    }
+    if params["capital_allocation_rebalance_matrix_diagnostic"]:
+        updates[
+            "capital_allocation_rebalance_matrix"
+        ] = compute_capital_allocation_rebalance_matrix(
+            target_weights, current_weights, total_fei, rebalance_rate
+        )[
+            0
+        ]
+    if "fei_liquidity_pool_user_deposit" in fei_deposit_variables:
+        user_fei_balance_delta = (
+            ledger["fei_liquidity_pool_user_deposit"].balance
+            - liquidity_pool_user_deposit[DepositLedger.field_index["balance"]]
+        )
+        ledger.data[:, liquidity_pool_user_deposit_index] = liquidity_pool_user_deposit
+        updates.update(update_fei_liquidity(previous_state, user_fei_balance_delta))
+
+    return updates
+
+
+state_update_blocks = [
+    kernel_simulation_accounting,
+    kernel_fei_accounting,
+    kernel_pcv_accounting,
+    kernel_system_metrics,
+    kernel_price_processes,
+    kernel_constant_function_market_maker,
+    kernel_peg_stability_module,
+    kernel_money_market,
+    kernel_yield_accrual,
+    kernel_yield_management,
+    kernel_pcv_rebalancing,
+    kernel_fei_savings_deposit,
+    kernel_capital_allocation_endogenous_weight_update,
+    kernel_capital_allocation_rebalancing,
+]
+"""Array kernels in the same order as the enabled State Update Blocks in `model.state_update_blocks`"""
@@ -0,0 +1,322 @@
+"""# Exogenous Processes
+An array-backed exogenous process type, used for System Parameter processes such as
+`volatile_asset_price_process` with the signature `process(run, timestep)`.
+
+An `ExogenousProcess` holds the pre-generated samples of a process as a `(runs, timesteps)` float64 array,
+with the following properties:
+* it is called in the same way as a `lambda run, timestep: samples[run - 1][timestep]` process
+* the samples can be sliced by run and by timestep, e.g. `process.sample(runs, timestep)` for batched consumers
+  such as the array kernels in `model.batch.kernels`
+* it is immutable, so copied by reference when radCAD deep copies the System Parameters for each run
+* once `share()`d, the samples are backed by a memory-mapped file, and the process is pickled by reference
+  to the file rather than by value, avoiding the cost of pickling samples for each multiprocessing run
+
+A `LazyExogenousProcess` generates its samples on first access, sized to the runs requested,
+and caches them on disk, so that later Python processes memory-map the cached samples instead of regenerating them.
+The cache directory can be configured using the `FEI_MODEL_CACHE_DIR` environment variable.
+
+Any other callable with the signature `process(run, timestep)` can still be used as a process System Parameter.
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict, Union
+
+import numpy as np
+
+from model.types import Run, Timestep
+
+
+_shared_directory = None
+_shared_buffers: Dict[str, np.ndarray] = {}
+
+
+def _get_shared_directory() -> str:
+    """Get the temporary directory for shared process buffers, removed on exit by the creating process"""
+    global _shared_directory
+    if _shared_directory is None:
+        _shared_directory = tempfile.mkdtemp(prefix="fei-model-processes-")
+        pid = os.getpid()
+        atexit.register(
+            lambda: os.getpid() == pid and shutil.rmtree(_shared_directory, ignore_errors=True)
+        )
+    return _shared_directory
+
+
+def _load_shared_buffer(filename: str) -> np.ndarray:
+    """Load a shared process buffer as a read-only memory-mapped array, cached for each process"""
+    if filename not in _shared_buffers:
+        _shared_buffers[filename] = np.load(filename, mmap_mode="r")
+    return _shared_buffers[filename]
+
+
+def _load_shared_process(filename: str) -> "ExogenousProcess":
+    return ExogenousProcess(_load_shared_buffer(filename))
+
+
+def save_samples(filename: str, samples: np.ndarray):
+    """
+    Save samples to a `.npy` file, replacing any existing file atomically,
+    so that concurrent processes never memory-map a partially written file.
+    """
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    file, temporary_filename = tempfile.mkstemp(suffix=".npy", dir=os.path.dirname(filename) or ".")
+    try:
+        with os.fdopen(file, "wb") as f:
+            np.save(f, samples)
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        os.unlink(temporary_filename)
+        raise
+    # NOTE Buffers already memory-mapped keep the replaced file's samples until unmapped
+    _shared_buffers.pop(filename, None)
+
+
+def get_cache_directory() -> str:
+    """Get the directory used to cache the samples of lazy processes, see `load_cached_samples(...)`"""
+    return os.environ.get(
+        "FEI_MODEL_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "fei-protocol-model"),
+    )
+
+
+def _update_cache_key_hash(key_hash, value):
+    """
+    Update a cache key hash with a canonical serialisation of a value,
+    using the dtype, shape, and bytes of arrays rather than their (possibly truncated) repr.
+    """
+    if isinstance(value, dict):
+        key_hash.update(f"dict:{len(value)}:".encode())
+        for item_key in sorted(value):
+            _update_cache_key_hash(key_hash, item_key)
+            _update_cache_key_hash(key_hash, value[item_key])
+    elif isinstance(value, (list, tuple)):
+        key_hash.update(f"{type(value).__name__}:{len(value)}:".encode())
+        for item in value:
+            _update_cache_key_hash(key_hash, item)
+    elif isinstance(value, (np.ndarray, np.generic)):
+        array = np.ascontiguousarray(value)
+        if array.dtype.hasobject:
+            raise TypeError(f"Unsupported cache key array with dtype {array.dtype}")
+        key_hash.update(f"ndarray:{array.dtype.str}:{array.shape}:{array.nbytes}:".encode())
+        key_hash.update(array.tobytes())
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        serialized = repr(value)
+        key_hash.update(f"{type(value).__name__}:{len(serialized)}:{serialized}".encode())
+    else:
+        raise TypeError(f"Unsupported cache key value of type {type(value).__name__}: {value!r}")
+
+
+def load_cached_samples(key: dict, generate: Callable[[], np.ndarray]) -> np.ndarray:
+    """## Load Cached Samples
+    Load the samples for a given cache key, e.g. the process name, parameters, seed, and dimensions,
+    as a read-only memory-mapped array, calling `generate()` and caching the samples on disk if not already cached.
+
+    The cache key may contain scalars, strings, Numpy arrays, and (nested) lists, tuples, and dictionaries of these,
+    and raises a `TypeError` otherwise.
+
+    If the cache directory is not writable, the generated samples are returned without caching.
+    """
+    key_hash = hashlib.sha1()
+    _update_cache_key_hash(key_hash, key)
+    filename = os.path.join(get_cache_directory(), f"{key_hash.hexdigest()}.npy")
+
+    if not os.path.exists(filename):
+        samples = np.asarray(generate(), dtype=np.float64)
+        try:
+            save_samples(filename, samples)
+        except OSError as e:
+            logging.warning(f"Unable to cache process samples in {get_cache_directory()}: {e}")
+            return samples
+
+    return _load_shared_buffer(filename)
+
+
+class ExogenousProcess:
+    """## Exogenous Process
+    A process with the signature `process(run, timestep)`, backed by a `(runs, timesteps)` float64 array of samples,
+    or `(runs, timesteps, ...)` for vector-valued processes such as Dirichlet distributed weights.
+
+    Runs are indexed from 1, as in radCAD, and timesteps from 0.
+    A dimension of size 1 is broadcast, for example `ExogenousProcess.constant(1.0)` returns 1.0 for any run and timestep,
+    and a single realization is shared by all runs.
+    """
+
+    __slots__ = ("samples", "_run_stride", "_timestep_stride")
+
+    def __init__(self, samples: Union[np.ndarray, list]):
+        if not isinstance(samples, np.memmap):
+            samples = np.array(samples, dtype=np.float64)
+            samples.flags.writeable = False
+        if samples.ndim == 1:
+            samples = samples[np.newaxis, :]
+        assert samples.ndim >= 2, "Samples must have shape (runs, timesteps, ...)"
+
+        object.__setattr__(self, "samples", samples)
+        object.__setattr__(self, "_run_stride", int(samples.shape[0] > 1))
+        object.__setattr__(self, "_timestep_stride", int(samples.shape[1] > 1))
+
+    @classmethod
+    def constant(cls, value: float) -> "ExogenousProcess":
+        """Create a process with a constant value for all runs and timesteps"""
+        return cls(np.full((1, 1), value))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __call__(self, run: Run, timestep: Timestep):
+        return self.samples[(run - 1) * self._run_stride, timestep * self._timestep_stride]
+
+    def __getitem__(self, index):
+        """Slice the `(runs, timesteps)` samples array, with runs indexed from 0"""
+        return self.samples[index]
+
+    def __len__(self):
+        return self.samples.shape[0]
+
+    @property
+    def shape(self):
+        return self.samples.shape
+
+    def sample(self, runs: np.ndarray, timestep: Timestep) -> np.ndarray:
+        """Sample the process for an array of runs, indexed from 1, at a given timestep"""
+        return self.samples[
+            (np.asarray(runs) - 1) * self._run_stride, timestep * self._timestep_stride
+        ]
+
+    def to_array(self, runs: int, timesteps: int) -> np.ndarray:
+        """Get a read-only `(runs, timesteps, ...)` view of the samples, broadcasting any dimension of size 1"""
+        return np.broadcast_to(
+            self.samples[
+                : runs if self._run_stride else 1, : timesteps if self._timestep_stride else 1
+            ],
+            (runs, timesteps) + self.samples.shape[2:],
+        )
+
+    @property
+    def is_shared(self) -> bool:
+        return isinstance(self.samples, np.memmap)
+
+    def share(self) -> "ExogenousProcess":
+        """
+        Get an equivalent process backed by a memory-mapped file, pickled by reference to the file.
+        Processes unpickled in the same Python process, or in worker processes, share the same buffer.
+        """
+        if self.is_shared:
+            return self
+        file, filename = tempfile.mkstemp(suffix=".npy", dir=_get_shared_directory())
+        with os.fdopen(file, "wb") as f:
+            np.save(f, self.samples)
+        return _load_shared_process(filename)
+
+    def __reduce__(self):
+        if self.is_shared:
+            return (_load_shared_process, (self.samples.filename,))
+        return (ExogenousProcess, (np.asarray(self.samples),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(shape={self.shape})"
+
+
+def _load_lazy_process(cls, generator, cache_version, parameters, runs) -> "LazyExogenousProcess":
+    process = cls(generator, cache_version=cache_version, **parameters)
+    return process.materialize(runs) if runs else process
+
+
+class LazyExogenousProcess(ExogenousProcess):
+    """## Lazy Exogenous Process
+    An `ExogenousProcess` whose samples are generated on first access using `generator(runs=runs, **parameters)`,
+    which returns the samples with shape `(runs, timesteps, ...)`.
+    The `cache_version` should be changed whenever the generator changes, to invalidate previously cached samples.
+
+    The samples are sized to the runs requested, rounded up to a power of two, and cached on disk
+    (see `load_cached_samples(...)`). The process is pickled by reference to the cached samples.
+
+    NOTE The realization of each run must be independent of the total number of runs, e.g. seeded by run index,
+    so that requesting more runs does not change the samples of existing runs.
+    """
+
+    __slots__ = ("generator", "cache_version", "parameters")
+
+    def __init__(self, generator: Callable[..., np.ndarray], cache_version=0, **parameters):
+        object.__setattr__(self, "generator", generator)
+        object.__setattr__(self, "cache_version", cache_version)
+        object.__setattr__(self, "parameters", parameters)
+
+    def __getattr__(self, name):
+        # NOTE Only called before the samples have been generated
+        if name in ExogenousProcess.__slots__:
+            self.materialize(1)
+            return object.__getattribute__(self, name)
+        raise AttributeError(name)
+
+    @property
+    def runs(self) -> int:
+        """The number of runs generated so far"""
+        try:
+            return object.__getattribute__(self, "samples").shape[0]
+        except AttributeError:
+            return 0
+
+    def cache_key(self, runs: int) -> dict:
+        """The cache key of the samples generated for a given number of runs, see `load_cached_samples(...)`"""
+        return {
+            "generator": f"{self.generator.__module__}.{self.generator.__qualname__}",
+            "cache_version": self.cache_version,
+            "runs": runs,
+            **self.parameters,
+        }
+
+    def materialize(self, runs: int) -> "LazyExogenousProcess":
+        """Generate the samples for at least the given number of runs"""
+        if runs <= self.runs:
+            return self
+        runs = 1 << (runs - 1).bit_length()
+
+        samples = load_cached_samples(
+            self.cache_key(runs), lambda: self.generator(runs=runs, **self.parameters)
+        )
+        if samples.ndim == 1:
+            samples = samples[np.newaxis, :]
+
+        object.__setattr__(self, "samples", samples)
+        object.__setattr__(self, "_run_stride", 1)
+        object.__setattr__(self, "_timestep_stride", 1)
+        return self
+
+    def __call__(self, run: Run, timestep: Timestep):
+        try:
+            return self.samples[run - 1, timestep]
+        except IndexError:
+            self.materialize(run)
+            return self.samples[run - 1, timestep]
+
+    def sample(self, runs: np.ndarray, timestep: Timestep) -> np.ndarray:
+        self.materialize(int(np.max(runs)))
+        return super().sample(runs, timestep)
+
+    def to_array(self, runs: int, timesteps: int) -> np.ndarray:
+        self.materialize(runs)
+        return super().to_array(runs, timesteps)
+
+    def share(self) -> "LazyExogenousProcess":
+        return self
+
+    def __reduce__(self):
+        return (
+            _load_lazy_process,
+            (self.__class__, self.generator, self.cache_version, self.parameters, self.runs),
+        )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.generator.__name__}, runs={self.runs})"
@@ -3,12 +3,19 @@
 
 import radcad as radcad
 import logging
-from dataclasses import make_dataclass
+import numpy as np
+from dataclasses import field, make_dataclass
+from functools import partial
 from model.state_variables import StateVariables
+from model.state_cloner import StateDict, generate_state_schema
+from model.state_update_blocks import lookbacks
 from model.system_parameters import pcv_deposit_keys, user_deposit_keys
+from model.stochastic_processes import StochasticProcess
+from model.shocks import ShockedProcess, apply_shocks
 from model.types import (
-    PCVDeposit,
-    UserDeposit,
+    FrozenPCVDeposit,
+    FrozenUserDeposit,
+    LiquidityPoolRegistry,
 )
 
 
@@ -22,17 +29,59 @@ def setup_initial_state(context: radcad.Context):
     logging.info("Setting up initial state")
 
     params = context.parameters
-    run = context.run
+    # NOTE The radCAD Context run is indexed from 0, and the `run` State Variable from 1
+    run = context.run + 1
     timestep = 0
 
+    # Seed the stochastic processes for the subset, see `model.stochastic_processes.get_seed_sequence(...)`,
+    # and overlay any shocks on the processes, see `model.shocks`
+    # NOTE With common random numbers, all subsets are seeded as subset 0
+    random_numbers_subset = 0 if params["common_random_numbers"] else context.subset
+    process_timesteps = context.timesteps * params["dt"] + 1
+    for key, value in params.items():
+        process = value.process if isinstance(value, ShockedProcess) else value
+        if isinstance(process, StochasticProcess):
+            process = process.seeded(
+                seed=params["seed"],
+                name=key,
+                subset=random_numbers_subset,
+                sampling=params["sampling_method"],
+                tilt=params["importance_sampling_tilts"].get(key, 0),
+            )
+        # NOTE Reuse the shocked samples of previous runs of the subset
+        if isinstance(value, ShockedProcess) and value.process is process:
+            process = value
+        params[key] = apply_shocks(
+            process, params["exogenous_process_shocks"].get(key, ()), process_timesteps
+        )
+
     # Add PCV Deposit and User Deposit distribution configuration to StateVariables
     StateVariablesWithDeposits = make_dataclass(
         "StateVariablesWithDeposits",
         fields=(
             # Add all PCV Deposit instances
-            [(key, PCVDeposit, params["pcv_deposits"][key]) for key in pcv_deposit_keys]
+            # NOTE Deposits are frozen, so the Deposit System Parameters are never mutated by the simulation
+            [
+                (key, FrozenPCVDeposit, params["pcv_deposits"][key].freeze())
+                for key in pcv_deposit_keys
+            ]
             # Add all User Deposit instances
-            + [(key, UserDeposit, params["user_deposits"][key]) for key in user_deposit_keys]
+            + [
+                (key, FrozenUserDeposit, params["user_deposits"][key].freeze())
+                for key in user_deposit_keys
+            ]
+            # Add State History of Policies that look back in time, see `model.utils.lookback(...)`
+            # NOTE State History instances are created using a default factory, as unhashable defaults are not allowed by `dataclasses`
+            + [
+                (
+                    lookback.key,
+                    lookback.history,
+                    field(
+                        default_factory=partial(lookback.history, window=params[lookback.window])
+                    ),
+                )
+                for lookback in lookbacks
+            ]
         ),
         bases=(StateVariables,),
     )
@@ -40,12 +89,31 @@ def setup_initial_state(context: radcad.Context):
     context.initial_state.update(StateVariablesWithDeposits().__dict__)
     initial_state = context.initial_state
 
+    # Generate the State cloner used by radCAD to copy the State Variables when deepcopy is disabled
+    if isinstance(initial_state, StateDict):
+        initial_state.set_schema(generate_state_schema(StateVariablesWithDeposits))
+
+    # Weight the run by the likelihood ratio weights of the importance sampled processes
+    initial_state["likelihood_ratio_weight"] = float(
+        np.prod(
+            [
+                process.likelihood_ratio_weight(run)
+                for process in (
+                    value.process if isinstance(value, ShockedProcess) else value
+                    for value in params.values()
+                )
+                if isinstance(process, StochasticProcess)
+            ]
+        )
+    )
+
     """
     Liquidity Pool Setup
     """
     # Parameters
     dt = params["dt"]
     liquidity_pool_tvl = params["liquidity_pool_tvl"]
+    fei_liquidity_pools = params["fei_liquidity_pools"]
     fei_price_process = params["fei_price_process"]
     volatile_asset_price_process = params["volatile_asset_price_process"]
 
@@ -68,13 +136,33 @@ def setup_initial_state(context: radcad.Context):
     liquidity_pool_liquidity_tokens = liquidity_pool_fei_balance
 
     # State Updates
-    fei_liquidity_pool_pcv_deposit.set_balance(liquidity_pool_fei_balance, fei_price)
-    volatile_liquidity_pool_pcv_deposit.set_balance(
+    fei_liquidity_pool_pcv_deposit = fei_liquidity_pool_pcv_deposit.set_balance(
+        liquidity_pool_fei_balance, fei_price
+    )
+    volatile_liquidity_pool_pcv_deposit = volatile_liquidity_pool_pcv_deposit.set_balance(
         liquidity_pool_volatile_asset_balance, volatile_asset_price
     )
 
+    # Additional FEI Liquidity Pools, initialised at the same FEI price
+    liquidity_pool_asset_prices = {}
+    for pool_key, pool in fei_liquidity_pools.items():
+        if pool.asset_price_process:
+            liquidity_pool_asset_prices[pool_key] = pool.asset_price_process(run, timestep * dt)
+        elif pool.asset + "_asset_price" in initial_state:
+            liquidity_pool_asset_prices[pool_key] = initial_state[pool.asset + "_asset_price"]
+        else:
+            raise ValueError(
+                f"Liquidity Pool '{pool_key}' requires either an `asset_price_process`"
+                f" or a `{pool.asset}_asset_price` State Variable for asset '{pool.asset}'"
+            )
+    liquidity_pool_registry = LiquidityPoolRegistry(
+        fei_liquidity_pools, fei_price, liquidity_pool_asset_prices
+    )
+
     context.initial_state.update(
         {
+            "liquidity_pool_volatile_asset_price_reference": initial_state["volatile_asset_price"],
+            "liquidity_pool_registry": liquidity_pool_registry,
             "liquidity_pool_tvl": liquidity_pool_tvl,
             "liquidity_pool_invariant": liquidity_pool_invariant,
             "liquidity_pool_liquidity_tokens": liquidity_pool_liquidity_tokens,
@@ -91,11 +179,24 @@ def setup_initial_state(context: radcad.Context):
     volatile_asset_yield_rate = params["volatile_asset_yield_rate"]
 
     # State Variables
-    stable_yield_bearing_pcv_deposit: PCVDeposit = initial_state["stable_yield_bearing_pcv_deposit"]
-    volatile_yield_bearing_pcv_deposit: PCVDeposit = initial_state[
+    stable_yield_bearing_pcv_deposit: FrozenPCVDeposit = initial_state[
+        "stable_yield_bearing_pcv_deposit"
+    ]
+    volatile_yield_bearing_pcv_deposit: FrozenPCVDeposit = initial_state[
         "volatile_yield_bearing_pcv_deposit"
     ]
 
     # State Updates
-    stable_yield_bearing_pcv_deposit.yield_rate = stable_asset_yield_rate
-    volatile_yield_bearing_pcv_deposit.yield_rate = volatile_asset_yield_rate
+    stable_yield_bearing_pcv_deposit = stable_yield_bearing_pcv_deposit.set_yield_rate(
+        stable_asset_yield_rate
+    )
+    volatile_yield_bearing_pcv_deposit = volatile_yield_bearing_pcv_deposit.set_yield_rate(
+        volatile_asset_yield_rate
+    )
+
+    context.initial_state.update(
+        {
+            "stable_yield_bearing_pcv_deposit": stable_yield_bearing_pcv_deposit,
+            "volatile_yield_bearing_pcv_deposit": volatile_yield_bearing_pcv_deposit,
+        }
+    )
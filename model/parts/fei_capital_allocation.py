@@ -16,15 +16,14 @@ Additionally, in a next step to further formulate FEI demand, the model will des
 PCV and protocol-owned FEI movements are independent of the Capital Allocation Model and managed directly via governance-implemented protocol policies.
 """
 
-from typing import Dict, List
 from model.system_parameters import Parameters
+from model.types import RollingStatisticsBuffer
+from model.utils import lookback
 import model.parts.liquidity_pools as liquidity_pools
-from scipy.stats import dirichlet
 import numpy as np
 import pprint
-import networkx as nx
 import logging
-import copy
+from functools import lru_cache
 
 pp = pprint.PrettyPrinter(indent=4)
 
@@ -37,11 +36,14 @@ def policy_fei_capital_allocation_exogenous_weight_update(
     """
     # Parameters
     dt = params["dt"]
-    alpha = params["capital_allocation_exogenous_concentration"]
+    capital_allocation_exogenous_weights_process = params[
+        "capital_allocation_exogenous_weights_process"
+    ]
     rebalance_duration = params["capital_allocation_rebalance_duration"]
     fei_deposit_variables = params["capital_allocation_fei_deposit_variables"]
 
     # State Variables
+    run = previous_state["run"]
     timestep = previous_state["timestep"]
 
     # Calculate current weights
@@ -52,8 +54,9 @@ def policy_fei_capital_allocation_exogenous_weight_update(
 
     # Calculate target weights: stochastic, exogenous weights
     # https://en.wikipedia.org/wiki/Dirichlet_distribution
-    # TODO Take `random_state`` from simulation seed
-    perturbation = dirichlet.rvs(alpha, size=1, random_state=timestep)[0]
+    # NOTE The Dirichlet perturbations are pre-generated for all runs and timesteps,
+    # see `model.stochastic_processes.dirichlet_process(...)`
+    perturbation = np.asarray(capital_allocation_exogenous_weights_process(run, timestep * dt))
     rebalance_rate = np.sqrt(dt / rebalance_duration)
     target_weights = rebalance_rate * perturbation + np.array(current_weights)
     normalised_target_weights = target_weights / target_weights.sum()
@@ -63,6 +66,21 @@ def policy_fei_capital_allocation_exogenous_weight_update(
     }
 
 
+def get_capital_allocation_yield_rates(params: Parameters, state) -> np.ndarray:
+    """## Get Capital Allocation Yield Rates
+    Get the yield rates of the Capital Allocation FEI Deposits, recorded in the `capital_allocation_yield_rate_history` State Variable.
+    """
+    return np.array(
+        [state[key].yield_rate for key in params["capital_allocation_fei_deposit_variables"]]
+    )
+
+
+@lookback(
+    "capital_allocation_yield_rate_history",
+    value=get_capital_allocation_yield_rates,
+    window="capital_allocation_yield_rate_moving_average_window",
+    history=RollingStatisticsBuffer,
+)
 def policy_fei_capital_allocation_endogenous_weight_update(
     params: Parameters, substep, state_history, previous_state
 ):
@@ -74,25 +92,17 @@ def policy_fei_capital_allocation_endogenous_weight_update(
     moving_average_window = params["capital_allocation_yield_rate_moving_average_window"]
 
     # State Variables
-    timestep = previous_state["timestep"]
     volatile_asset_risk_metric = previous_state["volatile_asset_risk_metric"]
+    # Yield rate history of each deposit over the last `moving_average_window` timesteps,
+    # with windowed statistics updated incrementally independent of the window length
+    yield_history: RollingStatisticsBuffer = previous_state["capital_allocation_yield_rate_history"]
 
     # Calculate moving average of yield vector
-    yield_history_map: Dict[str, List] = {
-        key: [state[-1][key].yield_rate for state in state_history[-moving_average_window:timestep]]
-        for key in fei_deposit_variables
-    }
-    yield_history: List[List] = yield_history_map.values()
-    yield_map = {
-        key: max(sum(yield_history) / moving_average_window, 1e-18)
-        or previous_state[key].yield_rate
-        for key, yield_history in yield_history_map.items()
-    }
-    yield_vector = np.array(list(yield_map.values()))
+    yield_vector = np.maximum(yield_history.sum() / moving_average_window, 1e-18)
 
     # Calculate yield volatility risk
-    yield_std = np.array([np.std(x) for x in yield_history])
-    yield_mean = np.array([np.mean(x) for x in yield_history])
+    yield_std = yield_history.std()
+    yield_mean = yield_history.mean
     yield_risk = yield_std / (yield_mean + 1e-18)
 
     # Calculate volatile asset risk
@@ -143,18 +153,23 @@ def policy_fei_capital_allocation_rebalancing(
     """## User-circulating FEI Capital Allocation Rebalancing Policy
     A Policy that takes the target Capital Allocation weights calculated in `policy_fei_capital_allocation_endogenous_weight_update(...)`,
     calculates the current Capital Allocation weights, and performs the necessary rebalancing operations to try meet the target.
+
+    The net balance change of each User Deposit is applied directly, see `compute_capital_allocation_net_balance_change(...)`.
+    The equivalent pairwise transfers between User Deposits, the `capital_allocation_rebalance_matrix` State Variable,
+    are only calculated when the `capital_allocation_rebalance_matrix_diagnostic` parameter is enabled.
     """
     # Parameters
     dt = params["dt"]
     rebalance_duration = params["capital_allocation_rebalance_duration"]
     fei_deposit_variables = params["capital_allocation_fei_deposit_variables"]
+    rebalance_matrix_diagnostic = params["capital_allocation_rebalance_matrix_diagnostic"]
 
     # State Variables
     target_weights: np.ndarray = previous_state["capital_allocation_target_weights"]
     fei_price = previous_state["fei_price"]
 
     # Calculate current weights
-    fei_deposits = [copy.deepcopy(previous_state[key]) for key in fei_deposit_variables]
+    fei_deposits = [previous_state[key] for key in fei_deposit_variables]
     current_deposit_balances = np.array([deposit.balance for deposit in fei_deposits])
     total_fei = sum(current_deposit_balances)
     current_weights = np.array([balance / total_fei for balance in current_deposit_balances])
@@ -165,27 +180,18 @@ def policy_fei_capital_allocation_rebalancing(
 
     # Calculate deltas for rebalancing
     rebalance_rate = np.sqrt(dt / rebalance_duration)
+    allocation_pct_change = target_weights - current_weights
+    total_fei_deposit_balance_change = rebalance_rate * allocation_pct_change * total_fei
 
-    (
-        rebalance_matrix,
-        total_fei_deposit_balance_change,
-    ) = compute_capital_allocation_rebalance_matrix(
-        target_weights, current_weights, total_fei, rebalance_rate
+    # Apply the net balance change of each deposit, clipped against available balances, in a single update
+    net_balance_change = compute_capital_allocation_net_balance_change(
+        current_deposit_balances, total_fei_deposit_balance_change
     )
-
-    for (row, column), value in filter(lambda x: x != 0, np.ndenumerate(rebalance_matrix)):
-        # Perform balance transfer
-        from_index = column if value > 0 else row
-        to_index = row if value > 0 else column
-
-        transfer_amount = min(abs(value), fei_deposits[from_index].balance)
-
-        fei_deposits[from_index].transfer(
-            to=fei_deposits[to_index],
-            amount=transfer_amount,
-            from_asset_price=fei_price,
-            to_asset_price=fei_price,
-        )
+    new_deposit_balances = np.maximum(current_deposit_balances + net_balance_change, 0)
+    fei_deposits = [
+        deposit.set_balance(balance, fei_price)
+        for deposit, balance in zip(fei_deposits, new_deposit_balances)
+    ]
 
     new_capital_allocation = [deposit.balance for deposit in fei_deposits]
 
@@ -207,7 +213,16 @@ def policy_fei_capital_allocation_rebalancing(
     assert array_sum_threshold_check(new_capital_allocation, total_fei, 1e-3), "Summation error"
 
     return {
-        "capital_allocation_rebalance_matrix": rebalance_matrix,
+        # Optional diagnostic: pairwise User Deposit transfers equivalent to the net balance changes
+        **(
+            {
+                "capital_allocation_rebalance_matrix": get_rebalance_solver(
+                    len(fei_deposits)
+                ).solve(total_fei_deposit_balance_change)
+            }
+            if rebalance_matrix_diagnostic
+            else {}
+        ),
         "capital_allocation_rebalance_remainder": rebalance_remainder,
         # FEI User Deposit updates
         **{key: fei_deposits[index] for index, key in enumerate(fei_deposit_variables)},
@@ -222,6 +237,33 @@ def policy_fei_capital_allocation_rebalancing(
     }
 
 
+def compute_capital_allocation_net_balance_change(
+    current_deposit_balances: np.ndarray,
+    total_fei_deposit_balance_change: np.ndarray,
+) -> np.ndarray:
+    """## Compute Capital Allocation Net Balance Change
+    A function that clips the net balance change of each User Deposit against the available Deposit balances,
+    scaling the total inflows or outflows so that the total user-circulating FEI is conserved.
+
+    Accepts arrays with shape `(..., number_of_deposits)`, e.g. `(runs, number_of_deposits)` for batched Monte Carlo runs.
+    """
+    # Outflows can not exceed available Deposit balances
+    outflows = np.maximum(
+        np.minimum(total_fei_deposit_balance_change, 0), -current_deposit_balances
+    )
+    inflows = np.maximum(total_fei_deposit_balance_change, 0)
+
+    total_outflow = -outflows.sum(axis=-1, keepdims=True)
+    total_inflow = inflows.sum(axis=-1, keepdims=True)
+
+    # Scale down the larger of the total inflows and outflows to conserve FEI
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inflow_scale = np.where(total_inflow > total_outflow, total_outflow / total_inflow, 1)
+        outflow_scale = np.where(total_outflow > total_inflow, total_inflow / total_outflow, 1)
+
+    return inflows * inflow_scale + outflows * outflow_scale
+
+
 def compute_capital_allocation_rebalance_matrix(
     target_fei_allocation,
     current_fei_allocation,
@@ -237,37 +279,67 @@ def compute_capital_allocation_rebalance_matrix(
     total_fei_deposit_balance_change = rebalance_rate * allocation_pct_change * total_fei
 
     number_of_deposits = len(total_fei_deposit_balance_change)
-    deposit_incidence_matrix = generate_constrained_incidence_matrix(number_of_deposits)
+    solver = get_rebalance_solver(number_of_deposits)
+    rebalance_matrix = solver.solve(total_fei_deposit_balance_change)
 
-    total_balance_changes = np.append(total_fei_deposit_balance_change, np.array(0))
-    # Solve Ax = b st 1Tx == 0 (conservation constraint)
-    deltas = np.linalg.pinv(deposit_incidence_matrix) @ total_balance_changes
+    return rebalance_matrix, total_fei_deposit_balance_change
 
-    assert np.allclose(
-        np.dot(deposit_incidence_matrix, deltas),
-        total_balance_changes,
-        atol=1e-3,
-    ), "Linear algebra solution is above imprecision tolerance"
 
-    rebalance_matrix = populate_delta_triangular_matrix(deltas, number_of_deposits)
+class RebalanceSolver:
+    """## Rebalance Solver
+    Solves for the User Deposit rebalancing operations, or edge flows of the complete graph of User Deposits,
+    necessary to meet a change in Deposit balances, using the pseudo-inverse of the constrained incidence matrix
+    precomputed for a given number of Deposits.
 
-    return rebalance_matrix, total_fei_deposit_balance_change
+    See `get_rebalance_solver(...)` for a cached instance for each number of Deposits.
+    """
 
+    def __init__(self, number_of_deposits):
+        self.number_of_deposits = number_of_deposits
+        self.incidence_matrix = generate_constrained_incidence_matrix(number_of_deposits)
+        self.pseudo_inverse = np.linalg.pinv(self.incidence_matrix)
+        # Upper triangular indices of the rebalance matrix, in incidence matrix edge order
+        self.row, self.column = np.triu_indices(number_of_deposits, k=1)
+
+    def solve(self, total_fei_deposit_balance_change: np.ndarray) -> np.ndarray:
+        """
+        Solve for the rebalance matrix given the total balance change of each Deposit,
+        with shape `(..., number_of_deposits)`, e.g. `(runs, number_of_deposits)` for batched Monte Carlo runs.
+
+        Returns:
+            The upper triangular rebalance matrix with shape `(..., number_of_deposits, number_of_deposits)`
+        """
+        total_balance_changes = np.concatenate(
+            [
+                total_fei_deposit_balance_change,
+                np.zeros(total_fei_deposit_balance_change.shape[:-1] + (1,)),
+            ],
+            axis=-1,
+        )
+        # Solve Ax = b st 1Tx == 0 (conservation constraint)
+        deltas = total_balance_changes @ self.pseudo_inverse.T
+
+        assert np.allclose(
+            deltas @ self.incidence_matrix.T,
+            total_balance_changes,
+            atol=1e-3,
+        ), "Linear algebra solution is above imprecision tolerance"
+
+        rebalance_matrix = np.zeros(
+            total_fei_deposit_balance_change.shape[:-1]
+            + (self.number_of_deposits, self.number_of_deposits)
+        )
+        rebalance_matrix[..., self.row, self.column] = deltas[..., : len(self.row)]
 
-def populate_delta_triangular_matrix(d, w_size):
-    """## Populate Delta Triangular Matrix
-    A function that populates a lower triangular matrix, sometimes referred to as a `triu` function.
-    """
-    D = np.zeros((w_size, w_size))
+        return rebalance_matrix
 
-    k = 0
-    for i in range(len(D)):
-        for j in range(len(D)):
-            if i < j:
-                D[i][j] = d[k]
-                k += 1
 
-    return D
+@lru_cache(maxsize=None)
+def get_rebalance_solver(number_of_deposits) -> RebalanceSolver:
+    """## Get Rebalance Solver
+    Get the `RebalanceSolver` for a given number of Deposits, cached so that the pseudo-inverse is only computed once.
+    """
+    return RebalanceSolver(number_of_deposits)
 
 
 def generate_constrained_incidence_matrix(n_deposits):
@@ -275,10 +347,14 @@ def generate_constrained_incidence_matrix(n_deposits):
     A function that calculates the incidence matrix for the graph of User Deposits,
     in order to be able to calculate the transactions needed to rebalance towards the target Capital Allocation.
     """
-    G = nx.complete_graph(n_deposits)
-    A = (nx.incidence_matrix(G, oriented=True).toarray() * -1).astype(int)
-
-    # NOTE Fixes NetworkX rendition of 2-deposit adjacency matrix generation
+    # Oriented incidence matrix of the complete graph, with edges (u, v) for u < v in order, and +1 at u and -1 at v
+    u, v = np.triu_indices(n_deposits, k=1)
+    edges = np.arange(len(u))
+    A = np.zeros((n_deposits, len(edges)), dtype=int)
+    A[u, edges] = 1
+    A[v, edges] = -1
+
+    # NOTE Pads the 2-deposit incidence matrix to two edges, as in the original NetworkX implementation
     if A.shape[1] == 1:
         A = np.hstack([A, np.zeros((2, 1))])
 
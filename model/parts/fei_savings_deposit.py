@@ -3,7 +3,7 @@ Policies and State Update Functions necessary to calculate and set the FEI Savin
 """
 
 from model.types import (
-    UserDeposit,
+    FrozenUserDeposit,
 )
 from model.system_parameters import Parameters
 
@@ -41,7 +41,7 @@ def update_fei_savings_deposit_yield_rate(
     fei_savings_rate = policy_input["fei_savings_rate"]
 
     # State Variables
-    fei_savings_user_deposit: UserDeposit = previous_state["fei_savings_user_deposit"]
-    fei_savings_user_deposit.yield_rate = fei_savings_rate
+    fei_savings_user_deposit: FrozenUserDeposit = previous_state["fei_savings_user_deposit"]
+    fei_savings_user_deposit = fei_savings_user_deposit.set_yield_rate(fei_savings_rate)
 
     return "fei_savings_user_deposit", fei_savings_user_deposit
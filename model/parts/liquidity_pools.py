@@ -9,12 +9,14 @@ from model.system_parameters import Parameters
 from model.types import (
     APR,
     FEI,
-    PCVDeposit,
-    UserDeposit,
+    FrozenPCVDeposit,
+    FrozenUserDeposit,
+    LiquidityPoolRegistry,
     VolatileAssetUnits,
 )
+from typing import Dict
 
-import math
+from model.exogenous_processes import ExogenousProcess
 import model.parts.uniswap as uniswap
 
 
@@ -23,104 +25,101 @@ def policy_constant_function_market_maker(
 ):
     """## Constant Function Market Maker (CFMM) Policy
     An implementation of a Uniswap style Constant Function Market Maker.
+
+    The FEI-Volatile Liquidity Pool, backed by the Liquidity Pool PCV and User Deposits,
+    is updated in a single vectorised pass together with the pools of the `liquidity_pool_registry` State Variable,
+    see `constant_function_market_maker(...)`.
     """
     # Parameters
     dt = params["dt"]
     liquidity_pool_trading_fee = params["liquidity_pool_trading_fee"]
 
     # State Variables
-    fei_liquidity_pool_pcv_deposit: PCVDeposit = previous_state["fei_liquidity_pool_pcv_deposit"]
-    volatile_liquidity_pool_pcv_deposit: PCVDeposit = previous_state[
+    fei_liquidity_pool_pcv_deposit: FrozenPCVDeposit = previous_state[
+        "fei_liquidity_pool_pcv_deposit"
+    ]
+    volatile_liquidity_pool_pcv_deposit: FrozenPCVDeposit = previous_state[
         "volatile_liquidity_pool_pcv_deposit"
     ]
-    fei_liquidity_pool_user_deposit: UserDeposit = previous_state["fei_liquidity_pool_user_deposit"]
-    volatile_liquidity_pool_user_deposit: UserDeposit = previous_state[
+    fei_liquidity_pool_user_deposit: FrozenUserDeposit = previous_state[
+        "fei_liquidity_pool_user_deposit"
+    ]
+    volatile_liquidity_pool_user_deposit: FrozenUserDeposit = previous_state[
         "volatile_liquidity_pool_user_deposit"
     ]
-    k = previous_state["liquidity_pool_invariant"]
+    liquidity_pool_registry: LiquidityPoolRegistry = previous_state["liquidity_pool_registry"]
     fei_price = previous_state["fei_price"]
     volatile_asset_price = previous_state["volatile_asset_price"]
 
-    # Liquidity Pool imbalance
-    target_fei_balance = math.sqrt(k * volatile_asset_price / fei_price)
-    target_volatile_asset_balance = math.sqrt(k * fei_price / volatile_asset_price)
-
     current_fei_balance = get_total_fei_balance(previous_state)
-    delta_fei_balance = target_fei_balance - current_fei_balance
-
     current_volatile_asset_balance = get_total_volatile_asset_balance(previous_state)
-    delta_volatile_asset_balance = target_volatile_asset_balance - current_volatile_asset_balance
 
     # Calculate protocol's share of the total liquidity pool liquidity
     protocol_liquidity_share = fei_liquidity_pool_pcv_deposit.balance / current_fei_balance
 
-    assert approx_eq(
-        target_fei_balance * target_volatile_asset_balance, k, abs_tol=1
-    ), f"Constant product invariant broken: off by {target_fei_balance * target_volatile_asset_balance - k}"
-
-    """
-    Collect Uniswap V2 style trading fees
-    Fees collected on incoming asset
-    See https://docs.uniswap.org/whitepaper.pdf:
-    (x1 - 0.003 · xin)) · y1 >= x0 · y0
-    """
-    trading_fees = 0
-    if delta_fei_balance > 0:
-        # Liquidity pool is a sink for FEI
-        # Aggregate trading fees collected on incoming FEI
-        trading_fees_balance = liquidity_pool_trading_fee * abs(delta_fei_balance)
-        delta_fei_balance += trading_fees_balance
-        trading_fees = trading_fees_balance * fei_price
-    else:
-        # Liquidity pool is a source of FEI
-        # Aggregate trading fees collected on incoming volatile asset
-        trading_fees_balance = liquidity_pool_trading_fee * abs(delta_volatile_asset_balance)
-        delta_volatile_asset_balance += trading_fees_balance
-        trading_fees = trading_fees_balance * volatile_asset_price
-
-    updated_fei_balance = current_fei_balance + delta_fei_balance
-    updated_volatile_asset_balance = current_volatile_asset_balance + delta_volatile_asset_balance
-
-    k = updated_fei_balance * updated_volatile_asset_balance
-    liquidity_pool_tvl = (
-        updated_fei_balance * fei_price + updated_volatile_asset_balance * volatile_asset_price
+    pools = constant_function_market_maker(
+        **get_liquidity_pools(
+            previous_state,
+            liquidity_pool_registry,
+            dt,
+            fei_balance=current_fei_balance,
+            asset_balance=current_volatile_asset_balance,
+            invariant=previous_state["liquidity_pool_invariant"],
+            trading_fee=liquidity_pool_trading_fee,
+            asset_price=volatile_asset_price,
+            asset_price_reference=previous_state["liquidity_pool_volatile_asset_price_reference"],
+        ),
+        fei_price=fei_price,
+        dt=dt,
     )
-    price_ratio = state_history[0][0]["volatile_asset_price"] / volatile_asset_price
-    impermanent_loss = 2 * math.sqrt(price_ratio) / (1 + price_ratio) - 1
-    yield_rate: APR = trading_fees / liquidity_pool_tvl * 365 / dt
+    # NOTE The FEI-Volatile Liquidity Pool is at index 0, followed by the registry pools
+    updated_fei_balance = float(pools["fei_balance"][0])
+    updated_volatile_asset_balance = float(pools["asset_balance"][0])
+    effective_yield_rate = float(pools["effective_yield_rate"][0])
 
     # Update PCV Deposit LP balance
-    volatile_liquidity_pool_pcv_deposit.set_balance(
+    volatile_liquidity_pool_pcv_deposit = volatile_liquidity_pool_pcv_deposit.set_balance(
         updated_volatile_asset_balance * protocol_liquidity_share, volatile_asset_price
     )
-    fei_liquidity_pool_pcv_deposit.set_balance(
+    fei_liquidity_pool_pcv_deposit = fei_liquidity_pool_pcv_deposit.set_balance(
         updated_fei_balance * protocol_liquidity_share, fei_price
     )
 
     # Update User Deposit LP balance
-    volatile_liquidity_pool_user_deposit.set_balance(
+    volatile_liquidity_pool_user_deposit = volatile_liquidity_pool_user_deposit.set_balance(
         updated_volatile_asset_balance * (1 - protocol_liquidity_share),
         volatile_asset_price,
     )
-    fei_liquidity_pool_user_deposit.set_balance(
+    fei_liquidity_pool_user_deposit = fei_liquidity_pool_user_deposit.set_balance(
         updated_fei_balance * (1 - protocol_liquidity_share), fei_price
     )
 
     # Update Deposit LP yield rates
-    effective_yield_rate = max(0, yield_rate - abs(impermanent_loss))
-    volatile_liquidity_pool_pcv_deposit.yield_rate = effective_yield_rate
-    fei_liquidity_pool_pcv_deposit.yield_rate = effective_yield_rate
-    volatile_liquidity_pool_user_deposit.yield_rate = effective_yield_rate
-    fei_liquidity_pool_user_deposit.yield_rate = effective_yield_rate
+    volatile_liquidity_pool_pcv_deposit = volatile_liquidity_pool_pcv_deposit.set_yield_rate(
+        effective_yield_rate
+    )
+    fei_liquidity_pool_pcv_deposit = fei_liquidity_pool_pcv_deposit.set_yield_rate(
+        effective_yield_rate
+    )
+    volatile_liquidity_pool_user_deposit = volatile_liquidity_pool_user_deposit.set_yield_rate(
+        effective_yield_rate
+    )
+    fei_liquidity_pool_user_deposit = fei_liquidity_pool_user_deposit.set_yield_rate(
+        effective_yield_rate
+    )
+
+    # Total FEI sourced from or sinked to all Liquidity Pools
+    delta_fei_balance = float(pools["delta_fei_balance"].sum())
 
     return {
         "liquidity_pool_fei_source_sink": -delta_fei_balance,
         # Assumes any FEI released into circulating supply is redeemed
         "fei_minted_redeemed": delta_fei_balance,
-        "liquidity_pool_invariant": k,
-        "liquidity_pool_tvl": liquidity_pool_tvl,
-        "liquidity_pool_impermanent_loss": impermanent_loss,
-        "liquidity_pool_trading_fees": trading_fees,
+        "liquidity_pool_invariant": float(pools["invariant"][0]),
+        "liquidity_pool_tvl": float(pools["tvl"][0]),
+        "liquidity_pool_impermanent_loss": float(pools["impermanent_loss"][0]),
+        "liquidity_pool_trading_fees": float(pools["trading_fees"][0]),
+        "liquidity_pool_registry": update_liquidity_pool_registry(liquidity_pool_registry, pools),
         # PCV Deposit and User Deposit updates
         "fei_liquidity_pool_pcv_deposit": fei_liquidity_pool_pcv_deposit,
         "volatile_liquidity_pool_pcv_deposit": volatile_liquidity_pool_pcv_deposit,
@@ -129,9 +128,177 @@ def policy_constant_function_market_maker(
     }
 
 
+def get_liquidity_pool_asset_prices(
+    previous_state: StateVariables,
+    liquidity_pool_registry: LiquidityPoolRegistry,
+    dt,
+) -> np.ndarray:
+    """## Get Liquidity Pool Asset Prices
+    Get the asset price of each pool of a `LiquidityPoolRegistry`, with shape `(pools, *shape)`
+    where the `run` State Variable has shape `shape` (a scalar, or an array of Monte Carlo runs).
+
+    The asset price of a pool is sampled from its `asset_price_process` if set,
+    otherwise it is the `<asset>_asset_price` State Variable.
+    """
+    runs = previous_state["run"]
+    timestep = previous_state["timestep"] * dt
+
+    asset_prices = []
+    for asset, process in zip(
+        liquidity_pool_registry.assets, liquidity_pool_registry.asset_price_processes
+    ):
+        if process is None:
+            asset_price = previous_state[asset + "_asset_price"]
+        elif np.ndim(runs) == 0:
+            asset_price = process(runs, timestep)
+        elif isinstance(process, ExogenousProcess):
+            asset_price = process.sample(runs, timestep)
+        else:
+            asset_price = [process(run, timestep) for run in runs]
+        asset_prices.append(np.broadcast_to(np.asarray(asset_price, dtype=float), np.shape(runs)))
+
+    return np.array(asset_prices, dtype=float).reshape(
+        (len(liquidity_pool_registry),) + np.shape(runs)
+    )
+
+
+def get_liquidity_pools(
+    previous_state: StateVariables,
+    liquidity_pool_registry: LiquidityPoolRegistry,
+    dt,
+    **primary_pool,
+) -> Dict[str, np.ndarray]:
+    """## Get Liquidity Pools
+    Stack the fields of a primary Liquidity Pool, passed as keyword arguments (scalars, or arrays of Monte Carlo runs),
+    at index 0 followed by the pools of a `LiquidityPoolRegistry`, into arrays with shape `(1 + pools, *shape)`
+    for use in `constant_function_market_maker(...)`.
+
+    The asset price of each registry pool is given by `get_liquidity_pool_asset_prices(...)`.
+    """
+    shape = (len(liquidity_pool_registry),) + np.shape(primary_pool["fei_balance"])
+    registry_fields = {
+        field: liquidity_pool_registry.field(field)
+        for field in [
+            "fei_balance",
+            "asset_balance",
+            "invariant",
+            "trading_fee",
+            "asset_price_reference",
+        ]
+    }
+    registry_fields["asset_price"] = get_liquidity_pool_asset_prices(
+        previous_state, liquidity_pool_registry, dt
+    ).reshape(shape)
+
+    return {
+        field: np.concatenate(
+            [
+                np.broadcast_to(np.asarray(value, dtype=float), shape[1:])[np.newaxis],
+                registry_fields[field],
+            ]
+        )
+        for field, value in primary_pool.items()
+    }
+
+
+def constant_function_market_maker(
+    fei_balance,
+    asset_balance,
+    invariant,
+    trading_fee,
+    asset_price,
+    asset_price_reference,
+    fei_price,
+    dt,
+) -> Dict[str, np.ndarray]:
+    """## Constant Function Market Maker (CFMM)
+    Rebalance Uniswap style constant product Liquidity Pools to the FEI and asset prices,
+    for arrays of pools (and Monte Carlo runs) at once, such that the cost of an update is independent of the number of pools.
+
+    Arguments are arrays with the pool as the first axis, see `get_liquidity_pools(...)`, and broadcast against each other.
+
+    Returns:
+        A dictionary of arrays for each pool:
+        * `fei_balance`, `asset_balance`, and `invariant`: the updated pool reserves and constant product invariant
+        * `delta_fei_balance`: the FEI sinked to (positive) or sourced from (negative) the pool
+        * `tvl`, `impermanent_loss`, and `trading_fees`: the updated pool metrics
+        * `effective_yield_rate`: the APR of liquidity provision, net of impermanent loss
+    """
+    # Liquidity Pool imbalance
+    target_fei_balance = np.sqrt(invariant * asset_price / fei_price)
+    target_asset_balance = np.sqrt(invariant * fei_price / asset_price)
+
+    delta_fei_balance = target_fei_balance - fei_balance
+    delta_asset_balance = target_asset_balance - asset_balance
+
+    assert np.all(
+        np.isclose(target_fei_balance * target_asset_balance, invariant, rtol=1e-12, atol=1)
+    ), f"Constant product invariant broken: off by {target_fei_balance * target_asset_balance - invariant}"
+
+    """
+    Collect Uniswap V2 style trading fees
+    Fees collected on incoming asset
+    See https://docs.uniswap.org/whitepaper.pdf:
+    (x1 - 0.003 · xin)) · y1 >= x0 · y0
+    """
+    # Liquidity pool is a sink for FEI: trading fees collected on incoming FEI,
+    # otherwise a source of FEI: trading fees collected on incoming asset
+    liquidity_pool_sink = delta_fei_balance > 0
+    fei_trading_fees_balance = trading_fee * np.abs(delta_fei_balance)
+    asset_trading_fees_balance = trading_fee * np.abs(delta_asset_balance)
+    delta_fei_balance = np.where(
+        liquidity_pool_sink, delta_fei_balance + fei_trading_fees_balance, delta_fei_balance
+    )
+    delta_asset_balance = np.where(
+        liquidity_pool_sink, delta_asset_balance, delta_asset_balance + asset_trading_fees_balance
+    )
+    trading_fees = np.where(
+        liquidity_pool_sink,
+        fei_trading_fees_balance * fei_price,
+        asset_trading_fees_balance * asset_price,
+    )
+
+    updated_fei_balance = fei_balance + delta_fei_balance
+    updated_asset_balance = asset_balance + delta_asset_balance
+
+    tvl = updated_fei_balance * fei_price + updated_asset_balance * asset_price
+    price_ratio = asset_price_reference / asset_price
+    impermanent_loss = 2 * np.sqrt(price_ratio) / (1 + price_ratio) - 1
+    yield_rate: APR = trading_fees / tvl * 365 / dt
+
+    return {
+        "fei_balance": updated_fei_balance,
+        "asset_balance": updated_asset_balance,
+        "invariant": updated_fei_balance * updated_asset_balance,
+        "delta_fei_balance": delta_fei_balance,
+        "tvl": tvl,
+        "impermanent_loss": impermanent_loss,
+        "trading_fees": trading_fees,
+        "effective_yield_rate": np.maximum(0, yield_rate - np.abs(impermanent_loss)),
+    }
+
+
+def update_liquidity_pool_registry(
+    liquidity_pool_registry: LiquidityPoolRegistry, pools: Dict[str, np.ndarray]
+) -> LiquidityPoolRegistry:
+    """## Update Liquidity Pool Registry
+    Create an updated `LiquidityPoolRegistry` from the result of `constant_function_market_maker(...)`,
+    excluding the primary Liquidity Pool at index 0.
+    """
+    return liquidity_pool_registry.replace(
+        fei_balance=pools["fei_balance"][1:],
+        asset_balance=pools["asset_balance"][1:],
+        invariant=pools["invariant"][1:],
+        tvl=pools["tvl"][1:],
+        impermanent_loss=pools["impermanent_loss"][1:],
+        trading_fees=pools["trading_fees"][1:],
+        fei_source_sink=-pools["delta_fei_balance"][1:],
+    )
+
+
 def update_fei_liquidity(
     previous_state,
-    updated_fei_liquidity_pool_user_deposit: UserDeposit,
+    updated_fei_liquidity_pool_user_deposit: FrozenUserDeposit,
 ):
     """## Update FEI Liquidity
     A State Update Function that updates the relevant liquidity pool State Variables including the Volatile Asset Liquidity Pool User Deposit balance
@@ -140,10 +307,12 @@ def update_fei_liquidity(
     # State Variables
     liquidity_pool_invariant = previous_state["liquidity_pool_invariant"]
     liquidity_pool_liquidity_tokens = previous_state["liquidity_pool_liquidity_tokens"]
-    volatile_liquidity_pool_user_deposit: UserDeposit = previous_state[
+    volatile_liquidity_pool_user_deposit: FrozenUserDeposit = previous_state[
         "volatile_liquidity_pool_user_deposit"
     ]
-    fei_liquidity_pool_user_deposit: UserDeposit = previous_state["fei_liquidity_pool_user_deposit"]
+    fei_liquidity_pool_user_deposit: FrozenUserDeposit = previous_state[
+        "fei_liquidity_pool_user_deposit"
+    ]
 
     fei_price = previous_state["fei_price"]
     volatile_asset_price = previous_state["volatile_asset_price"]
@@ -171,8 +340,10 @@ def update_fei_liquidity(
         assert ds >= 0
         assert dv >= 0
         liquidity_pool_liquidity_tokens += dv
-        volatile_liquidity_pool_user_deposit.deposit(dr, volatile_asset_price)
-        fei_liquidity_pool_user_deposit.deposit(ds, fei_price)
+        volatile_liquidity_pool_user_deposit = volatile_liquidity_pool_user_deposit.deposit(
+            dr, volatile_asset_price
+        )
+        fei_liquidity_pool_user_deposit = fei_liquidity_pool_user_deposit.deposit(ds, fei_price)
     elif user_fei_balance_delta < 0:
         dr, ds, dv = uniswap.remove_liquidity(
             reserve_balance=total_volatile_asset_balance,
@@ -186,8 +357,12 @@ def update_fei_liquidity(
         assert ds <= 0
         assert dv <= 0
         liquidity_pool_liquidity_tokens += dv
-        volatile_liquidity_pool_user_deposit.withdraw(abs(dr), volatile_asset_price)
-        fei_liquidity_pool_user_deposit.withdraw(abs(ds), fei_price)
+        volatile_liquidity_pool_user_deposit = volatile_liquidity_pool_user_deposit.withdraw(
+            abs(dr), volatile_asset_price
+        )
+        fei_liquidity_pool_user_deposit = fei_liquidity_pool_user_deposit.withdraw(
+            abs(ds), fei_price
+        )
     else:
         return {
             "fei_liquidity_pool_user_deposit": fei_liquidity_pool_user_deposit,
@@ -196,9 +371,14 @@ def update_fei_liquidity(
             "liquidity_pool_liquidity_tokens": liquidity_pool_liquidity_tokens,
         }
 
+    updated_state = {
+        **previous_state,
+        "fei_liquidity_pool_user_deposit": fei_liquidity_pool_user_deposit,
+        "volatile_liquidity_pool_user_deposit": volatile_liquidity_pool_user_deposit,
+    }
     liquidity_pool_invariant = get_total_fei_balance(
-        previous_state
-    ) * get_total_volatile_asset_balance(previous_state)
+        updated_state
+    ) * get_total_volatile_asset_balance(updated_state)
 
     return {
         "fei_liquidity_pool_user_deposit": fei_liquidity_pool_user_deposit,
@@ -4,13 +4,19 @@ to model the FEI Savings Rate competing yield opportunity that exists for the FE
 """
 
 import numpy as np
-import pandas as pd
 
-from model.types import PCVDeposit, Timestep, UserDeposit
+from model.types import FrozenPCVDeposit, FrozenUserDeposit, RollingRegressionBuffer
 from model.constants import blocks_per_year
 from model.system_parameters import Parameters
+from model.utils import lookback
 
 
+@lookback(
+    "volatile_asset_price_history",
+    value="volatile_asset_price",
+    window="volatile_asset_risk_metric_time_window",
+    history=RollingRegressionBuffer,
+)
 def policy_money_market(params: Parameters, substep, state_history, previous_state):
     """## Money Market Policy
     The Compound lending market "Compound Jump Rate Model", shared by a number of lending markets including Aave,
@@ -42,30 +48,25 @@ def policy_money_market(params: Parameters, substep, state_history, previous_sta
     # State Variables
     run = previous_state["run"]
     timestep = previous_state["timestep"]
-    fei_money_market_pcv_deposit: PCVDeposit = previous_state["fei_money_market_pcv_deposit"]
-    fei_money_market_user_deposit: UserDeposit = previous_state["fei_money_market_user_deposit"]
+    fei_money_market_pcv_deposit: FrozenPCVDeposit = previous_state["fei_money_market_pcv_deposit"]
+    fei_money_market_user_deposit: FrozenUserDeposit = previous_state[
+        "fei_money_market_user_deposit"
+    ]
+    volatile_asset_price_history: RollingRegressionBuffer = previous_state[
+        "volatile_asset_price_history"
+    ]
 
     # Calculate total money market balance as combination of protocol- and user-supplied FEI
     balance = fei_money_market_pcv_deposit.balance + fei_money_market_user_deposit.balance
 
-    # Get volatile asset (va) price series
-    va_price_series = pd.Series(substate[-1]["volatile_asset_price"] for substate in state_history)
-
     # Volatile asset price trend risk metric = price slope / average price
     va_price_mean = (
         previous_state["volatile_asset_price_mean"] * (timestep - 1)
         + previous_state["volatile_asset_price"]
     ) / timestep
-    time_window: Timestep = params["volatile_asset_risk_metric_time_window"]
-    va_price_slope = (
-        np.polyfit(
-            range(len(va_price_series[-min(timestep, time_window) : -1])),
-            va_price_series[-min(timestep, time_window) : -1],
-            1,
-        )[0]
-        if timestep > 2
-        else 0
-    )
+    # Least-squares slope of the volatile asset (va) price series over the last `volatile_asset_risk_metric_time_window` timesteps,
+    # excluding the most recent price, calculated in O(1) from the rolling sufficient statistics
+    va_price_slope = volatile_asset_price_history.slope(exclude_latest=True) if timestep > 2 else 0
     va_risk_metric = -va_price_slope / va_price_mean
     # Min-max normalization
     va_risk_metric_min = min(va_risk_metric, previous_state["volatile_asset_risk_metric_min"])
@@ -111,8 +112,10 @@ def policy_money_market(params: Parameters, substep, state_history, previous_sta
     # State Update
     # Calculate effective yield rate on total balance
     effective_yield_rate = utilization_rate * supply_interest_rate
-    fei_money_market_pcv_deposit.yield_rate = effective_yield_rate
-    fei_money_market_user_deposit.yield_rate = effective_yield_rate
+    fei_money_market_pcv_deposit = fei_money_market_pcv_deposit.set_yield_rate(effective_yield_rate)
+    fei_money_market_user_deposit = fei_money_market_user_deposit.set_yield_rate(
+        effective_yield_rate
+    )
 
     return {
         "volatile_asset_risk_metric": va_risk_metric,
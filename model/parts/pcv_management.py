@@ -6,10 +6,24 @@ import logging
 import numpy as np
 from model.system_parameters import Parameters
 from model.types import (
-    PCVDeposit,
+    FrozenPCVDeposit,
+    FrozenUserDeposit,
+    Percentage,
     USD,
 )
+from typing import List
 from model.system_parameters import Parameters
+import model.parts.uniswap as uniswap
+import model.parts.liquidity_pools as liquidity_pools
+
+
+pcv_rebalancing_deposit_keys = [
+    "volatile_idle_pcv_deposit",
+    "volatile_yield_bearing_pcv_deposit",
+    "stable_idle_pcv_deposit",
+    "stable_yield_bearing_pcv_deposit",
+]
+"""The PCV Deposits rebalanced by `pcv_deposit_rebalancing_strategy(...)`, in order of its arguments and return values"""
 
 
 def policy_pcv_rebalancing_target_stable_pcv(
@@ -52,20 +66,12 @@ def policy_pcv_rebalancing_target_stable_pcv(
     volatile_asset_price = previous_state["volatile_asset_price"]
     stable_asset_price = previous_state["stable_asset_price"]
 
-    # Relevant PCV Deposits
-    stable_idle_pcv_deposit: PCVDeposit = previous_state["stable_idle_pcv_deposit"]
-    stable_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
-        "stable_yield_bearing_pcv_deposit"
-    ]
-    volatile_idle_pcv_deposit: PCVDeposit = previous_state["volatile_idle_pcv_deposit"]
-    volatile_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
-        "volatile_yield_bearing_pcv_deposit"
-    ]
-
     # Check if target defined and policy should be executed
     if not target_stable_pcv_ratio:
         return {}
 
+    rebalancing_order = None
+
     # The stable PCV ratio is the % of PCV value that is backed by stable assets
     stable_allocation = stable_pcv_ratio
     volatile_allocation = 1 - stable_pcv_ratio
@@ -109,23 +115,9 @@ def policy_pcv_rebalancing_target_stable_pcv(
             volatile_asset_target_value_change / volatile_asset_price
         )
 
-        pcv_deposit_rebalancing_strategy(
-            volatile_asset_price=volatile_asset_price,
-            stable_asset_price=stable_asset_price,
-            volatile_idle_pcv_deposit=volatile_idle_pcv_deposit,
-            volatile_yield_bearing_pcv_deposit=volatile_yield_bearing_pcv_deposit,
-            stable_idle_pcv_deposit=stable_idle_pcv_deposit,
-            stable_yield_bearing_pcv_deposit=stable_yield_bearing_pcv_deposit,
-            total_stable_asset_balance_change=total_stable_asset_balance_change,
-            total_volatile_asset_balance_change=total_volatile_asset_balance_change,
-        )
+        rebalancing_order = (total_stable_asset_balance_change, total_volatile_asset_balance_change)
 
-    return {
-        "stable_idle_pcv_deposit": stable_idle_pcv_deposit,
-        "stable_yield_bearing_pcv_deposit": stable_yield_bearing_pcv_deposit,
-        "volatile_idle_pcv_deposit": volatile_idle_pcv_deposit,
-        "volatile_yield_bearing_pcv_deposit": volatile_yield_bearing_pcv_deposit,
-    }
+    return execute_pcv_rebalancing_order(params, previous_state, rebalancing_order)
 
 
 def policy_pcv_rebalancing_target_stable_backing(
@@ -169,20 +161,12 @@ def policy_pcv_rebalancing_target_stable_backing(
     total_stable_asset_pcv = previous_state["total_stable_asset_pcv"]
     total_user_circulating_fei = previous_state["total_user_circulating_fei"]
 
-    # Relevant PCV Deposits
-    stable_idle_pcv_deposit: PCVDeposit = previous_state["stable_idle_pcv_deposit"]
-    stable_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
-        "stable_yield_bearing_pcv_deposit"
-    ]
-    volatile_idle_pcv_deposit: PCVDeposit = previous_state["volatile_idle_pcv_deposit"]
-    volatile_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
-        "volatile_yield_bearing_pcv_deposit"
-    ]
-
     # Check if target defined and policy should be executed
     if not target_stable_backing_ratio:
         return {}
 
+    rebalancing_order = None
+
     # Calculate rebalancing conditions
     ratio_less_than_or_greater_than_target = target_rebalancing_condition(
         stable_backing_ratio, target_stable_backing_ratio
@@ -208,32 +192,383 @@ def policy_pcv_rebalancing_target_stable_backing(
             volatile_asset_target_value_change / volatile_asset_price
         )
 
-        pcv_deposit_rebalancing_strategy(
-            volatile_asset_price,
-            stable_asset_price,
-            volatile_idle_pcv_deposit,
-            volatile_yield_bearing_pcv_deposit,
-            stable_idle_pcv_deposit,
-            stable_yield_bearing_pcv_deposit,
+        rebalancing_order = (total_stable_asset_balance_change, total_volatile_asset_balance_change)
+
+    return execute_pcv_rebalancing_order(params, previous_state, rebalancing_order)
+
+
+def execute_pcv_rebalancing_order(params: Parameters, previous_state, rebalancing_order=None):
+    """## Execute PCV Rebalancing Order
+    Execute a new PCV rebalancing order, a tuple of the total stable and volatile asset balance changes to meet the target,
+    and/or the outstanding order, returning the updated PCV Deposits and order State Variables.
+
+    If the `pcv_rebalancing_execution_duration` parameter is `None`, a new order is executed immediately at 100% efficiency.
+
+    Otherwise, a new order replaces any outstanding order, and is executed in equal tranches at each timestep
+    over the execution duration. Each tranche is priced against the live pool reserves,
+    and limited to the part of the tranche within the `pcv_rebalancing_slippage_threshold` parameter
+    and the balance of the sell side PCV Deposits, see `get_pcv_rebalancing_tranche(...)`.
+    The part not executed is carried over to the remaining tranches,
+    and any remainder at the end of the execution duration is cancelled.
+
+    The executed tranche is traded through the Liquidity Pool and the Peg Stability Module,
+    updating the pool reserves and invariant, see `pcv_deposit_rebalancing_trade(...)`.
+    """
+    # Parameters
+    dt = params["dt"]
+    execution_duration = params["pcv_rebalancing_execution_duration"]
+    slippage_threshold = params["pcv_rebalancing_slippage_threshold"]
+    liquidity_pool_trading_fee = params["liquidity_pool_trading_fee"]
+
+    # State Variables
+    volatile_asset_price = previous_state["volatile_asset_price"]
+    stable_asset_price = previous_state["stable_asset_price"]
+    fei_price = previous_state["fei_price"]
+    pcv_deposits = [previous_state[key] for key in pcv_rebalancing_deposit_keys]
+
+    if execution_duration is None:
+        if rebalancing_order:
+            pcv_deposits = pcv_deposit_rebalancing_strategy(
+                volatile_asset_price, stable_asset_price, *pcv_deposits, *rebalancing_order
+            )
+        return dict(zip(pcv_rebalancing_deposit_keys, pcv_deposits))
+
+    if rebalancing_order:
+        order_stable_asset_balance, order_volatile_asset_balance = rebalancing_order
+        order_timesteps_remaining = max(int(execution_duration / dt), 1)
+    else:
+        order_stable_asset_balance = previous_state["pcv_rebalancing_order_stable_asset_balance"]
+        order_volatile_asset_balance = previous_state[
+            "pcv_rebalancing_order_volatile_asset_balance"
+        ]
+        order_timesteps_remaining = previous_state["pcv_rebalancing_order_timesteps_remaining"]
+
+    slippage = 0.0
+    liquidity_pool_updates = {}
+    if order_timesteps_remaining:
+        # Execute the tranche of the order for this timestep, within the slippage threshold
+        tranche_stable_asset_balance = order_stable_asset_balance / order_timesteps_remaining
+        tranche_volatile_asset_balance = order_volatile_asset_balance / order_timesteps_remaining
+        fill, slippage = get_pcv_rebalancing_tranche(
+            tranche_stable_asset_balance,
+            tranche_volatile_asset_balance,
+            stable_asset_price=stable_asset_price,
+            fei_price=fei_price,
+            fei_balance=liquidity_pools.get_total_fei_balance(previous_state),
+            volatile_asset_balance=liquidity_pools.get_total_volatile_asset_balance(previous_state),
+            trade_fee=liquidity_pool_trading_fee,
+            slippage_threshold=slippage_threshold,
+            stable_asset_pcv_balance=get_pcv_rebalancing_balance(pcv_deposits[2:]),
+            volatile_asset_pcv_balance=get_pcv_rebalancing_balance(pcv_deposits[:2]),
+        )
+        fill, slippage = float(fill), float(slippage)
+        if fill:
+            pcv_deposits, liquidity_pool_updates = pcv_deposit_rebalancing_trade(
+                params,
+                previous_state,
+                pcv_deposits,
+                fill * tranche_stable_asset_balance,
+                fill * tranche_volatile_asset_balance,
+            )
+        order_stable_asset_balance -= fill * tranche_stable_asset_balance
+        order_volatile_asset_balance -= fill * tranche_volatile_asset_balance
+        order_timesteps_remaining -= 1
+
+        if not order_timesteps_remaining:
+            if order_stable_asset_balance or order_volatile_asset_balance:
+                logging.debug("PCV rebalancing order remainder cancelled at slippage threshold")
+            order_stable_asset_balance = 0.0
+            order_volatile_asset_balance = 0.0
+
+    return {
+        **dict(zip(pcv_rebalancing_deposit_keys, pcv_deposits)),
+        **liquidity_pool_updates,
+        "pcv_rebalancing_order_stable_asset_balance": order_stable_asset_balance,
+        "pcv_rebalancing_order_volatile_asset_balance": order_volatile_asset_balance,
+        "pcv_rebalancing_order_timesteps_remaining": order_timesteps_remaining,
+        "pcv_rebalancing_slippage": slippage,
+    }
+
+
+def get_pcv_rebalancing_tranche(
+    total_stable_asset_balance_change,
+    total_volatile_asset_balance_change,
+    stable_asset_price: USD,
+    fei_price: USD,
+    fei_balance,
+    volatile_asset_balance,
+    trade_fee: Percentage,
+    slippage_threshold: Percentage,
+    stable_asset_pcv_balance=np.inf,
+    volatile_asset_pcv_balance=np.inf,
+):
+    """## Get PCV Rebalancing Tranche
+    Price a PCV rebalancing tranche traded through the FEI / Volatile Asset Liquidity Pool,
+    using `model.parts.uniswap.get_slippage(...)` against the pool reserves.
+
+    Volatile Asset is sold into the pool for FEI, and Stable Asset is used to mint FEI
+    in the Peg Stability Module at the Stable Asset price, which is sold into the pool for Volatile Asset,
+    see `get_pcv_rebalancing_trade(...)`.
+
+    Accepts scalars or Numpy arrays of Monte Carlo runs, e.g. in `model.batch.kernels`.
+
+    Args:
+        stable_asset_pcv_balance: The Stable Asset balance of the sell side PCV Deposits, see `get_pcv_rebalancing_balance(...)`
+        volatile_asset_pcv_balance: The Volatile Asset balance of the sell side PCV Deposits
+
+    Returns:
+        A tuple of the fraction of the tranche executed within the slippage threshold and the sell side PCV balance,
+        and the realised slippage of the executed tranche, relative to the pool spot price and including the trading fee
+    """
+    volatile_to_stable = (np.asarray(total_stable_asset_balance_change) >= 0) & (
+        np.asarray(total_volatile_asset_balance_change) < 0
+    )
+    input_amount = np.where(
+        volatile_to_stable,
+        np.abs(total_volatile_asset_balance_change),
+        np.abs(total_stable_asset_balance_change) * stable_asset_price / fei_price,
+    )
+    input_balance = np.where(volatile_to_stable, volatile_asset_balance, fei_balance)
+    output_balance = np.where(volatile_to_stable, fei_balance, volatile_asset_balance)
+
+    # Largest input within the slippage threshold, including the trading fee
+    max_input_amount = uniswap.get_max_input_amount(slippage_threshold, input_balance, trade_fee)
+    executed_input_amount = np.minimum(input_amount, max_input_amount)
+    # Largest input within the balance of the sell side PCV Deposits
+    executed_input_amount = np.minimum(
+        executed_input_amount,
+        np.where(
+            volatile_to_stable,
+            volatile_asset_pcv_balance,
+            stable_asset_pcv_balance * stable_asset_price / fei_price,
+        ),
+    )
+
+    slippage = np.where(
+        executed_input_amount > 0,
+        uniswap.get_slippage(executed_input_amount, input_balance, output_balance, trade_fee),
+        0,
+    )
+    fill = np.divide(
+        executed_input_amount,
+        input_amount,
+        out=np.zeros_like(input_amount),
+        where=input_amount > 0,
+    )
+
+    return fill, slippage
+
+
+def get_pcv_rebalancing_trade(
+    total_stable_asset_balance_change,
+    total_volatile_asset_balance_change,
+    stable_asset_price: USD,
+    fei_price: USD,
+    fei_balance,
+    volatile_asset_balance,
+    trade_fee: Percentage,
+):
+    """## Get PCV Rebalancing Trade
+    Trade an executed PCV rebalancing tranche through the FEI / Volatile Asset Liquidity Pool,
+    using `model.parts.uniswap.get_input_price(...)` against the pool reserves.
+
+    Volatile Asset is sold into the pool for FEI, which the protocol redeems in the Peg Stability Module i.e. burns.
+    Stable Asset is moved into the Peg Stability Module to mint FEI at the Stable Asset price,
+    which is sold into the pool for Volatile Asset. The trading fee and slippage are retained by the pool.
+
+    NOTE The protocol mints and redeems FEI against its own PCV, so the Peg Stability Module PCV only changes
+    at the next timestep, when the pool is arbitraged back to the FEI and Volatile Asset prices
+    by `model.parts.liquidity_pools.policy_constant_function_market_maker(...)`
+    and the FEI sourced from or sinked to the pool is redeemed or minted in the Peg Stability Module.
+
+    Accepts scalars or Numpy arrays of Monte Carlo runs, e.g. in `model.batch.kernels`.
+
+    Returns:
+        A tuple of the updated pool FEI and Volatile Asset balances, the Volatile Asset PCV balance change,
+        and the FEI minted (positive) or redeemed (negative) in the Peg Stability Module
+    """
+    volatile_to_stable = (np.asarray(total_stable_asset_balance_change) >= 0) & (
+        np.asarray(total_volatile_asset_balance_change) < 0
+    )
+    volatile_asset_input_amount = np.where(
+        volatile_to_stable, np.abs(total_volatile_asset_balance_change), 0
+    )
+    fei_input_amount = np.where(
+        volatile_to_stable,
+        0,
+        np.abs(total_stable_asset_balance_change) * stable_asset_price / fei_price,
+    )
+
+    _dx, fei_output_amount = uniswap.get_input_price(
+        volatile_asset_input_amount, volatile_asset_balance, fei_balance, trade_fee
+    )
+    _dx, volatile_asset_output_amount = uniswap.get_input_price(
+        fei_input_amount, fei_balance, volatile_asset_balance, trade_fee
+    )
+
+    updated_fei_balance = fei_balance + fei_output_amount + fei_input_amount
+    updated_volatile_asset_balance = (
+        volatile_asset_balance + volatile_asset_input_amount + volatile_asset_output_amount
+    )
+    volatile_asset_balance_change = -volatile_asset_input_amount - volatile_asset_output_amount
+    fei_minted_redeemed = fei_input_amount + fei_output_amount
+
+    return (
+        updated_fei_balance,
+        updated_volatile_asset_balance,
+        volatile_asset_balance_change,
+        fei_minted_redeemed,
+    )
+
+
+def get_pcv_rebalancing_balance(pcv_deposits: List[FrozenPCVDeposit]):
+    """## Get PCV Rebalancing Balance
+    The balance available to rebalance from PCV Deposits,
+    including the yield accrued by yield-bearing deposits cashed out by the rebalancing strategy.
+    """
+    return sum(
+        deposit.balance + (deposit.yield_accrued if deposit.yield_rate > 0 else 0)
+        for deposit in pcv_deposits
+    )
+
+
+def withdraw_pcv_deposits(
+    pcv_deposits: List[FrozenPCVDeposit], amount, asset_price: USD
+) -> List[FrozenPCVDeposit]:
+    """## Withdraw PCV Deposits
+    Withdraw an amount from PCV Deposits in order of priority,
+    cashing out of yield-bearing deposits as in `pcv_deposit_rebalancing_strategy(...)`.
+
+    Returns:
+        The updated PCV Deposits
+    """
+    pcv_deposits = list(pcv_deposits)
+    for index, deposit in enumerate(pcv_deposits):
+        if amount:
+            if deposit.yield_rate > 0:
+                # Transfer yield to deposit balance
+                deposit, _ = deposit.transfer_yield(
+                    to=deposit,
+                    amount=deposit.yield_accrued,
+                    asset_price=asset_price,
+                )
+            withdrawal = min(amount, deposit.balance)
+            pcv_deposits[index] = deposit.withdraw(withdrawal, asset_price)
+            amount -= withdrawal
+    if amount > 0:
+        logging.debug("Not enough balance across all sell side deposits to rebalance!")
+    return pcv_deposits
+
+
+def pcv_deposit_rebalancing_trade(
+    params: Parameters,
+    previous_state,
+    pcv_deposits: List[FrozenPCVDeposit],
+    total_stable_asset_balance_change,
+    total_volatile_asset_balance_change,
+):
+    """## PCV Deposit Rebalancing Trade
+    Trade a PCV rebalancing tranche through the FEI / Volatile Asset Liquidity Pool and the Peg Stability Module,
+    see `get_pcv_rebalancing_trade(...)`, withdrawing from the sell side PCV Deposits in order of priority.
+
+    Stable Asset is moved into the Stable Idle PCV Deposit, the Peg Stability Module PCV Deposit,
+    and Volatile Asset bought from the pool is deposited in the Volatile Idle PCV Deposit.
+
+    The updated pool reserves are split between the Liquidity Pool PCV and User Deposits by the protocol's share of the pool liquidity,
+    so that the trading fee and slippage accrue to the Liquidity Providers, and the pool invariant is updated.
+
+    Returns:
+        A tuple of the updated PCV Deposits, in order of `pcv_rebalancing_deposit_keys`,
+        and a dictionary of the updated Liquidity Pool and Peg Stability Module State Variables
+    """
+    # Parameters
+    liquidity_pool_trading_fee = params["liquidity_pool_trading_fee"]
+
+    # State Variables
+    volatile_asset_price = previous_state["volatile_asset_price"]
+    stable_asset_price = previous_state["stable_asset_price"]
+    fei_price = previous_state["fei_price"]
+    fei_liquidity_pool_pcv_deposit: FrozenPCVDeposit = previous_state[
+        "fei_liquidity_pool_pcv_deposit"
+    ]
+    volatile_liquidity_pool_pcv_deposit: FrozenPCVDeposit = previous_state[
+        "volatile_liquidity_pool_pcv_deposit"
+    ]
+    fei_liquidity_pool_user_deposit: FrozenUserDeposit = previous_state[
+        "fei_liquidity_pool_user_deposit"
+    ]
+    volatile_liquidity_pool_user_deposit: FrozenUserDeposit = previous_state[
+        "volatile_liquidity_pool_user_deposit"
+    ]
+
+    current_fei_balance = liquidity_pools.get_total_fei_balance(previous_state)
+    protocol_liquidity_share = fei_liquidity_pool_pcv_deposit.balance / current_fei_balance
+
+    (
+        updated_fei_balance,
+        updated_volatile_asset_balance,
+        volatile_asset_balance_change,
+        fei_minted_redeemed,
+    ) = map(
+        float,
+        get_pcv_rebalancing_trade(
             total_stable_asset_balance_change,
             total_volatile_asset_balance_change,
+            stable_asset_price=stable_asset_price,
+            fei_price=fei_price,
+            fei_balance=current_fei_balance,
+            volatile_asset_balance=liquidity_pools.get_total_volatile_asset_balance(previous_state),
+            trade_fee=liquidity_pool_trading_fee,
+        ),
+    )
+
+    volatile_pcv_deposits, stable_pcv_deposits = pcv_deposits[:2], pcv_deposits[2:]
+    # PCV movement from volatile to stable
+    if total_stable_asset_balance_change >= 0 and total_volatile_asset_balance_change < 0:
+        volatile_pcv_deposits = withdraw_pcv_deposits(
+            volatile_pcv_deposits, abs(volatile_asset_balance_change), volatile_asset_price
+        )
+    # PCV movement from stable to volatile
+    else:
+        stable_asset_balance_change = abs(total_stable_asset_balance_change)
+        stable_pcv_deposits = withdraw_pcv_deposits(
+            stable_pcv_deposits, stable_asset_balance_change, stable_asset_price
+        )
+        stable_pcv_deposits[0] = stable_pcv_deposits[0].deposit(
+            stable_asset_balance_change, stable_asset_price
+        )
+        volatile_pcv_deposits[0] = volatile_pcv_deposits[0].deposit(
+            volatile_asset_balance_change, volatile_asset_price
         )
 
-    return {
-        "stable_idle_pcv_deposit": stable_idle_pcv_deposit,
-        "stable_yield_bearing_pcv_deposit": stable_yield_bearing_pcv_deposit,
-        "volatile_idle_pcv_deposit": volatile_idle_pcv_deposit,
-        "volatile_yield_bearing_pcv_deposit": volatile_yield_bearing_pcv_deposit,
+    liquidity_pool_updates = {
+        "fei_liquidity_pool_pcv_deposit": fei_liquidity_pool_pcv_deposit.set_balance(
+            updated_fei_balance * protocol_liquidity_share, fei_price
+        ),
+        "volatile_liquidity_pool_pcv_deposit": volatile_liquidity_pool_pcv_deposit.set_balance(
+            updated_volatile_asset_balance * protocol_liquidity_share, volatile_asset_price
+        ),
+        "fei_liquidity_pool_user_deposit": fei_liquidity_pool_user_deposit.set_balance(
+            updated_fei_balance * (1 - protocol_liquidity_share), fei_price
+        ),
+        "volatile_liquidity_pool_user_deposit": volatile_liquidity_pool_user_deposit.set_balance(
+            updated_volatile_asset_balance * (1 - protocol_liquidity_share),
+            volatile_asset_price,
+        ),
+        "liquidity_pool_invariant": updated_fei_balance * updated_volatile_asset_balance,
+        "fei_minted_redeemed": previous_state["fei_minted_redeemed"] + fei_minted_redeemed,
     }
 
+    return [*volatile_pcv_deposits, *stable_pcv_deposits], liquidity_pool_updates
+
 
 def pcv_deposit_rebalancing_strategy(
     volatile_asset_price: USD,
     stable_asset_price: USD,
-    volatile_idle_pcv_deposit: PCVDeposit,
-    volatile_yield_bearing_pcv_deposit: PCVDeposit,
-    stable_idle_pcv_deposit: PCVDeposit,
-    stable_yield_bearing_pcv_deposit: PCVDeposit,
+    volatile_idle_pcv_deposit: FrozenPCVDeposit,
+    volatile_yield_bearing_pcv_deposit: FrozenPCVDeposit,
+    stable_idle_pcv_deposit: FrozenPCVDeposit,
+    stable_yield_bearing_pcv_deposit: FrozenPCVDeposit,
     total_stable_asset_balance_change,
     total_volatile_asset_balance_change,
 ):
@@ -244,12 +579,15 @@ def pcv_deposit_rebalancing_strategy(
     Args:
         volatile_asset_price (USD): The volatile asset price
         stable_asset_price (USD): The stable asset price
-        volatile_idle_pcv_deposit (PCVDeposit): The idle volatile asset PCV Deposit
-        volatile_yield_bearing_pcv_deposit (PCVDeposit): The yield-bearing volatile asset PCV Deposit
-        stable_idle_pcv_deposit (PCVDeposit): The idle stable asset PCV Deposit
-        stable_yield_bearing_pcv_deposit (PCVDeposit): The yield-bearing stable asset PCV Deposit
+        volatile_idle_pcv_deposit (FrozenPCVDeposit): The idle volatile asset PCV Deposit
+        volatile_yield_bearing_pcv_deposit (FrozenPCVDeposit): The yield-bearing volatile asset PCV Deposit
+        stable_idle_pcv_deposit (FrozenPCVDeposit): The idle stable asset PCV Deposit
+        stable_yield_bearing_pcv_deposit (FrozenPCVDeposit): The yield-bearing stable asset PCV Deposit
         total_stable_asset_balance_change (_type_): The total stable asset balance change to meet target
         total_volatile_asset_balance_change (_type_): The total volatile asset balance change to meet target
+
+    Returns:
+        A tuple of the updated volatile idle, volatile yield-bearing, stable idle, and stable yield-bearing PCV Deposits
     """
     # Rebalancing Strategy
     # PCV deposits in tranches / order of priority for rebalancing
@@ -266,20 +604,20 @@ def pcv_deposit_rebalancing_strategy(
     if total_stable_asset_balance_change >= 0 and total_volatile_asset_balance_change < 0:
         balance_change = abs(total_volatile_asset_balance_change)
         # Try rebalance PCV from deposits in order of priority
-        for deposit in volatile_pcv_deposits:
+        for index, deposit in enumerate(volatile_pcv_deposits):
             if balance_change:
                 if deposit.yield_rate > 0:
                     logging.debug("Cashing out of yield-bearing deposit")
                     # Transfer yield to deposit balance
-                    deposit.transfer_yield(
+                    deposit, _ = deposit.transfer_yield(
                         to=deposit,
                         amount=deposit.yield_accrued,
                         asset_price=volatile_asset_price,
                     )
                 transfer_balance = min(balance_change, deposit.balance)
                 # Transfer from stable PCV to volatile idle PCV deposit
-                deposit.transfer(
-                    to=stable_idle_pcv_deposit,
+                volatile_pcv_deposits[index], stable_pcv_deposits[0] = deposit.transfer(
+                    to=stable_pcv_deposits[0],
                     amount=transfer_balance,
                     from_asset_price=volatile_asset_price,
                     to_asset_price=stable_asset_price,
@@ -294,20 +632,20 @@ def pcv_deposit_rebalancing_strategy(
     else:
         balance_change = abs(total_stable_asset_balance_change)
         # Try rebalance PCV from deposits in order of priority
-        for deposit in stable_pcv_deposits:
+        for index, deposit in enumerate(stable_pcv_deposits):
             if balance_change:
                 if deposit.yield_rate > 0:
                     logging.debug("Cashing out of yield-bearing deposit")
                     # Transfer yield to deposit balance
-                    deposit.transfer_yield(
+                    deposit, _ = deposit.transfer_yield(
                         to=deposit,
                         amount=deposit.yield_accrued,
                         asset_price=stable_asset_price,
                     )
                 transfer_balance = min(balance_change, deposit.balance)
                 # Transfer from volatile PCV to stable idle PCV deposit
-                deposit.transfer(
-                    to=volatile_idle_pcv_deposit,
+                stable_pcv_deposits[index], volatile_pcv_deposits[0] = deposit.transfer(
+                    to=volatile_pcv_deposits[0],
                     amount=transfer_balance,
                     from_asset_price=stable_asset_price,
                     to_asset_price=volatile_asset_price,
@@ -316,3 +654,5 @@ def pcv_deposit_rebalancing_strategy(
         # Check if balance remainder
         if balance_change > 0:
             logging.debug("Not enough balance across all sell side deposits to rebalance!")
+
+    return (*volatile_pcv_deposits, *stable_pcv_deposits)
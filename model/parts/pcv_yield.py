@@ -3,7 +3,7 @@ Implementation of PCV Yield policies, for example accrual, withdrawal, and reinv
 """
 
 from model.types import (
-    PCVDeposit,
+    FrozenPCVDeposit,
 )
 from model.system_parameters import Parameters
 import model.parts.liquidity_pools as liquidity_pools
@@ -19,15 +19,17 @@ def policy_yield_accrual(params: Parameters, substep, state_history, previous_st
     # State Variables
     liquidity_pool_trading_fees = previous_state["liquidity_pool_trading_fees"]
     fei_liquidity_pool_user_deposit = previous_state["fei_liquidity_pool_user_deposit"]
-    stable_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
+    stable_yield_bearing_pcv_deposit: FrozenPCVDeposit = previous_state[
         "stable_yield_bearing_pcv_deposit"
     ]
-    volatile_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
+    volatile_yield_bearing_pcv_deposit: FrozenPCVDeposit = previous_state[
         "volatile_yield_bearing_pcv_deposit"
     ]
-    fei_money_market_pcv_deposit: PCVDeposit = previous_state["fei_money_market_pcv_deposit"]
-    fei_liquidity_pool_pcv_deposit: PCVDeposit = previous_state["fei_liquidity_pool_pcv_deposit"]
-    volatile_liquidity_pool_pcv_deposit: PCVDeposit = previous_state[
+    fei_money_market_pcv_deposit: FrozenPCVDeposit = previous_state["fei_money_market_pcv_deposit"]
+    fei_liquidity_pool_pcv_deposit: FrozenPCVDeposit = previous_state[
+        "fei_liquidity_pool_pcv_deposit"
+    ]
+    volatile_liquidity_pool_pcv_deposit: FrozenPCVDeposit = previous_state[
         "volatile_liquidity_pool_pcv_deposit"
     ]
 
@@ -43,16 +45,24 @@ def policy_yield_accrual(params: Parameters, substep, state_history, previous_st
     protocol_liquidity_pool_trading_fees = protocol_liquidity_share * liquidity_pool_trading_fees
 
     # State Update
+    # NOTE accrue_yield() returns the updated PCV Deposit and the yield accrued
+    stable_yield_bearing_pcv_deposit, stable_yield = stable_yield_bearing_pcv_deposit.accrue_yield(
+        period_in_days=dt, asset_price=stable_asset_price
+    )
+    (
+        volatile_yield_bearing_pcv_deposit,
+        volatile_yield,
+    ) = volatile_yield_bearing_pcv_deposit.accrue_yield(
+        period_in_days=dt, asset_price=volatile_asset_price
+    )
+    fei_money_market_pcv_deposit, fei_yield = fei_money_market_pcv_deposit.accrue_yield(
+        period_in_days=dt, asset_price=fei_price
+    )
     pcv_yield = sum(
         [
-            # NOTE accrue_yield() directly updates PCV Deposit yield
-            stable_yield_bearing_pcv_deposit.accrue_yield(
-                period_in_days=dt, asset_price=stable_asset_price
-            ),
-            volatile_yield_bearing_pcv_deposit.accrue_yield(
-                period_in_days=dt, asset_price=volatile_asset_price
-            ),
-            fei_money_market_pcv_deposit.accrue_yield(period_in_days=dt, asset_price=fei_price),
+            stable_yield,
+            volatile_yield,
+            fei_yield,
             protocol_liquidity_pool_trading_fees,
         ]
     )
@@ -78,12 +88,12 @@ def policy_withdraw_yield(params: Parameters, substep, state_history, previous_s
 
     # State Variables
     timestep = previous_state["timestep"]
-    stable_idle_pcv_deposit: PCVDeposit = previous_state["stable_idle_pcv_deposit"]
-    volatile_idle_pcv_deposit: PCVDeposit = previous_state["volatile_idle_pcv_deposit"]
-    stable_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
+    stable_idle_pcv_deposit: FrozenPCVDeposit = previous_state["stable_idle_pcv_deposit"]
+    volatile_idle_pcv_deposit: FrozenPCVDeposit = previous_state["volatile_idle_pcv_deposit"]
+    stable_yield_bearing_pcv_deposit: FrozenPCVDeposit = previous_state[
         "stable_yield_bearing_pcv_deposit"
     ]
-    volatile_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
+    volatile_yield_bearing_pcv_deposit: FrozenPCVDeposit = previous_state[
         "volatile_yield_bearing_pcv_deposit"
     ]
     stable_asset_price = previous_state["stable_asset_price"]
@@ -96,12 +106,18 @@ def policy_withdraw_yield(params: Parameters, substep, state_history, previous_s
     # State Update
     timestep_equals_withdrawal_period = timestep % yield_withdrawal_period / dt == 0
     if timestep_equals_withdrawal_period:  # Periodic yield withdrawal
-        stable_yield_bearing_pcv_deposit.transfer_yield(
+        (
+            stable_yield_bearing_pcv_deposit,
+            stable_idle_pcv_deposit,
+        ) = stable_yield_bearing_pcv_deposit.transfer_yield(
             to=stable_idle_pcv_deposit,
             amount=stable_yield_bearing_pcv_deposit.yield_accrued,
             asset_price=stable_asset_price,
         )
-        volatile_yield_bearing_pcv_deposit.transfer_yield(
+        (
+            volatile_yield_bearing_pcv_deposit,
+            volatile_idle_pcv_deposit,
+        ) = volatile_yield_bearing_pcv_deposit.transfer_yield(
             to=volatile_idle_pcv_deposit,
             amount=volatile_yield_bearing_pcv_deposit.yield_accrued,
             asset_price=volatile_asset_price,
@@ -126,10 +142,10 @@ def policy_reinvest_yield(params: Parameters, substep, state_history, previous_s
 
     # State Variables
     timestep = previous_state["timestep"]
-    stable_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
+    stable_yield_bearing_pcv_deposit: FrozenPCVDeposit = previous_state[
         "stable_yield_bearing_pcv_deposit"
     ]
-    volatile_yield_bearing_pcv_deposit: PCVDeposit = previous_state[
+    volatile_yield_bearing_pcv_deposit: FrozenPCVDeposit = previous_state[
         "volatile_yield_bearing_pcv_deposit"
     ]
     stable_asset_price = previous_state["stable_asset_price"]
@@ -142,12 +158,12 @@ def policy_reinvest_yield(params: Parameters, substep, state_history, previous_s
     # State Update
     timestep_equals_reinvest_period = timestep % yield_reinvest_period / dt == 0
     if timestep_equals_reinvest_period:  # Periodic yield reinvestment
-        stable_yield_bearing_pcv_deposit.transfer_yield(
+        stable_yield_bearing_pcv_deposit, _ = stable_yield_bearing_pcv_deposit.transfer_yield(
             to=stable_yield_bearing_pcv_deposit,
             amount=stable_yield_bearing_pcv_deposit.yield_accrued,
             asset_price=stable_asset_price,
         )
-        volatile_yield_bearing_pcv_deposit.transfer_yield(
+        volatile_yield_bearing_pcv_deposit, _ = volatile_yield_bearing_pcv_deposit.transfer_yield(
             to=volatile_yield_bearing_pcv_deposit,
             amount=volatile_yield_bearing_pcv_deposit.yield_accrued,
             asset_price=volatile_asset_price,
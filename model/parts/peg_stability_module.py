@@ -5,7 +5,7 @@ Implementation of Peg Stability Module related Policies.
 from typing import List
 import logging
 from model.system_parameters import Parameters
-from model.types import FEI, USD, PCVDeposit, StateVariableKey
+from model.types import FEI, USD, FrozenPCVDeposit, StateVariableKey
 
 
 def policy_peg_stability_module(params: Parameters, substep, state_history, previous_state):
@@ -26,7 +26,7 @@ def policy_peg_stability_module(params: Parameters, substep, state_history, prev
     active_psm_pcv_deposit_keys: List[StateVariableKey] = previous_state[
         "active_psm_pcv_deposit_keys"
     ]
-    active_psm_pcv_deposits: List[PCVDeposit] = [
+    active_psm_pcv_deposits: List[FrozenPCVDeposit] = [
         previous_state[key] for key in active_psm_pcv_deposit_keys
     ]
     fei_price: USD = previous_state["fei_price"]
@@ -41,18 +41,18 @@ def policy_peg_stability_module(params: Parameters, substep, state_history, prev
         # Perform minting and redemption
         if fei_minted_redeemed >= 0:
             # Minting: select first active PSM PCV Deposit
-            active_psm_pcv_deposit: PCVDeposit = active_psm_pcv_deposits[0]
+            active_psm_pcv_deposit: FrozenPCVDeposit = active_psm_pcv_deposits[0]
             pcv_asset_price: USD = previous_state[active_psm_pcv_deposit.asset + "_asset_price"]
             mint_redeem_pcv_asset_balance = fei_minted_redeemed * fei_price / pcv_asset_price
             # Mint FEI for active PSM PCV Deposit asset
-            active_psm_pcv_deposit.deposit(
+            active_psm_pcv_deposit = active_psm_pcv_deposit.deposit(
                 amount=mint_redeem_pcv_asset_balance, asset_price=pcv_asset_price
             )
             # Collect PSM mint fees
             psm_mint_redeem_fees = psm_mint_fee * fei_minted_redeemed
         else:
             # Redeeming: select first eligible (i.e. with enough balance) active PSM PCV Deposit
-            eligible_active_psm_pcv_deposits: PCVDeposit = [
+            eligible_active_psm_pcv_deposits: List[FrozenPCVDeposit] = [
                 deposit
                 for deposit in active_psm_pcv_deposits
                 if deposit.balance
@@ -68,7 +68,7 @@ def policy_peg_stability_module(params: Parameters, substep, state_history, prev
                 assert (
                     abs(mint_redeem_pcv_asset_balance) < active_psm_pcv_deposit.balance
                 ), "Insufficient PCV for redemption"
-                active_psm_pcv_deposit.withdraw(
+                active_psm_pcv_deposit = active_psm_pcv_deposit.withdraw(
                     amount=abs(mint_redeem_pcv_asset_balance),
                     asset_price=pcv_asset_price,
                 )
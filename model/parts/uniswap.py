@@ -1,7 +1,19 @@
 """# Uniswap Module
 Uniswap style Constant Function Market Maker functions for liquidity provision and token trading.
+
+All functions accept scalars or NumPy arrays, broadcast against each other,
+e.g. an array of trade sizes against the reserves of a pool, or the reserves of a pool in each Monte Carlo run,
+and return scalars for scalar arguments.
 """
 
+import numpy as np
+from typing import Dict
+
+
+def _unwrap(value):
+    """Unwrap a zero-dimensional array result of a scalar computation to a NumPy scalar"""
+    return value[()] if isinstance(value, np.ndarray) and value.ndim == 0 else value
+
 
 # Liquidity Provision
 
@@ -15,20 +27,19 @@ def add_liquidity(reserve_balance, supply_balance, voucher_balance, tokens, valu
     new_supply = (1 + alpha) * supply_balance
 
     new_vouchers = (1 + alpha) * voucher_balance
+
+    The initial liquidity, when there are no vouchers, is added as given.
     """
-    if voucher_balance <= 0:
-        dr = value
-        ds = tokens
-        dv = tokens
-        return (dr, ds, dv)
+    initial_liquidity = np.asarray(voucher_balance) <= 0
 
-    alpha = value / reserve_balance
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = np.divide(value, reserve_balance)
 
-    dr = alpha * reserve_balance
-    ds = alpha * supply_balance
-    dv = alpha * voucher_balance
+        dr = np.where(initial_liquidity, value, alpha * reserve_balance)
+        ds = np.where(initial_liquidity, tokens, alpha * supply_balance)
+        dv = np.where(initial_liquidity, tokens, alpha * voucher_balance)
 
-    return (dr, ds, dv)
+    return (_unwrap(dr), _unwrap(ds), _unwrap(dv))
 
 
 def remove_liquidity(reserve_balance, supply_balance, voucher_balance, tokens):
@@ -41,7 +52,8 @@ def remove_liquidity(reserve_balance, supply_balance, voucher_balance, tokens):
 
     new_vouchers = (1 - alpha) * voucher_balance
     """
-    alpha = tokens / voucher_balance
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = np.divide(tokens, voucher_balance)
 
     dr = -alpha * reserve_balance
     ds = -alpha * supply_balance
@@ -109,11 +121,12 @@ def collateral_to_token(value, reserve_balance, supply_balance, trade_fee):
 
     new_supply = supply_balance - dy
     """
-    if reserve_balance == 0:
-        return 0
-    _dx, dy = get_input_price(value, reserve_balance, supply_balance, trade_fee)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _dx, dy = get_input_price(
+            value, np.asarray(reserve_balance, dtype=float), supply_balance, trade_fee
+        )
 
-    return abs(dy)
+    return _unwrap(np.where(np.asarray(reserve_balance) == 0, 0, np.abs(dy)))
 
 
 def token_to_collateral(tokens, reserve_balance, supply_balance, trade_fee):
@@ -126,8 +139,107 @@ def token_to_collateral(tokens, reserve_balance, supply_balance, trade_fee):
 
     new_supply = supply_balance + dy
     """
-    if supply_balance == 0:
-        return 0
-    _dx, dy = get_input_price(tokens, supply_balance, reserve_balance, trade_fee)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _dx, dy = get_input_price(
+            tokens, np.asarray(supply_balance, dtype=float), reserve_balance, trade_fee
+        )
+
+    return _unwrap(np.where(np.asarray(supply_balance) == 0, 0, np.abs(dy)))
+
+
+# Slippage and price impact
+
+
+def get_spot_price(x_balance, y_balance):
+    """
+    The marginal price of x in units of y, excluding trading fees
+    """
+    return y_balance / x_balance
+
+
+def get_slippage(dx, x_balance, y_balance, trade_fee=0):
+    """
+    The slippage of selling dx for y, including the trading fee:
+    the relative difference between the effective price received and the spot price,
+    `1 - gamma * x_balance / (x_balance + gamma * dx)`, where `gamma = 1 - trade_fee`.
+
+    The slippage of a zero-size trade is its limit, the trading fee.
+    """
+    _dx, dy = get_input_price(dx, x_balance, y_balance, trade_fee)
+    spot_output_amount = dx * get_spot_price(x_balance, y_balance)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slippage = 1 + np.divide(dy, spot_output_amount)
 
-    return abs(dy)
+    return _unwrap(np.where(np.asarray(spot_output_amount) > 0, slippage, trade_fee))
+
+
+def get_price_impact(dx, x_balance, y_balance, trade_fee=0):
+    """
+    The price impact of selling dx for y:
+    the relative decrease in the spot price of x after the trade, with the trading fee retained in the pool.
+    """
+    _dx, dy = get_input_price(dx, x_balance, y_balance, trade_fee)
+    spot_price = get_spot_price(x_balance, y_balance)
+    updated_spot_price = get_spot_price(x_balance + _dx, y_balance + dy)
+
+    return 1 - updated_spot_price / spot_price
+
+
+def get_max_input_amount(slippage, x_balance, trade_fee=0):
+    """
+    The largest amount of x that can be sold with at most the given slippage, including the trading fee,
+    which is zero if the trading fee alone exceeds the slippage, see `get_slippage(...)`.
+    """
+    gamma = 1 - trade_fee
+    return np.maximum(x_balance * (gamma / (1 - slippage) - 1) / gamma, 0)
+
+
+def get_trade_curves(
+    x_balance,
+    y_balance,
+    trade_fee=0,
+    trade_sizes=None,
+    max_trade_fraction=0.5,
+    points=101,
+) -> Dict[str, np.ndarray]:
+    """
+    The slippage and price impact curves of selling x for y, e.g. for pool depth charts, computed in one call.
+
+    By default, the curves are computed for `points` trade sizes from zero to `max_trade_fraction` of `x_balance`,
+    otherwise for the given `trade_sizes`. The trade sizes are the last axis of each curve,
+    and the balances may be arrays, e.g. of pools or Monte Carlo runs, for curves with shape `balances.shape + (points,)`.
+
+    Returns:
+        A dictionary of arrays, which for scalar balances can be used to create a DataFrame:
+        * `trade_size`: the amount of x sold
+        * `output_amount`: the amount of y received
+        * `effective_price`: the price received in units of y per x
+        * `slippage`: see `get_slippage(...)`
+        * `price_impact`: see `get_price_impact(...)`
+    """
+    x_balance = np.asarray(x_balance, dtype=float)[..., np.newaxis]
+    y_balance = np.asarray(y_balance, dtype=float)[..., np.newaxis]
+    if trade_sizes is None:
+        trade_sizes = x_balance * np.linspace(0, max_trade_fraction, points)
+    trade_sizes, x_balance, y_balance = np.broadcast_arrays(
+        np.asarray(trade_sizes, dtype=float), x_balance, y_balance
+    )
+
+    _dx, dy = get_input_price(trade_sizes, x_balance, y_balance, trade_fee)
+    output_amount = -dy
+    # NOTE The effective price of a zero-size trade is the marginal price net of the trading fee
+    with np.errstate(divide="ignore", invalid="ignore"):
+        effective_price = np.where(
+            trade_sizes > 0,
+            output_amount / trade_sizes,
+            (1 - trade_fee) * get_spot_price(x_balance, y_balance),
+        )
+
+    return {
+        "trade_size": trade_sizes,
+        "output_amount": output_amount,
+        "effective_price": effective_price,
+        "slippage": get_slippage(trade_sizes, x_balance, y_balance, trade_fee),
+        "price_impact": get_price_impact(trade_sizes, x_balance, y_balance, trade_fee),
+    }
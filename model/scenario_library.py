@@ -0,0 +1,122 @@
+"""# Scenario Library
+An on-disk library of named exogenous process scenarios, e.g. the Volatile Asset price scenarios
+of `model.stochastic_processes.get_volatile_asset_price_scenario_library(...)`.
+
+Each scenario is stored in the library directory as:
+* `<name>.npy`: the `(runs, timesteps)` float64 samples of the scenario
+* `<name>.json`: the scenario metadata, e.g. the process, parameters, and seed used to generate the samples
+
+Scenarios are generated once, and opened as read-only memory-mapped arrays using `np.load(mmap_mode="r")`,
+so that notebooks and multiprocessing workers share a single page-cached copy of the samples.
+`ScenarioLibrary.process(name)` returns a shared `ExogenousProcess`, pickled by reference to the scenario file,
+for use as a System Parameter process such as `volatile_asset_price_process`.
+"""
+
+import json
+import os
+import tempfile
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from model.exogenous_processes import (
+    ExogenousProcess,
+    _load_shared_buffer,
+    get_cache_directory,
+    save_samples,
+)
+
+
+class ScenarioLibrary:
+    """## Scenario Library
+    A directory of named scenarios, each a `(runs, timesteps)` samples array with JSON metadata.
+
+    The default directory is `scenarios` within the cache directory, see `model.exogenous_processes.get_cache_directory()`.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.path.join(get_cache_directory(), "scenarios")
+
+    def _path(self, name: str, extension: str) -> str:
+        assert name and os.path.basename(name) == name, f"Invalid scenario name {name!r}"
+        return os.path.join(self.directory, f"{name}.{extension}")
+
+    def __contains__(self, name: str) -> bool:
+        return os.path.exists(self._path(name, "json")) and os.path.exists(self._path(name, "npy"))
+
+    def names(self) -> List[str]:
+        """Get the names of the scenarios in the library"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            filename[: -len(".json")]
+            for filename in os.listdir(self.directory)
+            if filename.endswith(".json") and filename[: -len(".json")] in self
+        )
+
+    def save(self, name: str, samples: np.ndarray, **metadata) -> ExogenousProcess:
+        """
+        Save the samples of a scenario, with shape `(runs, timesteps)` or `(timesteps,)` for a single realization,
+        and any JSON serializable metadata, replacing any existing scenario of the same name.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim == 1:
+            samples = samples[np.newaxis, :]
+        assert samples.ndim == 2, "Samples must have shape (runs, timesteps)"
+
+        save_samples(self._path(name, "npy"), samples)
+        # NOTE The metadata is written last, marking the scenario as complete
+        file, temporary_filename = tempfile.mkstemp(suffix=".json", dir=self.directory)
+        with os.fdopen(file, "w") as f:
+            json.dump({**metadata, "shape": list(samples.shape)}, f, indent=2, sort_keys=True)
+        os.replace(temporary_filename, self._path(name, "json"))
+
+        return self.process(name)
+
+    def metadata(self, name: str) -> Dict:
+        """Get the metadata of a scenario, including the `shape` of the samples"""
+        with open(self._path(name, "json")) as f:
+            return json.load(f)
+
+    def load(self, name: str) -> np.ndarray:
+        """Load the samples of a scenario as a read-only memory-mapped `(runs, timesteps)` array"""
+        if name not in self:
+            raise KeyError(f"Scenario {name!r} not found in {self.directory}")
+        return _load_shared_buffer(self._path(name, "npy"))
+
+    def process(self, name: str) -> ExogenousProcess:
+        """
+        Get a scenario as an `ExogenousProcess` with the signature `process(run, timestep)`,
+        backed by the memory-mapped samples, and pickled by reference to the scenario file.
+        A scenario with a single realization is shared by all runs.
+        """
+        return ExogenousProcess(self.load(name))
+
+    def get_or_generate(
+        self, name: str, generate: Callable[[], np.ndarray], runs=1, **metadata
+    ) -> ExogenousProcess:
+        """
+        Get a scenario, calling `generate()` and saving the samples if the scenario does not exist,
+        has different metadata, or fewer than the given number of runs.
+        """
+        if name in self:
+            existing_metadata = self.metadata(name)
+            existing_runs = existing_metadata.pop("shape")[0]
+            if existing_metadata == json.loads(json.dumps(metadata)) and existing_runs >= runs:
+                return self.process(name)
+        return self.save(name, generate(), **metadata)
+
+    def to_dataframe(self, names: List[str] = None, run=1) -> pd.DataFrame:
+        """Get a single run of the given scenarios, by default all scenarios, as a DataFrame with one column per scenario"""
+        names = self.names() if names is None else names
+        samples = {name: self.load(name) for name in names}
+        return pd.DataFrame(
+            {
+                name: np.array(samples[name][run - 1 if len(samples[name]) > 1 else 0])
+                for name in names
+            }
+        )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.directory!r})"
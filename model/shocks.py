@@ -0,0 +1,208 @@
+"""# Shocks
+A library of stress shocks, such as price gaps, volatility spikes, FEI depegs, and utilization rate spikes,
+applied as vectorised overlays on the `(runs, timesteps)` samples of an `ExogenousProcess`.
+
+Each shock is parameterised by its onset (the process timestep the shock starts at), magnitude, and duration,
+and is configured for a System Parameter process using the `exogenous_process_shocks` System Parameter,
+so that shocks can be swept like any other System Parameter, for example:
+```
+parameter_overrides = {
+    "exogenous_process_shocks": [
+        {"volatile_asset_price_process": [PriceGap(onset=90, magnitude=-0.5, duration=30)]},
+        {"fei_price_process": [Depeg(onset=90, magnitude=0.05, duration=14)]},
+    ],
+}
+```
+
+Shocks overlay the existing realizations of a process rather than regenerating them,
+so that many shock variants of the same realizations, e.g. using `common_random_numbers`, cost one sample generation.
+"""
+
+from abc import ABCMeta, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence, Union
+
+import numpy as np
+
+from model.exogenous_processes import ExogenousProcess, LazyExogenousProcess
+from model.types import Run, Timestep
+
+
+@dataclass(frozen=True)
+class Shock(metaclass=ABCMeta):
+    """## Shock
+    A shock starting at the `onset` timestep of a process, lasting `duration` timesteps,
+    or until the end of the process if the duration is `None`.
+    """
+
+    onset: Timestep
+    magnitude: float
+    duration: Optional[Timestep] = None
+
+    @property
+    def window(self) -> slice:
+        """The timesteps of the process affected by the shock"""
+        return slice(self.onset, None if self.duration is None else self.onset + self.duration)
+
+    @abstractmethod
+    def apply(self, samples: np.ndarray) -> np.ndarray:
+        """Apply the shock to a `(runs, timesteps)` samples array in place, returning the array"""
+        pass
+
+
+@dataclass(frozen=True)
+class PriceGap(Shock):
+    """## Price Gap
+    A relative price jump of `magnitude` during the shock, e.g. a magnitude of -0.5 for a 50% crash,
+    after which the price recovers to the underlying process.
+    """
+
+    def apply(self, samples: np.ndarray) -> np.ndarray:
+        samples[:, self.window] *= 1 + self.magnitude
+        return samples
+
+
+@dataclass(frozen=True)
+class VolatilitySpike(Shock):
+    """## Volatility Spike
+    A volatility spike scaling the log returns of the price during the shock by `magnitude`, e.g. 3 for triple volatility,
+    where the change in price level at the end of the shock persists.
+    """
+
+    def apply(self, samples: np.ndarray) -> np.ndarray:
+        log_samples = np.log(samples)
+        log_returns = np.diff(log_samples, axis=1)
+        # NOTE The log return at index t - 1 is the return into timestep t
+        window = self.window
+        log_returns[
+            :, max(window.start - 1, 0) : None if window.stop is None else window.stop - 1
+        ] *= self.magnitude
+        samples[:, 1:] = np.exp(log_samples[:, :1] + np.cumsum(log_returns, axis=1))
+        return samples
+
+
+@dataclass(frozen=True)
+class Depeg(Shock):
+    """## Depeg
+    An absolute price deviation of `-magnitude` from the underlying process during the shock,
+    e.g. a magnitude of 0.05 for a FEI depeg to 0.95 USD.
+    """
+
+    def apply(self, samples: np.ndarray) -> np.ndarray:
+        samples[:, self.window] -= self.magnitude
+        return samples
+
+
+@dataclass(frozen=True)
+class UtilizationSpike(Shock):
+    """## Utilization Spike
+    An absolute increase of `magnitude` in a rate such as the money market utilization rate during the shock,
+    bounded to [0, 1].
+    """
+
+    def apply(self, samples: np.ndarray) -> np.ndarray:
+        window = self.window
+        samples[:, window] = np.clip(samples[:, window] + self.magnitude, 0, 1)
+        return samples
+
+
+class ShockedProcess(ExogenousProcess):
+    """## Shocked Process
+    An `ExogenousProcess` overlaying a sequence of shocks on the samples of an underlying `ExogenousProcess`,
+    for `timesteps` process timesteps.
+
+    The shocked samples are computed on first access, sized to the runs requested, and kept in memory.
+    """
+
+    __slots__ = ("process", "shocks", "timesteps")
+
+    def __init__(self, process: ExogenousProcess, shocks: Sequence[Shock], timesteps: int):
+        assert isinstance(
+            process, ExogenousProcess
+        ), "Shocks can only be applied to an ExogenousProcess"
+        object.__setattr__(self, "process", process)
+        object.__setattr__(self, "shocks", tuple(shocks))
+        object.__setattr__(self, "timesteps", timesteps)
+
+    def __getattr__(self, name):
+        # NOTE Only called before the samples have been computed
+        if name in ExogenousProcess.__slots__:
+            self.materialize(1)
+            return object.__getattribute__(self, name)
+        raise AttributeError(name)
+
+    @property
+    def runs(self) -> int:
+        """The number of runs computed so far"""
+        try:
+            return object.__getattribute__(self, "samples").shape[0]
+        except AttributeError:
+            return 0
+
+    def materialize(self, runs: int) -> "ShockedProcess":
+        """Compute the shocked samples for at least the given number of runs"""
+        if runs <= self.runs or self._is_broadcast():
+            return self
+
+        process = self.process
+        if isinstance(process, LazyExogenousProcess):
+            runs = process.materialize(runs).runs
+            broadcast = False
+        else:
+            # NOTE A single realization shared by all runs is shocked once
+            broadcast = process.shape[0] == 1
+            runs = 1 if broadcast else max(runs, process.shape[0])
+
+        samples = np.array(process.to_array(runs, self.timesteps), dtype=np.float64)
+        for shock in self.shocks:
+            samples = shock.apply(samples)
+        samples.flags.writeable = False
+
+        object.__setattr__(self, "samples", samples)
+        object.__setattr__(self, "_run_stride", int(not broadcast))
+        object.__setattr__(self, "_timestep_stride", 1)
+        return self
+
+    def _is_broadcast(self) -> bool:
+        try:
+            return object.__getattribute__(self, "_run_stride") == 0
+        except AttributeError:
+            return False
+
+    def __call__(self, run: Run, timestep: Timestep):
+        if run > self.runs:
+            self.materialize(run)
+        return self.samples[(run - 1) * self._run_stride, timestep]
+
+    def sample(self, runs: np.ndarray, timestep: Timestep) -> np.ndarray:
+        self.materialize(int(np.max(runs)))
+        return super().sample(runs, timestep)
+
+    def to_array(self, runs: int, timesteps: int) -> np.ndarray:
+        self.materialize(runs)
+        return super().to_array(runs, timesteps)
+
+    def share(self) -> "ShockedProcess":
+        return self
+
+    def __reduce__(self):
+        return (ShockedProcess, (self.process, self.shocks, self.timesteps))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.process!r}, shocks={list(self.shocks)})"
+
+
+def apply_shocks(
+    process: Union[ExogenousProcess, Callable], shocks: Sequence[Shock], timesteps: int
+) -> Union[ExogenousProcess, Callable]:
+    """## Apply Shocks
+    Get a process with the given shocks overlaid on the samples of the underlying process,
+    reusing a `ShockedProcess` with the same process, shocks, and timesteps.
+    """
+    if isinstance(process, ShockedProcess):
+        if (process.shocks, process.timesteps) == (tuple(shocks), timesteps):
+            return process
+        process = process.process
+    if not shocks:
+        return process
+    return ShockedProcess(process, shocks, timesteps)
@@ -0,0 +1,172 @@
+"""# State Cloner
+A schema-specialised State cloner, used in place of a generic deepcopy of the State Variables between substeps.
+
+Generic deepcopy (or a pickle round-trip, as used by radCAD when `deepcopy` is enabled) walks every State Variable,
+including the many numerical State Variables that are immutable and can be safely copied by reference.
+Given the `StateVariablesWithDeposits` dataclass schema created in `model.initialization.setup_initial_state(...)`,
+`generate_state_cloner(...)` generates a copy routine that:
+* copies immutable State Variables (e.g. floats, strings, `FrozenDeposit`, `RingBuffer`, and `LiquidityPoolRegistry` instances) by reference
+* copies mutable `Deposit` instances field-by-field
+* copies Numpy arrays (e.g. `capital_allocation_target_weights`) and lists of immutable values directly
+* falls back to a deepcopy for any other State Variable
+
+The generated cloner is used by the `StateDict` class, the type of the model Initial State,
+whose `copy()` method radCAD calls between substeps when `deepcopy` is disabled.
+This means policies that are not pure can still be used without enabling radCAD `deepcopy`.
+"""
+
+import copy
+import datetime
+import dataclasses
+from inspect import isclass
+from typing import Callable, Dict, List, Tuple, Union, get_args, get_origin
+
+import numpy as np
+
+from model.types import Deposit, FrozenDeposit, LiquidityPoolRegistry, RingBuffer
+
+
+StateSchema = Tuple[Tuple[str, str], ...]
+"""A tuple of (State Variable key, copy method) pairs, see `generate_state_schema(...)`"""
+
+immutable_types = (
+    int,
+    float,
+    complex,
+    bool,
+    str,
+    bytes,
+    type(None),
+    datetime.datetime,
+    datetime.date,
+)
+"""Types that are copied by reference"""
+
+radcad_state_variables = ("simulation", "subset", "run", "substep", "timestep")
+"""State Variables added to the Initial State by radCAD, in order"""
+
+copy_methods = {
+    "reference": "state[{key!r}]",
+    "deposit": "_copy_deposit(state[{key!r}])",
+    "array": "state[{key!r}].copy()",
+    "list": "state[{key!r}][:]",
+    "deepcopy": "_deepcopy(state[{key!r}])",
+}
+"""Generated copy expression for each copy method"""
+
+_cloners: Dict[StateSchema, Callable] = {}
+
+
+def _is_immutable_type(field_type) -> bool:
+    if get_origin(field_type) is Union:
+        return all(_is_immutable_type(arg) for arg in get_args(field_type))
+    return field_type in immutable_types or (
+        isclass(field_type)
+        and issubclass(field_type, (FrozenDeposit, RingBuffer, LiquidityPoolRegistry))
+    )
+
+
+def get_copy_method(field_type) -> str:
+    """## Get Copy Method
+    Get the copy method for a State Variable of the given type, one of the `copy_methods` keys.
+    """
+    if _is_immutable_type(field_type):
+        return "reference"
+    elif isclass(field_type) and issubclass(field_type, Deposit):
+        return "deposit"
+    elif field_type is np.ndarray:
+        return "array"
+    elif get_origin(field_type) in (list, List) and all(
+        _is_immutable_type(arg) for arg in get_args(field_type)
+    ):
+        return "list"
+    else:
+        return "deepcopy"
+
+
+def generate_state_schema(state_variables_class) -> StateSchema:
+    """## Generate State Schema
+    Generate the State Schema of a State Variables dataclass, e.g. `StateVariablesWithDeposits`,
+    including the State Variables added to the Initial State by radCAD.
+    """
+    return tuple(
+        (field.name, get_copy_method(field.type))
+        for field in dataclasses.fields(state_variables_class)
+    ) + tuple((key, "reference") for key in radcad_state_variables)
+
+
+def _copy_deposit(deposit: Deposit) -> Deposit:
+    """Copy a mutable Deposit field-by-field, without the overhead of a generic deepcopy"""
+    deposit_copy = object.__new__(deposit.__class__)
+    deposit_copy.__dict__.update(deposit.__dict__)
+    return deposit_copy
+
+
+def generate_state_cloner(schema: StateSchema) -> Callable:
+    """## Generate State Cloner
+    Generate a State cloner function specialised for the given State Schema, see `generate_state_schema(...)`.
+
+    The cloner preserves the State Variable order, and deep copies any State Variables not in the State Schema.
+    """
+    if schema in _cloners:
+        return _cloners[schema]
+
+    source = "\n".join(
+        [
+            "def clone(state):",
+            "    try:",
+            "        cloned = StateDict({",
+            *[
+                f"            {key!r}: {copy_methods[method].format(key=key)},"
+                for key, method in schema
+            ],
+            "        })",
+            "    except KeyError:",
+            "        # State Variables missing from State, e.g. before radCAD State Variables added",
+            "        cloned = StateDict({key: _deepcopy(value) for key, value in state.items()})",
+            "    if len(cloned) != len(state):",
+            "        for key, value in state.items():",
+            "            if key not in cloned:",
+            "                cloned[key] = _deepcopy(value)",
+            "    cloned.schema = schema",
+            "    cloned._cloner = clone",
+            "    return cloned",
+        ]
+    )
+    namespace = {
+        "StateDict": StateDict,
+        "schema": schema,
+        "_copy_deposit": _copy_deposit,
+        "_deepcopy": copy.deepcopy,
+    }
+    exec(source, namespace)
+    cloner = namespace["clone"]
+
+    _cloners[schema] = cloner
+    return cloner
+
+
+class StateDict(dict):
+    """## State Dict
+    A dict of State Variables, whose `copy()` method uses the cloner generated for its State Schema.
+
+    Without a State Schema, `copy()` is a shallow copy, the same as a dict.
+    """
+
+    def __init__(self, state=(), schema: StateSchema = None):
+        super().__init__(state)
+        self.set_schema(schema)
+
+    def set_schema(self, schema: StateSchema):
+        """Set the State Schema, see `generate_state_schema(...)`"""
+        self.schema = schema
+        self._cloner = generate_state_cloner(schema) if schema is not None else None
+
+    def copy(self):
+        if self._cloner is None:
+            return StateDict(self)
+        return self._cloner(self)
+
+    def __reduce__(self):
+        # NOTE The generated cloner is not pickled, and is regenerated from the State Schema
+        return (StateDict, (dict(self), self.schema))
@@ -13,7 +13,7 @@ import model.parts.fei_savings_deposit as fei_savings_deposit
 import model.parts.fei_capital_allocation as fei_capital_allocation
 import model.parts.peg_stability_module as peg_stability_module
 
-from model.utils import update_from_signal, update_timestamp
+from model.utils import get_lookbacks, update_from_signal, update_history, update_timestamp
 
 
 # State Update Block keys for convenience:
@@ -128,6 +128,8 @@ state_update_blocks = [
                     "liquidity_pool_invariant",
                     "liquidity_pool_impermanent_loss",
                     "liquidity_pool_trading_fees",
+                    # NOTE Additional FEI Liquidity Pools, updated together with the FEI-Volatile Liquidity Pool
+                    "liquidity_pool_registry",
                     # PCV Deposit and User Deposit updates
                     "fei_liquidity_pool_pcv_deposit",
                     "volatile_liquidity_pool_pcv_deposit",
@@ -233,6 +235,18 @@ state_update_blocks = [
                 "volatile_idle_pcv_deposit",
                 "stable_yield_bearing_pcv_deposit",
                 "volatile_yield_bearing_pcv_deposit",
+                # Slippage-aware execution, see `pcv_rebalancing_execution_duration` System Parameter
+                "pcv_rebalancing_order_stable_asset_balance",
+                "pcv_rebalancing_order_volatile_asset_balance",
+                "pcv_rebalancing_order_timesteps_remaining",
+                "pcv_rebalancing_slippage",
+                # Rebalancing trades through the Liquidity Pool and Peg Stability Module
+                "fei_liquidity_pool_pcv_deposit",
+                "volatile_liquidity_pool_pcv_deposit",
+                "fei_liquidity_pool_user_deposit",
+                "volatile_liquidity_pool_user_deposit",
+                "liquidity_pool_invariant",
+                "fei_minted_redeemed",
             ]
         },
     },
@@ -272,7 +286,6 @@ state_update_blocks = [
             **{
                 key: update_from_signal(key)
                 for key in [
-                    "capital_allocation_rebalance_matrix",
                     "capital_allocation_rebalance_remainder",
                 ]
             },
@@ -297,3 +310,10 @@ state_update_blocks = [
 ]
 
 state_update_blocks = [block for block in state_update_blocks if block.get("enabled", True)]
+
+# Policies that look back in time declare the State History they need using `model.utils.lookback(...)`,
+# which is recorded in bounded `RingBuffer` State Variables at the start of each timestep, rather than read from `state_history`
+lookbacks = get_lookbacks(state_update_blocks)
+state_update_blocks[0][variables].update(
+    {lookback.key: update_history(lookback) for lookback in lookbacks}
+)
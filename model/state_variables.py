@@ -13,6 +13,7 @@ from typing import List
 import numpy as np
 from model.types import (
     UNI,
+    LiquidityPoolRegistry,
     StateVariableKey,
     Uninitialized,
     Percentage,
@@ -21,6 +22,7 @@ from model.types import (
     FEI,
     VolatileAssetUnits,
     StableAssetUnits,
+    Timestep,
 )
 from model.utils import default
 
@@ -37,6 +39,11 @@ class StateVariables:
     # Simulation
     timestamp: datetime = None
     """The timestamp for each timestep as a Python `datetime` object, starting from `date_start` Parameter."""
+    likelihood_ratio_weight: float = 1.0
+    """
+    The importance sampling likelihood ratio weight of the run, the product of the weights of all importance sampled processes,
+    set in `model.initialization` from the `importance_sampling_tilts` System Parameter.
+    """
 
     # FEI Supply
     total_fei_supply: FEI = Uninitialized
@@ -129,7 +136,7 @@ class StateVariables:
     liquidity_pool_tvl: USD = Uninitialized
     """The Liquidity Pool Total Value Locked (TVL)"""
     liquidity_pool_fei_source_sink: FEI = 0.0
-    """The user-circulating FEI sourced from or sinked to the Liquidity Pool due to rebalancing"""
+    """The user-circulating FEI sourced from or sinked to all Liquidity Pools due to rebalancing"""
     liquidity_pool_impermanent_loss: Percentage = 0.0
     """The total Liquidity Pool impermanent loss as a percentage of provided liquidity"""
     liquidity_pool_trading_fees: USD = 0.0
@@ -138,6 +145,15 @@ class StateVariables:
     """The total Liquidity Pool pool tokens, initialised as being equal to the initial Liquidity Pool FEI balance"""
     total_liquidity_pool_trading_fees: USD = 0.0
     """The accumulated total Liquidity Pool trading fees from start of simulation"""
+    liquidity_pool_volatile_asset_price_reference: USD = Uninitialized
+    """The Volatile Asset price at the start of the simulation, used as the reference price for Liquidity Pool impermanent loss"""
+    liquidity_pool_registry: LiquidityPoolRegistry = default(LiquidityPoolRegistry())
+    """
+    The FEI Liquidity Pools in addition to the FEI-Volatile Liquidity Pool, configured using the `fei_liquidity_pools` System Parameter,
+    with reserves, invariants, fees, and liquidity tokens stored as arrays indexed by pool.
+
+    Updated in `model.parts.liquidity_pools`.
+    """
 
     # Money Markets
     fei_money_market_borrowed: FEI = Uninitialized
@@ -184,11 +200,21 @@ class StateVariables:
     protocol_revenue: USD = Uninitialized
     """The per-timestep protocol revenue including PCV yield and PSM mint/redeem fees"""
 
+    # PCV Rebalancing
+    pcv_rebalancing_order_stable_asset_balance: StableAssetUnits = 0.0
+    """The remaining Stable Asset balance change of the PCV rebalancing order being executed in tranches"""
+    pcv_rebalancing_order_volatile_asset_balance: VolatileAssetUnits = 0.0
+    """The remaining Volatile Asset balance change of the PCV rebalancing order being executed in tranches"""
+    pcv_rebalancing_order_timesteps_remaining: Timestep = 0
+    """The number of timesteps remaining to execute the PCV rebalancing order"""
+    pcv_rebalancing_slippage: Percentage = 0.0
+    """The realised slippage of the PCV rebalancing tranche executed at each timestep, including the Liquidity Pool trading fee"""
+
     # User-circulating FEI Capital Allocation Model
     capital_allocation_target_weights: np.ndarray = default(np.array([]))
     """A variable used to keep track of the target Capital Allocation of user-circulating FEI"""
     capital_allocation_rebalance_matrix: np.ndarray = default(np.array([]))
-    """A variable used to debug Capital Allocation rebalancing"""
+    """A variable used to debug Capital Allocation rebalancing, only populated when the `capital_allocation_rebalance_matrix_diagnostic` parameter is enabled"""
     capital_allocation_rebalance_remainder: np.ndarray = default(np.array([]))
     """A variable used to debug any FEI remainder that could not be allocated as part of Capital Allocation rebalancing"""
 
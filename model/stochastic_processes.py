@@ -1,35 +1,100 @@
 """# Stochastic Processes Module
 Helper functions to generate stochastic environmental processes
 that are then passed in as System Parameters used by for example the `model.parts.price_processes` module.
+
+Each process generates the realizations of all runs as a `(runs, timesteps * dt + 1)` array in one call,
+from a single Numpy `Generator` or one `Generator` per run.
+The Geometric Brownian Motion, Brownian Motion, and Gaussian Noise processes are equivalent in distribution to the processes of the
+[stochastic](https://stochastic.readthedocs.io/en/latest/) package previously used, as configured in this module.
+Regime-switching and jump-diffusion price processes reproduce fat-tailed, crash-and-recover price paths,
+and the Ornstein-Uhlenbeck process mean-reverting rates such as the money market utilization rate.
+The block bootstrap process resamples historical log returns from the `data/` directory into price paths.
+Correlated processes, e.g. the FEI, stable asset, and volatile asset prices of depeg stress tests,
+are generated jointly using `correlated_stochastic_processes(...)`.
+
+The realization of each run is seeded independently by (experiment seed, process name, subset, run),
+see `get_seed_sequence(...)`, so that any run is reproducible on its own,
+and independent of the order in which processes are created.
 """
 
+import hashlib
+import os
 import numpy as np
 import pandas as pd
-from stochastic import processes
+from typing import List
 
 import experiments.simulation_configuration as simulation
-from experiments.utils import rng_generator
+from model.exogenous_processes import LazyExogenousProcess, load_cached_samples
+from model.scenario_library import ScenarioLibrary
+from model.types import Run
+
+
+samples_version = 2
+"""
+Version of the stochastic process realizations, included in the cache key of `stochastic_process(...)` samples,
+to be incremented whenever the realizations of a process change.
+"""
+
+
+def get_seed_sequence(seed: int, name: str, subset: int = 0, run: Run = 1, *spawn_key):
+    """## Get Seed Sequence
+    Derive an independent Numpy `SeedSequence` for each (experiment seed, process name, subset, run),
+    without any global state, e.g. for a multiprocessing worker to generate the samples of a run locally.
+
+    Additional `spawn_key` integers, e.g. the timestep, derive further independent seed sequences.
+    """
+    name_key = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "little")
+    return np.random.SeedSequence(seed, spawn_key=(name_key, subset, run, *spawn_key))
+
+
+def _draw(rng, runs, samples, distribution="standard_normal", **kwargs) -> np.ndarray:
+    """
+    Samples of a Numpy `Generator` distribution method with shape `(runs, samples)`,
+    from a single `Generator` or a list of one `Generator` per run
+    """
+    if isinstance(rng, np.random.Generator):
+        return getattr(rng, distribution)(size=(runs, samples), **kwargs)
+    assert len(rng) == runs, "One Generator required per run"
+    return np.stack(
+        [getattr(run_rng, distribution)(size=samples, **kwargs) for run_rng in rng]
+    ).reshape(runs, samples)
+
+
+def _standard_normal(rng, runs, samples) -> np.ndarray:
+    """Standard normal samples with shape `(runs, samples)`, from a single `Generator` or a list of one `Generator` per run"""
+    return _draw(rng, runs, samples, "standard_normal")
+
+
+def _brownian_motion(runs, samples, rng) -> np.ndarray:
+    """Standard Brownian motion with unit variance increments, starting at zero, with shape `(runs, samples)`"""
+    brownian_motion = np.zeros((runs, samples))
+    np.cumsum(_standard_normal(rng, runs, samples - 1), axis=1, out=brownian_motion[:, 1:])
+    return brownian_motion
 
 
 def geometric_brownian_motion_process(
     timesteps=simulation.TIMESTEPS,
     dt=simulation.DELTA_TIME,
     rng=np.random.default_rng(1),
+    runs=1,
     **kwargs,
-):
+) -> np.ndarray:
     """## Configure Geometric Brownian Motion process
     > A geometric Brownian motion S_t is the analytic solution to the stochastic differential equation with Wiener process...
 
     See https://stochastic.readthedocs.io/en/latest/continuous.html
+
+    NOTE As configured for the `stochastic` package `GeometricBrownianMotion` process,
+    the drift is applied linearly over the `timesteps * dt + 1` unit increments of the process,
+    i.e. `mu` is the total drift over the process duration.
     """
     mu = kwargs.get("mu")
     sigma = kwargs.get("sigma")
     initial_price = kwargs.get("initial_price", 1) or 1
 
-    process = processes.continuous.GeometricBrownianMotion(
-        drift=mu, volatility=sigma, t=(timesteps * dt + 1), rng=rng
-    )
-    price_samples = process.sample(timesteps * dt + 1, initial=initial_price)
+    samples = timesteps * dt + 1
+    line = (mu - sigma**2 / 2.0) * np.arange(samples) / samples
+    price_samples = initial_price * np.exp(line + sigma * _brownian_motion(runs, samples, rng))
 
     return price_samples
 
@@ -38,8 +103,9 @@ def brownian_motion_process(
     timesteps=simulation.TIMESTEPS,
     dt=simulation.DELTA_TIME,
     rng=np.random.default_rng(1),
+    runs=1,
     **kwargs,
-):
+) -> np.ndarray:
     """## Configure Brownian Motion process
     > A standard Brownian motion (discretely sampled) has independent and
     identically distributed Gaussian increments with variance equal to
@@ -47,16 +113,18 @@ def brownian_motion_process(
     parameter and scale factor.
 
     See https://stochastic.readthedocs.io/en/latest/continuous.html
+
+    NOTE As configured for the `stochastic` package `BrownianMotion` process,
+    the drift is applied linearly over the `timesteps * dt + 1` unit increments of the process,
+    i.e. `mu` is the total drift over the process duration.
     """
     mu = kwargs.get("mu")
     sigma = kwargs.get("sigma")
     initial_price = kwargs.get("initial_price", 1) or 1
 
-    process = processes.continuous.BrownianMotion(
-        drift=mu, scale=sigma, t=(timesteps * dt + 1), rng=rng
-    )
-    price_samples = process.sample(timesteps * dt + 1)
-    price_samples = [initial_price + z for z in price_samples]
+    samples = timesteps * dt + 1
+    line = mu * np.arange(samples) / samples
+    price_samples = initial_price + line + sigma * _brownian_motion(runs, samples, rng)
 
     return price_samples
 
@@ -65,155 +133,764 @@ def gaussian_noise_process(
     timesteps=simulation.TIMESTEPS,
     dt=simulation.DELTA_TIME,
     rng=np.random.default_rng(1),
+    runs=1,
     **kwargs,
-):
+) -> np.ndarray:
     """## Configure Gaussian Noise Process
 
     Gaussian Noise Process
 
     See https://stochastic.readthedocs.io/en/latest/noise.html
+
+    NOTE As configured for the `stochastic` package `GaussianNoise` process,
+    the noise has variance `timesteps * dt / (timesteps * dt + 1)`, the increment length of the process.
     """
 
     mu = kwargs.get("mu")
     sigma = kwargs.get("sigma")
 
-    process = processes.noise.GaussianNoise(t=(timesteps * dt), rng=rng)
-    price_samples = process.sample(timesteps * dt + 1)
-    price_samples = [mu + sigma * z for z in price_samples]
+    samples = timesteps * dt + 1
+    scale = np.sqrt(timesteps * dt / samples)
+    price_samples = mu + sigma * scale * _standard_normal(rng, runs, samples)
 
     return price_samples
 
 
-def create_stochastic_process_realizations(
-    process: str,
+def correlated_geometric_brownian_motion_process(
     timesteps=simulation.TIMESTEPS,
     dt=simulation.DELTA_TIME,
+    rng=np.random.default_rng(1),
     runs=1,
     **kwargs,
-):
-    """## Create stochastic process realizations
+) -> np.ndarray:
+    """## Configure Correlated Geometric Brownian Motion process
+    Jointly generate the Geometric Brownian Motion price paths of N assets, e.g. the FEI, stable asset, and volatile asset,
+    whose Brownian motion increments are correlated by the given `(N, N)` correlation matrix,
+    using its Cholesky factor `L`, i.e. `dW = L @ dZ` for independent standard normal increments `dZ`.
+
+    The per-asset `mu`, `sigma`, and `initial_price` are sequences of length N,
+    configured as for `geometric_brownian_motion_process(...)`.
+
+    Returns an array with shape `(N, runs, timesteps * dt + 1)`,
+    or `(runs, timesteps * dt + 1)` for a single asset if the `asset` index is passed.
+    A single asset with a correlation of 1 is equivalent to `geometric_brownian_motion_process(...)`.
+    """
+    mu = np.asarray(kwargs.get("mu"), dtype=np.float64)
+    sigma = np.asarray(kwargs.get("sigma"), dtype=np.float64)
+    correlation = np.asarray(kwargs.get("correlation"), dtype=np.float64)
+    initial_price = kwargs.get("initial_price")
+    initial_price = np.asarray(1 if initial_price is None else initial_price, dtype=np.float64)
+    asset = kwargs.get("asset")
+
+    assets = len(mu)
+    assert correlation.shape == (assets, assets), "Correlation matrix must have shape (N, N)"
+    assert np.allclose(correlation, correlation.T), "Correlation matrix must be symmetric"
+    # NOTE Raises `np.linalg.LinAlgError` if the correlation matrix is not positive definite
+    cholesky = np.linalg.cholesky(correlation)
+
+    samples = timesteps * dt + 1
+    increments = _standard_normal(rng, runs, (samples - 1) * assets).reshape(
+        runs, samples - 1, assets
+    )
+    brownian_motion = np.zeros((runs, samples, assets))
+    np.cumsum(increments @ cholesky.T, axis=1, out=brownian_motion[:, 1:])
+
+    line = (mu - sigma**2 / 2.0) * np.arange(samples)[:, np.newaxis] / samples
+    price_samples = initial_price * np.exp(line + sigma * brownian_motion)
+    price_samples = np.ascontiguousarray(np.moveaxis(price_samples, -1, 0))
 
-    Using the stochastic processes defined in `processes` module, create random number generator (RNG) seeds,
-    and use RNG to pre-generate samples for number of simulation timesteps.
+    return price_samples if asset is None else price_samples[asset]
+
+
+def regime_switching_geometric_brownian_motion_process(
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    rng=np.random.default_rng(1),
+    runs=1,
+    **kwargs,
+) -> np.ndarray:
+    """## Configure Markov Regime-switching Geometric Brownian Motion process
+    A Geometric Brownian Motion whose drift and volatility switch between K market regimes, e.g. "calm" and "crash",
+    following a discrete-time Markov chain, reproducing crash-and-recover price paths.
+
+    * `mu`, `sigma`: sequences of length K, the drift and volatility of each regime per unit increment of the process
+    * `transition_matrix`: `(K, K)` matrix of the probabilities of switching from regime i to regime j per unit increment
+    * `initial_regime`: the regime at the start of the process, by default 0
+    * `initial_price`: the price at the start of the process
+
+    NOTE Unlike `geometric_brownian_motion_process(...)`, the drift is per unit increment of the process, not over the process duration.
     """
-    if process == "geometric_brownian_motion_process":
-        return [
-            geometric_brownian_motion_process(
-                timesteps=timesteps,
-                dt=dt,
-                rng=rng_generator(),
-                mu=kwargs.get("mu"),
-                sigma=kwargs.get("sigma"),
-                initial_price=kwargs.get("initial_price"),
+    mu = np.asarray(kwargs.get("mu"), dtype=np.float64)
+    sigma = np.asarray(kwargs.get("sigma"), dtype=np.float64)
+    transition_matrix = np.asarray(kwargs.get("transition_matrix"), dtype=np.float64)
+    initial_regime = kwargs.get("initial_regime") or 0
+    initial_price = kwargs.get("initial_price", 1) or 1
+
+    regimes = len(mu)
+    assert transition_matrix.shape == (regimes, regimes), "Transition matrix must have shape (K, K)"
+    assert np.allclose(transition_matrix.sum(axis=1), 1), "Transition matrix rows must sum to 1"
+
+    samples = timesteps * dt + 1
+    increments = _standard_normal(rng, runs, samples - 1)
+    uniform = _draw(rng, runs, samples - 1, "random")
+
+    # Simulate the regime of each increment, vectorised across runs
+    cumulative_transition_matrix = np.cumsum(transition_matrix, axis=1)
+    regime = np.empty((runs, samples - 1), dtype=np.intp)
+    regime[:, 0] = initial_regime
+    for t in range(1, samples - 1):
+        regime[:, t] = np.minimum(
+            (cumulative_transition_matrix[regime[:, t - 1]] <= uniform[:, t, np.newaxis]).sum(
+                axis=1
+            ),
+            regimes - 1,
+        )
+
+    log_returns = (mu - sigma**2 / 2.0)[regime] + sigma[regime] * increments
+    price_samples = np.empty((runs, samples))
+    price_samples[:, 0] = 0
+    np.cumsum(log_returns, axis=1, out=price_samples[:, 1:])
+    price_samples = initial_price * np.exp(price_samples)
+
+    return price_samples
+
+
+def jump_diffusion_process(
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    rng=np.random.default_rng(1),
+    runs=1,
+    **kwargs,
+) -> np.ndarray:
+    """## Configure Merton Jump-diffusion process
+    A Geometric Brownian Motion with Poisson distributed jumps of log-normal size, producing fat-tailed price paths.
+
+    * `mu`, `sigma`: the drift (expected return, compensated for jumps) and volatility per unit increment of the process
+    * `jump_intensity`: the expected number of jumps per unit increment of the process
+    * `jump_mean`, `jump_sigma`: the mean and standard deviation of the log jump size, e.g. a negative mean for crashes
+    * `initial_price`: the price at the start of the process
+
+    NOTE Unlike `geometric_brownian_motion_process(...)`, the drift is per unit increment of the process, not over the process duration.
+    """
+    mu = kwargs.get("mu")
+    sigma = kwargs.get("sigma")
+    jump_intensity = kwargs.get("jump_intensity")
+    jump_mean = kwargs.get("jump_mean")
+    jump_sigma = kwargs.get("jump_sigma")
+    initial_price = kwargs.get("initial_price", 1) or 1
+
+    samples = timesteps * dt + 1
+    increments = _standard_normal(rng, runs, samples - 1)
+    jumps = _draw(rng, runs, samples - 1, "poisson", lam=jump_intensity)
+    jump_increments = _standard_normal(rng, runs, samples - 1)
+
+    # The sum of N independent normal log jump sizes is normal with mean N * jump_mean and variance N * jump_sigma^2
+    jump_compensation = jump_intensity * (np.exp(jump_mean + jump_sigma**2 / 2.0) - 1)
+    log_returns = (
+        (mu - sigma**2 / 2.0 - jump_compensation)
+        + sigma * increments
+        + jumps * jump_mean
+        + np.sqrt(jumps) * jump_sigma * jump_increments
+    )
+    price_samples = np.empty((runs, samples))
+    price_samples[:, 0] = 0
+    np.cumsum(log_returns, axis=1, out=price_samples[:, 1:])
+    price_samples = initial_price * np.exp(price_samples)
+
+    return price_samples
+
+
+def ornstein_uhlenbeck_process(
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    rng=np.random.default_rng(1),
+    runs=1,
+    **kwargs,
+) -> np.ndarray:
+    """## Configure Ornstein-Uhlenbeck process
+    A mean-reverting process, sampled exactly as the AR(1) process `x[t + 1] = mu + phi * (x[t] - mu) + e[t]`,
+    where `phi = exp(-theta)`, e.g. for the `money_market_utilization_rate_process`.
+
+    * `mu`: the long-run mean
+    * `theta`: the rate of mean reversion per unit increment of the process
+    * `sigma`: the volatility, with a stationary standard deviation of `sigma / sqrt(2 * theta)`
+    * `initial_value`: the value at the start of the process, by default sampled from the stationary distribution
+    * `lower`, `upper`: optional bounds the samples are clipped to, e.g. 0 and 1 for a utilization rate
+    """
+    mu = kwargs.get("mu")
+    theta = kwargs.get("theta")
+    sigma = kwargs.get("sigma")
+    initial_value = kwargs.get("initial_value")
+
+    samples = timesteps * dt + 1
+    phi = np.exp(-theta)
+    stationary_std = sigma / np.sqrt(2 * theta)
+    innovations = stationary_std * np.sqrt(1 - phi**2) * _standard_normal(rng, runs, samples)
+
+    deviation_samples = np.empty((runs, samples))
+    deviation_samples[:, 0] = (
+        innovations[:, 0] / np.sqrt(1 - phi**2) if initial_value is None else initial_value - mu
+    )
+    for t in range(1, samples):
+        np.multiply(deviation_samples[:, t - 1], phi, out=deviation_samples[:, t])
+        deviation_samples[:, t] += innovations[:, t]
+
+    rate_samples = mu + deviation_samples
+    lower, upper = kwargs.get("lower"), kwargs.get("upper")
+    if lower is not None or upper is not None:
+        np.clip(rate_samples, lower, upper, out=rate_samples)
+
+    return rate_samples
+
+
+def dirichlet_process(
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    rng=np.random.default_rng(1),
+    runs=1,
+    **kwargs,
+) -> np.ndarray:
+    """## Configure Dirichlet process
+    Independent Dirichlet distributed weights at each sample, e.g. the Capital Allocation exogenous weight perturbations,
+    returning an array with shape `(runs, timesteps * dt + 1, N)` for the N weights.
+
+    * `alpha`: the concentration parameter of the N weights, e.g. `[1, 1, 1, 1]` for uniformly distributed weights
+    """
+    alpha = np.asarray(kwargs.get("alpha"), dtype=np.float64)
+
+    samples = timesteps * dt + 1
+    if isinstance(rng, np.random.Generator):
+        return rng.dirichlet(alpha, size=(runs, samples))
+    assert len(rng) == runs, "One Generator required per run"
+    return np.stack([run_rng.dirichlet(alpha, size=samples) for run_rng in rng])
+
+
+data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+"""The directory of the historical datasets, e.g. `data/fei-usd-max.csv`"""
+
+historical_price_datasets = {
+    # Daily FEI/USD prices
+    "fei_usd": dict(filename="fei-usd-max.csv", column="price", aggregation=1),
+    # ETH/USD prices sampled every 1350 blocks, approximately 5 hours,
+    # aggregated over 5 samples to approximately daily log returns
+    "eth_usd": dict(
+        filename="cadlabs_exploratory_data__20220526_165643Z.csv", column="eth_usd", aggregation=5
+    ),
+}
+"""Historical price datasets available in `block_bootstrap_process(...)`, by dataset name"""
+
+
+def load_historical_log_returns(dataset: str) -> np.ndarray:
+    """## Load historical log returns
+    Load the log returns of a historical price dataset, see `historical_price_datasets`,
+    parsing the CSV file once and caching the log returns as a binary array (see `load_cached_samples(...)`)
+    until the CSV file changes.
+    """
+    configuration = historical_price_datasets[dataset]
+    filename = os.path.join(data_directory, configuration["filename"])
+    file_stat = os.stat(filename)
+    key = {
+        "dataset": dataset,
+        **configuration,
+        "size": file_stat.st_size,
+        "mtime": file_stat.st_mtime_ns,
+    }
+
+    def parse():
+        column = configuration["column"]
+        prices = pd.read_csv(filename, usecols=[column])[column].to_numpy(dtype=np.float64)
+        return np.diff(np.log(prices[:: configuration["aggregation"]]))
+
+    return load_cached_samples(key, parse)
+
+
+def block_bootstrap_process(
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    rng=np.random.default_rng(1),
+    runs=1,
+    **kwargs,
+) -> np.ndarray:
+    """## Configure Block Bootstrap process
+    Resample the historical log returns of a dataset in `historical_price_datasets` in blocks,
+    preserving their short-range dependence such as volatility clustering, to generate empirically grounded price paths.
+
+    * `dataset`: the historical price dataset, e.g. "eth_usd" or "fei_usd"
+    * `block_length`: the block length, or mean block length of the stationary bootstrap, in unit increments
+    * `method`: "moving" for the moving block bootstrap of fixed length blocks,
+      or "stationary" (default) for the stationary bootstrap of Politis and Romano,
+      with geometrically distributed block lengths and circular wrapping
+    * `demean`: if true, the historical mean log return is removed, i.e. paths have no historical drift
+    * `initial_price`: the price at the start of the process
+
+    NOTE Each unit increment of the process is one (aggregated) historical observation, i.e. one day.
+    """
+    log_returns = load_historical_log_returns(kwargs.get("dataset"))
+    block_length = kwargs.get("block_length") or 10
+    method = kwargs.get("method") or "stationary"
+    initial_price = kwargs.get("initial_price", 1) or 1
+    if kwargs.get("demean"):
+        log_returns = log_returns - log_returns.mean()
+
+    observations = len(log_returns)
+    samples = timesteps * dt + 1
+    length = samples - 1
+
+    if method == "moving":
+        assert (
+            block_length <= observations
+        ), "Block length must not exceed the number of observations"
+        blocks = -(-length // block_length)
+        block_starts = _draw(
+            rng, runs, blocks, "integers", low=0, high=observations - block_length + 1
+        )
+        indices = (block_starts[:, :, np.newaxis] + np.arange(block_length)).reshape(runs, -1)
+        indices = indices[:, :length]
+    elif method == "stationary":
+        block_starts = _draw(rng, runs, length, "integers", low=0, high=observations)
+        new_block = _draw(rng, runs, length, "random") < 1 / block_length
+        new_block[:, 0] = True
+        # Position of the start of the block of each increment, and index of the block's first observation
+        positions = np.arange(length)
+        block_start_positions = np.maximum.accumulate(np.where(new_block, positions, 0), axis=1)
+        indices = np.take_along_axis(block_starts, block_start_positions, axis=1)
+        indices = (indices + positions - block_start_positions) % observations
+    else:
+        raise Exception("Invalid bootstrap method")
+
+    price_samples = np.empty((runs, samples))
+    price_samples[:, 0] = 0
+    np.cumsum(log_returns[indices], axis=1, out=price_samples[:, 1:])
+    price_samples = initial_price * np.exp(price_samples)
+
+    return price_samples
+
+
+processes = {
+    "geometric_brownian_motion_process": geometric_brownian_motion_process,
+    "brownian_motion_process": brownian_motion_process,
+    "gaussian_noise_process": gaussian_noise_process,
+    "correlated_geometric_brownian_motion_process": correlated_geometric_brownian_motion_process,
+    "regime_switching_geometric_brownian_motion_process": regime_switching_geometric_brownian_motion_process,
+    "jump_diffusion_process": jump_diffusion_process,
+    "ornstein_uhlenbeck_process": ornstein_uhlenbeck_process,
+    "block_bootstrap_process": block_bootstrap_process,
+    "dirichlet_process": dirichlet_process,
+}
+"""Stochastic processes available in `create_stochastic_process_realizations(...)`"""
+
+
+class AntitheticGenerator:
+    """
+    A Numpy `Generator` wrapper returning the antithetic variates of the wrapped `Generator`'s draws,
+    i.e. `-z` for standard normal draws and `1 - u` for uniform draws.
+    Draws of other distributions, e.g. Poisson jumps or bootstrap indices, are passed through unchanged.
+    """
+
+    def __init__(self, generator: np.random.Generator):
+        self.generator = generator
+
+    def standard_normal(self, size=None):
+        return -self.generator.standard_normal(size=size)
+
+    def random(self, size=None):
+        return 1 - self.generator.random(size=size)
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+
+class _SobolSequence:
+    """
+    Scrambled Sobol points shared by the `SobolGenerator` of each run, generated for all runs on first use,
+    with one point per run and one dimension per standard normal draw of the run.
+    """
+
+    def __init__(self, seed_sequence: np.random.SeedSequence, runs: int):
+        self.seed_sequence = seed_sequence
+        self.runs = runs
+        self.points = None
+
+    def get_point(self, run_index: int, dimension: int) -> np.ndarray:
+        if self.points is None:
+            try:
+                from scipy.stats import qmc
+            except ImportError as e:
+                raise ImportError("Sobol sampling requires SciPy >= 1.7") from e
+            sobol = qmc.Sobol(
+                dimension, scramble=True, seed=np.random.default_rng(self.seed_sequence)
             )
-            for _ in range(runs)
-        ]
-    elif process == "brownian_motion_process":
-        return [
-            brownian_motion_process(
-                timesteps=timesteps,
-                dt=dt,
-                rng=rng_generator(),
-                mu=kwargs.get("mu"),
-                sigma=kwargs.get("sigma"),
-                initial_price=kwargs.get("initial_price"),
+            self.points = sobol.random(self.runs)
+        assert self.points.shape[1] == dimension, "Sobol dimension must be the same for all runs"
+        return self.points[run_index]
+
+
+class SobolGenerator:
+    """
+    A Numpy `Generator` wrapper whose first standard normal draw, e.g. the Brownian motion increments of a run,
+    is a point of a scrambled Sobol sequence shared by all runs, transformed using the inverse normal CDF.
+    Any further draws, e.g. regime switches or jumps, are passed through to the wrapped pseudo-random `Generator`.
+    """
+
+    def __init__(self, generator: np.random.Generator, sequence: _SobolSequence, run_index: int):
+        self.generator = generator
+        self.sequence = sequence
+        self.run_index = run_index
+        self.used = False
+
+    def standard_normal(self, size=None):
+        if self.used:
+            return self.generator.standard_normal(size=size)
+        from scipy.special import ndtri
+
+        self.used = True
+        point = self.sequence.get_point(self.run_index, int(np.prod(size)))
+        return ndtri(point).reshape(size)
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+
+sampling_methods = ("monte_carlo", "antithetic", "sobol")
+"""
+Sampling methods available in `create_stochastic_process_realizations(...)`:
+* "monte_carlo": independent pseudo-random realizations
+* "antithetic": pairs of runs (1, 2), (3, 4), ... with antithetic standard normal and uniform draws
+* "sobol": randomized quasi-Monte Carlo, driving the standard normal draws of each run
+  with a point of a scrambled Sobol sequence, best used with a power of two runs
+"""
+
+
+class TiltedGenerator:
+    """
+    A Numpy `Generator` wrapper for importance sampling, shifting the mean of the wrapped `Generator`'s
+    standard normal draws by `tilt`, e.g. a negative tilt of the Brownian motion increments of a price process
+    tilts its drift towards crashes.
+
+    The log likelihood ratio of the untilted to the tilted distribution of the draws,
+    `-tilt * sum(z) + n * tilt^2 / 2` for the n tilted draws z, is accumulated in `log_likelihood_ratio`.
+    """
+
+    def __init__(self, generator, tilt: float):
+        self.generator = generator
+        self.tilt = tilt
+        self.log_likelihood_ratio = 0.0
+
+    def standard_normal(self, size=None):
+        samples = self.generator.standard_normal(size=size) + self.tilt
+        self.log_likelihood_ratio = self.log_likelihood_ratio + (
+            -self.tilt * np.sum(samples, axis=-1) + np.shape(samples)[-1] * self.tilt**2 / 2
+        )
+        return samples
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+
+def _create_run_generators(runs, seed, name, subset, sampling, tilt):
+    """Create one `Generator` per run seeded by (seed, name, subset, run), for the given sampling method and tilt"""
+    if sampling not in sampling_methods:
+        raise Exception("Invalid Sampling Method")
+
+    if sampling == "antithetic":
+        # The even run of each pair uses the antithetic variates of the preceding odd run
+        rng = [
+            np.random.default_rng(get_seed_sequence(seed, name, subset, run))
+            if run % 2
+            else AntitheticGenerator(
+                np.random.default_rng(get_seed_sequence(seed, name, subset, run - 1))
             )
-            for _ in range(runs)
+            for run in range(1, runs + 1)
         ]
-    elif process == "gaussian_noise_process":
-        return [
-            gaussian_noise_process(
-                timesteps=timesteps,
-                dt=dt,
-                rng=rng_generator(),
-                mu=kwargs.get("mu"),
-                sigma=kwargs.get("sigma"),
+    elif sampling == "sobol":
+        # NOTE The Sobol sequence is scrambled using the seed sequence of run 0, not used by any run
+        sequence = _SobolSequence(get_seed_sequence(seed, name, subset, 0), runs)
+        rng = [
+            SobolGenerator(
+                np.random.default_rng(get_seed_sequence(seed, name, subset, run)),
+                sequence,
+                run - 1,
             )
-            for _ in range(runs)
+            for run in range(1, runs + 1)
         ]
     else:
+        rng = [
+            np.random.default_rng(get_seed_sequence(seed, name, subset, run))
+            for run in range(1, runs + 1)
+        ]
+
+    return [TiltedGenerator(run_rng, tilt) for run_rng in rng] if tilt else rng
+
+
+def create_stochastic_process_realizations(
+    process: str,
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    runs=1,
+    seed=None,
+    name=None,
+    subset=0,
+    sampling="monte_carlo",
+    tilt=0,
+    **kwargs,
+) -> np.ndarray:
+    """## Create stochastic process realizations
+
+    Using the stochastic processes defined in this module, create random number generators (RNGs),
+    and use the RNGs to pre-generate samples for number of simulation timesteps and runs,
+    returning an array with shape `(runs, timesteps * dt + 1)`,
+    or `(N, runs, timesteps * dt + 1)` for the N assets of a jointly generated process,
+    or `(runs, timesteps * dt + 1, N)` for a vector-valued process such as the `dirichlet_process`.
+
+    If a `seed` is passed, the RNG of each run is seeded by (seed, name, subset, run), see `get_seed_sequence(...)`,
+    where the name defaults to the process name.
+    Otherwise, a single RNG is generated using `experiments.utils.rng_generator()`,
+    whose results depend on the order in which processes are created.
+
+    The `sampling` method, see `sampling_methods`, reduces the variance of estimates across runs
+    using antithetic variates or scrambled Sobol sequences, and requires a `seed`.
+
+    A non-zero `tilt` importance samples the process, shifting the mean of all standard normal draws by `tilt`
+    standard deviations, and requires a `seed`.
+    The likelihood ratio weight of each run is given by `create_likelihood_ratio_weights(...)`.
+    """
+    if process not in processes:
         raise Exception("Invalid Process")
 
+    if seed is None:
+        assert sampling == "monte_carlo" and not tilt, "A seed is required for variance reduction"
+        from experiments.utils import rng_generator
+
+        rng = rng_generator()
+    else:
+        rng = _create_run_generators(runs, seed, name or process, subset, sampling, tilt)
+
+    return processes[process](
+        timesteps=timesteps,
+        dt=dt,
+        rng=rng,
+        runs=runs,
+        **kwargs,
+    )
 
-def generate_volatile_asset_price_scenarios() -> pd.DataFrame:
-    """## Generate Volatile Asset price scenarios
-    This function generates a set of Volatile Asset price scenarios across: base, bearish, bullish, high and low volatility market conditions.
 
-    NOTE This function is currently not being seeded correctly, which means results are not reproducible.
+def create_likelihood_ratio_weights(
+    process: str,
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    runs=1,
+    seed=None,
+    name=None,
+    subset=0,
+    sampling="monte_carlo",
+    tilt=0,
+    **kwargs,
+) -> np.ndarray:
+    """## Create likelihood ratio weights
+    Get the importance sampling likelihood ratio weight of each run of the realizations of
+    `create_stochastic_process_realizations(...)` with the same arguments, as an array with shape `(runs,)`.
+
+    An unbiased estimate of the expectation of a function f of the untilted process is the weighted mean
+    `mean(weights * f(realizations))`.
     """
-    # Price trend scenarios
+    if not tilt:
+        return np.ones(runs)
+    assert seed is not None, "A seed is required for importance sampling"
+
+    rng = _create_run_generators(runs, seed, name or process, subset, sampling, tilt)
+    processes[process](timesteps=timesteps, dt=dt, rng=rng, runs=runs, **kwargs)
+
+    return np.exp([run_rng.log_likelihood_ratio for run_rng in rng])
 
-    base_price_trend = create_stochastic_process_realizations(
-        "geometric_brownian_motion_process",
-        timesteps=simulation.TIMESTEPS,
-        dt=simulation.DELTA_TIME,
-        mu=0,
-        sigma=0.02,
-        initial_price=2000,
-        runs=1,
-    )[0]
-
-    bearish_price_trend = create_stochastic_process_realizations(
-        "geometric_brownian_motion_process",
-        timesteps=simulation.TIMESTEPS,
-        dt=simulation.DELTA_TIME,
-        mu=-0.5,
-        sigma=0.02,
-        initial_price=2000,
-        runs=1,
-    )[0]
-
-    bullish_price_trend = create_stochastic_process_realizations(
-        "geometric_brownian_motion_process",
-        timesteps=simulation.TIMESTEPS,
-        dt=simulation.DELTA_TIME,
-        mu=0.5,
-        sigma=0.02,
-        initial_price=2000,
-        runs=1,
-    )[0]
 
+class StochasticProcess(LazyExogenousProcess):
+    """## Stochastic Process
+    A `LazyExogenousProcess` whose realizations are generated using `create_stochastic_process_realizations(...)`,
+    with each run seeded by (seed, name, subset, run).
+
+    The process is seeded for each subset using `seeded(...)`, e.g. in `model.initialization.setup_initial_state(...)`.
+    """
+
+    __slots__ = ()
+
+    def seeded(
+        self, seed: int, name: str, subset: int, sampling="monte_carlo", tilt=0
+    ) -> "StochasticProcess":
+        """
+        Get the process seeded by the experiment seed, process name, and subset,
+        sampled using the given sampling method (see `sampling_methods`), and importance sampled with the given tilt.
+
+        The name of a process created with a name is kept, e.g. so that jointly generated processes stay correlated,
+        otherwise the given name is used, e.g. the System Parameter key.
+        Likewise, the sampling method and tilt of a process created with a sampling method or tilt are kept.
+        """
+        name = self.parameters.get("name") or name
+        parameters = {**self.parameters, "seed": seed, "name": name, "subset": subset}
+        if sampling != "monte_carlo" and "sampling" not in self.parameters:
+            parameters["sampling"] = sampling
+        if tilt and "tilt" not in self.parameters:
+            parameters["tilt"] = tilt
+        if parameters == self.parameters:
+            return self
+        return StochasticProcess(self.generator, cache_version=self.cache_version, **parameters)
+
+    def likelihood_ratio_weight(self, run: Run) -> float:
+        """
+        Get the importance sampling likelihood ratio weight of a run, see `create_likelihood_ratio_weights(...)`,
+        cached on disk alongside the realizations.
+        """
+        if not self.parameters.get("tilt"):
+            return 1.0
+        runs = self.materialize(run).runs
+        weights = load_cached_samples(
+            {**self.cache_key(runs), "likelihood_ratio_weights": True},
+            lambda: create_likelihood_ratio_weights(runs=runs, **self.parameters),
+        )
+        return float(weights[run - 1])
+
+
+def stochastic_process(
+    process: str,
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    seed=1,
+    name=None,
+    subset=0,
+    **kwargs,
+) -> StochasticProcess:
+    """## Stochastic process
+    Create a `StochasticProcess` for use as a System Parameter process, e.g. `volatile_asset_price_process`,
+    whose realizations are generated using `create_stochastic_process_realizations(...)` on first access,
+    sized to the number of runs requested, and cached on disk.
+    """
+    assert seed is not None, "A seed is required to cache the process realizations"
+
+    return StochasticProcess(
+        create_stochastic_process_realizations,
+        cache_version=samples_version,
+        process=process,
+        timesteps=timesteps,
+        dt=dt,
+        seed=seed,
+        name=name,
+        subset=subset,
+        **kwargs,
+    )
+
+
+def correlated_stochastic_processes(
+    mu: List[float],
+    sigma: List[float],
+    correlation: List[List[float]],
+    initial_price: List[float],
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    seed=1,
+    name="correlated_asset_price_processes",
+    subset=0,
+) -> List[StochasticProcess]:
+    """## Correlated stochastic processes
+    Create one `StochasticProcess` per asset, e.g. for the `fei_price_process`, `stable_asset_price_process`, and
+    `volatile_asset_price_process` System Parameters, whose realizations are jointly generated
+    using `correlated_geometric_brownian_motion_process(...)` for all runs in one vectorised draw.
+
+    The processes share the given name, and so the same seed sequence for each (seed, subset, run),
+    keeping the realizations of the assets correlated when seeded for each subset. For example:
+    ```
+    fei_price_process, stable_asset_price_process, volatile_asset_price_process = correlated_stochastic_processes(
+        mu=[0, 0, -0.5], sigma=[0.001, 0.001, 0.05], initial_price=[1, 1, 2000],
+        correlation=[[1, 0.5, 0.8], [0.5, 1, 0.5], [0.8, 0.5, 1]],
+    )
+    ```
+    """
+    correlation = np.asarray(correlation, dtype=np.float64).tolist()
+    return [
+        stochastic_process(
+            "correlated_geometric_brownian_motion_process",
+            timesteps=timesteps,
+            dt=dt,
+            seed=seed,
+            name=name,
+            subset=subset,
+            mu=list(mu),
+            sigma=list(sigma),
+            correlation=correlation,
+            initial_price=list(initial_price),
+            asset=asset,
+        )
+        for asset in range(len(mu))
+    ]
+
+
+volatile_asset_price_scenarios = {
+    # Price trend scenarios
+    "base_price_trend": dict(mu=0, sigma=0.02),
+    "bearish_price_trend": dict(mu=-0.5, sigma=0.02),
+    "bullish_price_trend": dict(mu=0.5, sigma=0.02),
     # Price volatility scenarios
+    "base_price_volatility": dict(mu=0, sigma=0.02),
+    "low_price_volatility": dict(mu=0, sigma=0.02 * 0.5),
+    "high_price_volatility": dict(mu=0, sigma=0.02 * 2),
+}
+"""Geometric Brownian Motion parameters of the Volatile Asset price scenarios, by scenario name"""
+
+
+def get_volatile_asset_price_scenario_library(
+    seed=1,
+    runs=1,
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    initial_price=2000,
+    directory=None,
+) -> ScenarioLibrary:
+    """## Get Volatile Asset price scenario library
+    Get a `ScenarioLibrary` of the Volatile Asset price scenarios across: base, bearish, bullish, high and low volatility market conditions,
+    generating and saving each scenario only if not already in the library with the same parameters and at least `runs` realizations.
+
+    Each scenario is seeded by the given seed and the scenario name, so results are reproducible.
+    A scenario can be used directly as a System Parameter process, for example:
+    ```
+    library = get_volatile_asset_price_scenario_library(runs=100)
+    parameter_overrides = {"volatile_asset_price_process": [library.process("bearish_price_trend")]}
+    ```
+    """
+    library = ScenarioLibrary(directory)
+    for name, kwargs in volatile_asset_price_scenarios.items():
+        metadata = dict(
+            process="geometric_brownian_motion_process",
+            samples_version=samples_version,
+            timesteps=timesteps,
+            dt=dt,
+            initial_price=initial_price,
+            seed=seed,
+            **kwargs,
+        )
+        library.get_or_generate(
+            name,
+            lambda: create_stochastic_process_realizations(
+                "geometric_brownian_motion_process",
+                timesteps=timesteps,
+                dt=dt,
+                initial_price=initial_price,
+                runs=runs,
+                seed=seed,
+                name=name,
+                **kwargs,
+            ),
+            runs=runs,
+            **metadata,
+        )
+    return library
+
+
+def generate_volatile_asset_price_scenarios(seed=1) -> pd.DataFrame:
+    """## Generate Volatile Asset price scenarios
+    This function generates a set of Volatile Asset price scenarios across: base, bearish, bullish, high and low volatility market conditions.
 
-    base_price_volatility = create_stochastic_process_realizations(
-        "geometric_brownian_motion_process",
-        timesteps=simulation.TIMESTEPS,
-        dt=simulation.DELTA_TIME,
-        mu=0,
-        sigma=0.02,
-        initial_price=2000,
-        runs=1,
-    )[0]
-
-    low_price_volatility = create_stochastic_process_realizations(
-        "geometric_brownian_motion_process",
-        timesteps=simulation.TIMESTEPS,
-        dt=simulation.DELTA_TIME,
-        mu=0,
-        sigma=0.02 * 0.5,
-        initial_price=2000,
-        runs=1,
-    )[0]
-
-    high_price_volatility = create_stochastic_process_realizations(
-        "geometric_brownian_motion_process",
-        timesteps=simulation.TIMESTEPS,
-        dt=simulation.DELTA_TIME,
-        mu=0,
-        sigma=0.02 * 2,
-        initial_price=2000,
-        runs=1,
-    )[0]
-
-    return pd.DataFrame(
-        {
-            # Price trend scenarios
-            "base_price_trend": base_price_trend,
-            "bearish_price_trend": bearish_price_trend,
-            "bullish_price_trend": bullish_price_trend,
-            # Price volatility scenarios
-            "base_price_volatility": base_price_volatility,
-            "low_price_volatility": low_price_volatility,
-            "high_price_volatility": high_price_volatility,
-        }
+    Each scenario is seeded by the given seed and the scenario name, so results are reproducible.
+    The scenarios are generated once and loaded from the scenario library on later calls,
+    see `get_volatile_asset_price_scenario_library(...)`.
+    """
+    return get_volatile_asset_price_scenario_library(seed=seed).to_dataframe(
+        list(volatile_asset_price_scenarios)
     )
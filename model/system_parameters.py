@@ -19,6 +19,7 @@ from model.utils import default
 from model.types import (
     Callable,
     Deposit,
+    LiquidityPool,
     PCVDeposit,
     Percentage,
     UserDeposit,
@@ -28,45 +29,58 @@ from model.types import (
     USD,
     APR,
 )
-from model.stochastic_processes import create_stochastic_process_realizations
+from model.stochastic_processes import stochastic_process
+from model.exogenous_processes import ExogenousProcess
+from model.shocks import Shock
 from model.constants import (
     wei,
 )
 
 
 # Used to configure stochastic processes,
-# for simulation monte carlo runs,
 # see experiments/simulation_configuration.py
-# or specific experiment notebook
-monte_carlo_runs = 100
-
-volatile_asset_price_samples = create_stochastic_process_realizations(
+# or specific experiment notebook.
+# NOTE Samples are generated lazily for the number of Monte Carlo runs requested, and cached on disk,
+# see `model.stochastic_processes.stochastic_process(...)`,
+# and seeded for each subset and run by the `seed` System Parameter in `model.initialization`
+# NOTE Jointly generated, correlated price processes, e.g. for depeg stress tests,
+# can be configured using `model.stochastic_processes.correlated_stochastic_processes(...)`
+volatile_asset_price_samples = stochastic_process(
     "brownian_motion_process",
     timesteps=simulation.TIMESTEPS,
     dt=simulation.DELTA_TIME,
     mu=-50,
     sigma=20,
     initial_price=2000,
-    runs=monte_carlo_runs,
+    name="volatile_asset_price_process",
 )
 
-stable_asset_price_samples = create_stochastic_process_realizations(
+stable_asset_price_samples = stochastic_process(
     "gaussian_noise_process",
     timesteps=simulation.TIMESTEPS,
     dt=simulation.DELTA_TIME,
     mu=1,
     sigma=0.005,
-    runs=monte_carlo_runs,
+    name="stable_asset_price_process",
 )
 
-money_market_utilization_rate_samples = create_stochastic_process_realizations(
+money_market_utilization_rate_samples = stochastic_process(
     "gaussian_noise_process",
     timesteps=simulation.TIMESTEPS,
     dt=simulation.DELTA_TIME,
     # NOTE Equivalent to money market utilisation rate
     mu=0.7,
     sigma=0.05,
-    runs=monte_carlo_runs,
+    name="money_market_utilization_rate_process",
+)
+
+capital_allocation_exogenous_weights_samples = stochastic_process(
+    "dirichlet_process",
+    timesteps=simulation.TIMESTEPS,
+    dt=simulation.DELTA_TIME,
+    # NOTE Dirichlet distribution concentration parameter, one per Capital Allocation User Deposit
+    alpha=[1, 1, 1, 1],
+    name="capital_allocation_exogenous_weights_process",
 )
 
 
@@ -233,8 +247,60 @@ class Parameters:
     Used by `model.utils` `update_timestamp(...)` State Update Function.
     """
 
+    seed: List[int] = default([1])
+    """
+    The experiment seed, used to independently seed the stochastic processes for each (process name, subset, run),
+    see `model.stochastic_processes.get_seed_sequence(...)`.
+
+    Used in `model.initialization`.
+    """
+
+    sampling_method: List[str] = default(["monte_carlo"])
+    """
+    The sampling method of the stochastic processes across runs, one of "monte_carlo", "antithetic", or "sobol",
+    see `model.stochastic_processes.sampling_methods`.
+    Antithetic and quasi-Monte Carlo sampling reduce the number of runs required for the same confidence interval,
+    see `experiments/notebooks/helpers/system_metrics.py` `compute_variance_reduction(...)`.
+
+    Used in `model.initialization`.
+    """
+
+    common_random_numbers: List[bool] = default([False])
+    """
+    Whether to use common random numbers across parameter sweep subsets:
+    if enabled, the stochastic processes are seeded by (seed, process name, run),
+    not by subset, so that every subset sees the same realizations for each run,
+    and paired differences between subsets require fewer runs to reach significance.
+
+    Used in `model.initialization`.
+    """
+
+    importance_sampling_tilts: List[Dict[str, float]] = default([{}])
+    """
+    Importance sampling tilts of the stochastic processes, by System Parameter key,
+    e.g. `{"volatile_asset_price_process": -0.2}` to shift the mean of the volatile asset price Brownian motion increments
+    by -0.2 standard deviations, tilting the price drift towards crashes so that rare events such as PCV shortfalls are sampled more often.
+
+    The likelihood ratio weight of each run is recorded in the `likelihood_ratio_weight` State Variable,
+    and used to weight runs in estimates such as VaR and threshold probabilities,
+    see `experiments/notebooks/helpers/system_metrics.py`.
+
+    Used in `model.initialization`.
+    """
+
+    exogenous_process_shocks: List[Dict[str, List[Shock]]] = default([{}])
+    """
+    Stress shocks overlaid on the samples of the exogenous processes, by System Parameter key,
+    e.g. `{"volatile_asset_price_process": [PriceGap(onset=90, magnitude=-0.5, duration=30)]}`,
+    see the `model.shocks` library of price gaps, volatility spikes, FEI depegs, and utilization rate spikes.
+
+    Used in `model.initialization`.
+    """
+
     # Price Processes
-    fei_price_process: List[Callable[[Run, Timestep], USD]] = default([lambda _run, _timestep: 1.0])
+    fei_price_process: List[Callable[[Run, Timestep], USD]] = default(
+        [ExogenousProcess.constant(1.0)]
+    )
     """
     A process that returns the FEI spot price at each timestep.
 
@@ -244,7 +310,7 @@ class Parameters:
     """
 
     stable_asset_price_process: List[Callable[[Run, Timestep], USD]] = default(
-        [lambda run, timestep: stable_asset_price_samples[run - 1][timestep]]
+        [stable_asset_price_samples]
     )
     """
     A process that returns the stable asset spot price at each timestep.
@@ -255,7 +321,7 @@ class Parameters:
     """
 
     volatile_asset_price_process: List[Callable[[Run, Timestep], USD]] = default(
-        [lambda run, timestep: volatile_asset_price_samples[run - 1][timestep]]
+        [volatile_asset_price_samples]
     )
     """
     A process that returns the volatile asset spot price at each timestep.
@@ -267,7 +333,7 @@ class Parameters:
 
     # FEI Savings Deposit
     fei_savings_rate_process: List[Callable[[Run, Timestep], APR]] = default(
-        [lambda _run, _timestep: 0.015]
+        [ExogenousProcess.constant(0.015)]
     )
     """
     A process that returns the FEI Savings Rate at each timestep.
@@ -310,6 +376,21 @@ class Parameters:
     Used in `model.parts.liquidity_pools`.
     """
 
+    fei_liquidity_pools: List[Dict[str, LiquidityPool]] = default([{}])
+    """
+    FEI Liquidity Pools in addition to the FEI-Volatile Liquidity Pool, by pool key, for example:
+    `{"fei_stable_liquidity_pool": LiquidityPool(asset="stable", tvl=10_000_000, trading_fee=0.0005)}`
+
+    The asset of a pool is priced using the `<asset>_asset_price` State Variable, e.g. `stable_asset_price`,
+    or for other assets such as `tribe`, using the `asset_price_process` of the pool, e.g. an `ExogenousProcess`.
+
+    The pools are stored in the `liquidity_pool_registry` State Variable, configured in `model/initialization.py`,
+    and all pools are updated at once by the Constant Function Market Maker.
+    The FEI sourced from or sinked to each pool is included in the `fei_minted_redeemed` State Variable.
+
+    Used in `model.parts.liquidity_pools`.
+    """
+
     # Money Market
     base_rate_per_block: List[float] = default([0])
     # Compound lending market "Compound Jump Rate Model" on-chain parameters, see `model.parts.money_markets` module
@@ -318,8 +399,16 @@ class Parameters:
     money_market_kink: List[float] = default([0.8])
     money_market_reserve_factor: List[float] = default([0.25])
     money_market_utilization_rate_process: List[Callable[[Run, Timestep], APR]] = default(
-        [lambda run, timestep: money_market_utilization_rate_samples[run - 1][timestep]]
+        [money_market_utilization_rate_samples]
     )
+    """
+    A process that returns the money market utilization rate at each timestep.
+
+    By default set to a Gaussian Noise stochastic process. A mean-reverting process can be configured using
+    `model.stochastic_processes.stochastic_process("ornstein_uhlenbeck_process", ...)`, bounded to [0, 1].
+
+    Used in `model.parts.money_markets`.
+    """
 
     # Asset Yield Rates
     stable_asset_yield_rate: List[APR] = default([0.10])
@@ -398,6 +487,25 @@ class Parameters:
     Used in `model.parts.pcv_management`.
     """
 
+    pcv_rebalancing_execution_duration: List[Timestep] = default([None])  # days
+    """
+    The duration in days over which each PCV rebalancing is executed, in equal tranches at each timestep
+    traded through the Liquidity Pool and accounting for slippage, e.g. 7 to 14 days.
+
+    Set to `None` to execute each PCV rebalancing immediately at 100% efficiency.
+
+    Used in `model.parts.pcv_management`.
+    """
+
+    pcv_rebalancing_slippage_threshold: List[Percentage] = default([0.02])
+    """
+    The maximum slippage of each PCV rebalancing tranche, including the Liquidity Pool trading fee,
+    where only the part of a tranche within the threshold is executed,
+    when `pcv_rebalancing_execution_duration` is enabled.
+
+    Used in `model.parts.pcv_management`.
+    """
+
     # User-circulating FEI Capital Allocation Model
     capital_allocation_fei_deposit_variables: List[Deposit] = default(
         [
@@ -422,6 +530,15 @@ class Parameters:
     Used in `model.parts.fei_capital_allocation`.
     """
 
+    capital_allocation_rebalance_matrix_diagnostic: List[bool] = default([False])
+    """
+    Calculate the pairwise transfers between User Deposits equivalent to the Capital Allocation rebalancing,
+    and record them in the `capital_allocation_rebalance_matrix` State Variable for debugging.
+    The State Variable is only populated when enabled, and otherwise remains empty.
+
+    Used in `model.parts.fei_capital_allocation`.
+    """
+
     capital_allocation_yield_rate_moving_average_window: Timestep = default([3])
     """
     Calculate moving average of yield rate over window of X number of timesteps to smooth change in Capital Allocation weights.
@@ -429,9 +546,16 @@ class Parameters:
     Used in `model.parts.fei_capital_allocation`.
     """
 
-    capital_allocation_exogenous_concentration: List[np.ndarray] = default([np.array([1, 1, 1, 1])])
+    capital_allocation_exogenous_weights_process: List[
+        Callable[[Run, Timestep], np.ndarray]
+    ] = default([capital_allocation_exogenous_weights_samples])
     """
-    Dirichlet distribution concentration parameter for use in Capital Allocation exogenous, stochastic policy.
+    Dirichlet distributed weight perturbations for use in Capital Allocation exogenous, stochastic policy,
+    one weight per `capital_allocation_fei_deposit_variables` User Deposit,
+    where `alpha` is the Dirichlet distribution concentration parameter.
+
+    The perturbations of all runs are pre-generated in a single vectorised draw and cached,
+    each run seeded by (seed, name, subset, run) like the other stochastic processes.
 
     Used in `model.parts.fei_capital_allocation`.
     """
@@ -6,9 +6,9 @@ import numpy as np
 import sys
 
 # See https://docs.python.org/3/library/dataclasses.html
-from dataclasses import dataclass
+from dataclasses import dataclass, FrozenInstanceError
 from enforce_typing import enforce_types
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Optional
 from abc import ABCMeta, abstractmethod
 
 # If Python version is greater than equal to 3.8, import from typing module
@@ -228,6 +228,23 @@ class Deposit(metaclass=ABCMeta):
 
         return self
 
+    def freeze(self):
+        """
+        Create an immutable copy of the Deposit, see `FrozenDeposit` class.
+        """
+        frozen_class = (
+            FrozenPCVDeposit if self._deposit_type == "pcv_deposit" else FrozenUserDeposit
+        )
+        return frozen_class(
+            asset=self.asset,
+            deposit_location=self.deposit_location,
+            _balance=self._balance,
+            _asset_value=self._asset_value,
+            _yield_accrued=self._yield_accrued,
+            _yield_value=self._yield_value,
+            _yield_rate=self._yield_rate,
+        )
+
     @property
     def balance(self):
         """Balance in asset units"""
@@ -281,3 +298,1023 @@ class UserDeposit(Deposit):
 
     _deposit_type = "user_deposit"
     """Implements abstract attribute from Deposit class"""
+
+
+class FrozenDeposit:
+    """## Frozen Deposit
+    An immutable, `__slots__` based variant of the generic `Deposit` class, used for PCV and User Deposit State Variables.
+
+    All operations return new instances rather than updating the Deposit in place,
+    which means State Variables are never mutated by Policies and radCAD deepcopy can be disabled.
+    For example, `deposit = deposit.deposit(amount, asset_price)` instead of `deposit.deposit(amount, asset_price)`.
+    """
+
+    __slots__ = (
+        "asset",
+        "deposit_location",
+        "_balance",
+        "_asset_value",
+        "_yield_accrued",
+        "_yield_value",
+        "_yield_rate",
+    )
+
+    _deposit_type: str = None
+    """Type of Deposit (used for State Variable naming) e.g. 'pcv_deposit' or 'user_deposit'"""
+
+    def __init__(
+        self,
+        asset: str,
+        deposit_location: str,
+        _balance: Union[FEI, StableAssetUnits, VolatileAssetUnits] = 0.0,
+        _asset_value: USD = Uninitialized,
+        _yield_accrued: Union[FEI, StableAssetUnits, VolatileAssetUnits] = 0.0,
+        _yield_value: USD = Uninitialized,
+        _yield_rate: APR = 0.0,
+    ):
+        set_field = object.__setattr__
+        set_field(self, "asset", asset)
+        set_field(self, "deposit_location", deposit_location)
+        set_field(self, "_balance", _balance)
+        set_field(self, "_asset_value", _asset_value)
+        set_field(self, "_yield_accrued", _yield_accrued)
+        set_field(self, "_yield_value", _yield_value)
+        set_field(self, "_yield_rate", _yield_rate)
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def __reduce__(self):
+        return (self.__class__, tuple(getattr(self, field) for field in FrozenDeposit.__slots__))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __eq__(self, other):
+        # NOTE Uninitialized (NaN) fields are considered equal, so that Deposits compare by value
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(
+            a == b or (a != a and b != b)
+            for a, b in zip(
+                (getattr(self, field) for field in FrozenDeposit.__slots__),
+                (getattr(other, field) for field in FrozenDeposit.__slots__),
+            )
+        )
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, field) for field in FrozenDeposit.__slots__))
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in FrozenDeposit.__slots__)
+        return f"{self.__class__.__name__}({fields})"
+
+    def _replace(self, **changes):
+        """Create a new Deposit instance with the given fields replaced"""
+        fields = {field: getattr(self, field) for field in FrozenDeposit.__slots__}
+        fields.update(changes)
+        return self.__class__(**fields)
+
+    @property
+    def key(self) -> str:
+        return "_".join([self.asset, self.deposit_location, self._deposit_type])
+
+    def __add__(self, other):
+        """See `Deposit.__add__(...)`"""
+        assert (
+            self._deposit_type == other._deposit_type
+        ), "Can't add two unlike Deposit instances together"
+        assert self.asset == other.asset, "Can't add two unlike Deposit instances together"
+
+        from_asset_price = other.asset_value / other.balance if other.balance else 0
+        to_asset_price = self.asset_value / self.balance if self.balance else 0
+
+        assert (
+            from_asset_price == to_asset_price
+        ), "Can't add two Deposit instances with different implicit asset prices"
+        assert (
+            self.yield_rate == other.yield_rate
+        ), "Can't add two Deposit instances with different yield rates"
+
+        return self._replace(
+            _balance=self.balance + other.balance,
+            _asset_value=self.asset_value + other.asset_value,
+            _yield_accrued=self.yield_accrued + other.yield_accrued,
+            _yield_value=self.yield_value + other.yield_value,
+        )
+
+    def deposit(self, amount, asset_price: USD):
+        """
+        Deposit an amount, in asset units, into Deposit balance,
+        and update the asset value. Returns the updated Deposit.
+        """
+        assert amount >= 0, "Amount must be a positive value"
+        assert asset_price >= 0, "Asset price must be a positive value"
+
+        balance = self._balance + amount
+        return self._replace(_balance=balance, _asset_value=balance * asset_price)
+
+    def withdraw(self, amount, asset_price: USD):
+        """
+        Withdraw an amount, in asset units, from the Deposit balance,
+        and update the asset value. Returns the updated Deposit.
+        """
+        assert amount >= 0, "Amount must be a positive value"
+        assert amount <= self._balance, "Amount must be less than balance"
+        assert asset_price >= 0, "Asset price must be a positive value"
+
+        balance = self._balance - amount
+        return self._replace(_balance=balance, _asset_value=balance * asset_price)
+
+    def transfer(self, to, amount, from_asset_price=None, to_asset_price=None):
+        """
+        Transfer an amount from the balance of one Deposit to the balance of another.
+        Returns the updated (from, to) Deposits.
+
+        If either asset_price is not passed as an arugment, it is calculated from the respective Deposit balance and asset_value.
+        """
+        if not from_asset_price:
+            from_asset_price = self.asset_value / self.balance if self.balance else to_asset_price
+        if not to_asset_price:
+            to_asset_price = to.asset_value / to.balance if to.balance else from_asset_price
+
+        deposit = self.withdraw(amount, from_asset_price)
+        to_amount = amount * from_asset_price / to_asset_price if to_asset_price else amount
+        if to is self:
+            # Transfer to own balance
+            deposit = to = deposit.deposit(to_amount, to_asset_price)
+        else:
+            to = to.deposit(to_amount, to_asset_price)
+
+        return deposit, to
+
+    def set_balance(self, balance, asset_price: USD):
+        """
+        Directly set the balance for the Deposit,
+        and update the asset value. Returns the updated Deposit.
+        """
+        assert balance >= 0, "Balance must be a positive value"
+        assert asset_price >= 0, "Asset price must be a positive value"
+
+        return self._replace(_balance=balance, _asset_value=balance * asset_price)
+
+    def accrue_yield(self, period_in_days: int, asset_price: USD):
+        """
+        Accrue yield on balance to yield_accrued based on yield_rate with simple interest.
+
+        Args:
+            period_in_days (int):   Requires period_in_days to convert annualized yield_rate to period yield rate
+            asset_price (float):    Requires asset_price to update the yield_value
+
+        Returns:
+            A tuple of the updated Deposit and the yield accrued in the current timestep
+        """
+        assert asset_price >= 0, "Asset price must be a positive value"
+        assert period_in_days >= 0, "Period in days must be a positive value"
+
+        delta_yield_accrued = self._balance * (self._yield_rate * period_in_days / 365)
+        yield_accrued = self._yield_accrued + delta_yield_accrued
+
+        return (
+            self._replace(_yield_accrued=yield_accrued, _yield_value=yield_accrued * asset_price),
+            delta_yield_accrued,
+        )
+
+    def accrue_yield_compounded(self, period_in_days, asset_price: USD):
+        """
+        Accrue yield on balance to yield_accrued based on yield_rate with compound interest.
+        Returns the updated Deposit.
+        """
+        deposit, _ = self.accrue_yield(period_in_days, asset_price)
+        deposit, _ = deposit.transfer_yield(deposit, deposit.yield_accrued, asset_price)
+
+        assert deposit.yield_accrued == 0
+        assert deposit.yield_value == 0
+
+        return deposit
+
+    def transfer_yield(self, to, amount, asset_price: USD):
+        """
+        Transfer an amount from the yield_accrued of one Deposit to the balance of another (can include own balance).
+        Returns the updated (from, to) Deposits, which are the same instance when transferring to own balance.
+        """
+        assert amount <= self._yield_accrued, "Transfer amount greater than yield accrued"
+        assert amount >= 0, "Amount must be a positive value"
+        assert asset_price >= 0, "Asset price must be a positive value"
+
+        yield_accrued = self._yield_accrued - amount
+        if to is self:
+            deposit = self.deposit(amount, asset_price)._replace(
+                _yield_accrued=yield_accrued, _yield_value=yield_accrued * asset_price
+            )
+            return deposit, deposit
+        else:
+            return (
+                self._replace(
+                    _yield_accrued=yield_accrued, _yield_value=yield_accrued * asset_price
+                ),
+                to.deposit(amount, asset_price),
+            )
+
+    def update_asset_value(self, asset_price: USD):
+        """
+        Update the asset value based on the current asset price. Returns the updated Deposit.
+        """
+        return self._replace(_asset_value=self._balance * asset_price)
+
+    def set_yield_rate(self, new_yield_rate):
+        """
+        Set the annualized yield rate. Returns the updated Deposit.
+        """
+        assert new_yield_rate >= 0, new_yield_rate
+        return self._replace(_yield_rate=new_yield_rate)
+
+    @property
+    def balance(self):
+        """Balance in asset units"""
+        return self._balance
+
+    @property
+    def asset_value(self):
+        """Value of balance in USD"""
+        return self._asset_value
+
+    @property
+    def yield_accrued(self):
+        """Yield accrued on balance (simple or compound interest) in asset units"""
+        return self._yield_accrued
+
+    @property
+    def yield_value(self):
+        """Value of yield accrued in USD"""
+        return self._yield_value
+
+    @property
+    def yield_rate(self):
+        """Annualized yield rate (as APR or simple interest rate without compounding)"""
+        return self._yield_rate
+
+
+class FrozenPCVDeposit(FrozenDeposit):
+    """## Frozen PCV Deposit
+
+    Inherits from FrozenDeposit class.
+    """
+
+    __slots__ = ()
+
+    _deposit_type = "pcv_deposit"
+
+
+class FrozenUserDeposit(FrozenDeposit):
+    """## Frozen User Deposit
+
+    Inherits from FrozenDeposit class.
+    """
+
+    __slots__ = ()
+
+    _deposit_type = "user_deposit"
+
+
+class _AppendLog:
+    """An append-only array of values, shared by a `RingBuffer` and the buffers appended from it"""
+
+    __slots__ = ("values", "size")
+
+    def __init__(self, values: np.ndarray, size: int = 0):
+        self.values = values
+        self.size = size
+
+
+class RingBuffer:
+    """## Ring Buffer
+    An immutable, fixed-size ring buffer of the most recent values of a State Variable,
+    used to keep a bounded State History for Policies that look back in time (see `Lookback` class).
+
+    The values are stored in an append-only log with capacity for twice the window, shared by a buffer and the buffers appended from it,
+    where each buffer is a view of the last `count` values before its `end` index in the log.
+    Appending to the most recent buffer of a log writes the value in place and returns a new instance,
+    and once the log is full the buffered values are copied to a new log, so that an append costs an amortised O(1) independent of the window length.
+    Appending to an older buffer copies its values to a new log, leaving the more recent buffers unchanged.
+
+    Values can be scalars or Numpy arrays of a fixed shape, e.g. of Monte Carlo runs (see `model.batch`).
+    """
+
+    __slots__ = ("window", "log", "end", "count")
+
+    _fields = __slots__
+    """Fields in order of `__init__(...)` arguments, extended by subclasses"""
+
+    def __init__(self, window: int, log: _AppendLog = None, end: int = 0, count: int = 0):
+        assert window > 0, "Window must be a positive value"
+        set_field = object.__setattr__
+        set_field(self, "window", window)
+        set_field(self, "log", log)
+        set_field(self, "end", end)
+        set_field(self, "count", count)
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def __reduce__(self):
+        return (self.__class__, tuple(getattr(self, field) for field in self._fields))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self):
+        return self.count
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.window == other.window and np.array_equal(
+            self.to_array(), other.to_array(), equal_nan=True
+        )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(window={self.window}, values={self.to_array()!r})"
+
+    def _push(self, value):
+        """
+        Push a value onto the log in place, if this is the most recent buffer of the log and the log is not full,
+        otherwise onto a new log holding the remaining buffered values.
+        Returns the updated log, end, and count, the evicted oldest value if the buffer was full, else None,
+        and whether a new log was created.
+        """
+        value = np.asarray(value, dtype=float)
+        log, end, count = self.log, self.end, self.count
+        evicted = log.values[end - count] if count == self.window else None
+
+        compacted = log is None or log.size != end or end == len(log.values)
+        if compacted:
+            kept = min(count, self.window - 1)
+            values = np.empty((2 * self.window, *value.shape))
+            if kept:
+                values[:kept] = log.values[end - kept : end]
+            log, end = _AppendLog(values), kept
+
+        log.values[end] = value
+        end += 1
+        log.size = end
+        return (log, end, min(count + 1, self.window), evicted, compacted)
+
+    def append(self, value):
+        """
+        Append a value, evicting the oldest value once the buffer is full. Returns the updated RingBuffer.
+        """
+        log, end, count, _, _ = self._push(value)
+        return RingBuffer(self.window, log, end, count)
+
+    def latest(self):
+        """Get the most recent value"""
+        assert self.count, "Ring buffer is empty"
+        return self.log.values[self.end - 1]
+
+    def to_array(self) -> np.ndarray:
+        """
+        Get the buffered values in order from oldest to most recent, with shape (count, *value shape).
+        """
+        if self.log is None:
+            return np.empty(0)
+        return self.log.values[self.end - self.count : self.end]
+
+    def select(self, index):
+        """
+        Select the values, and any rolling statistics, at an index of the last axis,
+        e.g. a subset of Monte Carlo runs (see `model.batch`). Returns a new instance with its own log.
+        """
+        log = self.log and _AppendLog(self.log.values[..., index], self.end)
+        statistics = [getattr(self, field) for field in self._fields[len(RingBuffer._fields) :]]
+        return self.__class__(
+            self.window,
+            log,
+            self.end,
+            self.count,
+            *[value[..., index] if np.ndim(value) else value for value in statistics],
+        )
+
+
+class RollingRegressionBuffer(RingBuffer):
+    """## Rolling Regression Buffer
+    A `RingBuffer` that also keeps the least-squares sufficient statistics of the buffered values `y`
+    against their index `x`, from 0 for the oldest value, so that the slope of the values can be calculated in O(1).
+
+    Σy and Σxy are updated incrementally on append, with Σx and Σx² calculated in closed form from the count.
+    To bound any accumulated floating-point error, the statistics are recalculated exactly each time the values are copied to a new log,
+    at an amortised cost of O(1).
+    """
+
+    __slots__ = ("sum_y", "sum_xy")
+
+    _fields = RingBuffer._fields + __slots__
+
+    def __init__(
+        self,
+        window: int,
+        log: _AppendLog = None,
+        end: int = 0,
+        count: int = 0,
+        sum_y=0.0,
+        sum_xy=0.0,
+    ):
+        super().__init__(window, log, end, count)
+        object.__setattr__(self, "sum_y", sum_y)
+        object.__setattr__(self, "sum_xy", sum_xy)
+
+    def append(self, value):
+        """
+        Append a value, and update the sufficient statistics. Returns the updated RollingRegressionBuffer.
+        """
+        log, end, count, evicted, compacted = self._push(value)
+        sum_y, sum_xy = self.sum_y, self.sum_xy
+
+        if compacted:
+            # Values copied to a new log: recalculate statistics exactly
+            values = log.values[end - count : end]
+            sum_y = values.sum(axis=0)
+            sum_xy = np.tensordot(np.arange(count), values, axes=1)
+        else:
+            if evicted is not None:
+                # Remove oldest value at x = 0, and shift remaining values to start from x = 0
+                sum_y = sum_y - evicted
+                sum_xy = sum_xy - sum_y
+            # Add value at x = number of remaining values
+            sum_xy = sum_xy + (count - 1) * log.values[end - 1]
+            sum_y = sum_y + log.values[end - 1]
+
+        return RollingRegressionBuffer(self.window, log, end, count, sum_y, sum_xy)
+
+    def slope(self, exclude_latest=False):
+        """
+        Calculate the least-squares slope of the buffered values against their index,
+        optionally excluding the most recent value. Returns zero if there are less than two values.
+        """
+        n, sum_y, sum_xy = self.count, self.sum_y, self.sum_xy
+        if exclude_latest and n:
+            latest = self.latest()
+            n -= 1
+            sum_y = sum_y - latest
+            sum_xy = sum_xy - n * latest
+        if n < 2:
+            return 0.0
+
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        return (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x**2)
+
+
+class RollingStatisticsBuffer(RingBuffer):
+    """## Rolling Statistics Buffer
+    A `RingBuffer` that also keeps the windowed mean and sum of squared deviations (M2) of the buffered values,
+    updated in O(1) per value (or O(n) for values of shape (n,)) on append using Welford's algorithm,
+    independent of the window length.
+
+    As with the `RollingRegressionBuffer`, the statistics are recalculated exactly each time the values are copied to a new log.
+    """
+
+    __slots__ = ("mean", "m2")
+
+    _fields = RingBuffer._fields + __slots__
+
+    def __init__(
+        self,
+        window: int,
+        log: _AppendLog = None,
+        end: int = 0,
+        count: int = 0,
+        mean=0.0,
+        m2=0.0,
+    ):
+        super().__init__(window, log, end, count)
+        object.__setattr__(self, "mean", mean)
+        object.__setattr__(self, "m2", m2)
+
+    def append(self, value):
+        """
+        Append a value, and update the windowed mean and M2. Returns the updated RollingStatisticsBuffer.
+        """
+        log, end, count, evicted, compacted = self._push(value)
+        value = log.values[end - 1]
+
+        if compacted:
+            # Values copied to a new log: recalculate statistics exactly
+            values = log.values[end - count : end]
+            mean = values.mean(axis=0)
+            m2 = ((values - mean) ** 2).sum(axis=0)
+        elif evicted is not None:
+            # Replace oldest value, with a constant count
+            mean = self.mean + (value - evicted) / count
+            m2 = self.m2 + (value - evicted) * (value - mean + evicted - self.mean)
+        else:
+            delta = value - self.mean
+            mean = self.mean + delta / count
+            m2 = self.m2 + delta * (value - mean)
+
+        return RollingStatisticsBuffer(self.window, log, end, count, mean, m2)
+
+    def sum(self):
+        """Get the sum of the buffered values"""
+        return self.mean * self.count
+
+    def variance(self):
+        """Get the (population) variance of the buffered values, equivalent to `np.var(...)`"""
+        return np.maximum(self.m2 / self.count, 0) if self.count else self.m2
+
+    def std(self):
+        """Get the (population) standard deviation of the buffered values, equivalent to `np.std(...)`"""
+        return np.sqrt(self.variance())
+
+
+class Lookback(NamedTuple):
+    """## Lookback
+    The State History a Policy looks back on, declared using `model.utils.lookback(...)` in place of reading `state_history`.
+
+    A `RingBuffer` (or subclass) State Variable `key` holding the last `window` values is updated at the start of each timestep.
+    """
+
+    key: StateVariableKey
+    """The State History State Variable key, e.g. `volatile_asset_price_history`"""
+    value: Union[StateVariableKey, Callable]
+    """Either a State Variable key, or a function `value(params, state)` of the value to record each timestep"""
+    window: str
+    """The System Parameter key of the number of timesteps to look back, e.g. `volatile_asset_risk_metric_time_window`"""
+    history: type = RingBuffer
+    """The State History class, either a `RingBuffer` or subclass that keeps rolling statistics e.g. `RollingRegressionBuffer`"""
+
+
+class DepositLedger:
+    """## Deposit Ledger
+    A struct-of-arrays store of the numerical fields of a collection of Deposits,
+    where each field (see `DepositLedger.fields`) is stored as a contiguous float64 array indexed by Deposit (State Variable) key.
+
+    The Deposit arrays have shape `(deposits, *shape)`, e.g. `(deposits,)` for a single run,
+    or `(deposits, runs)` for a batch of Monte Carlo runs (see `DepositLedger.stack(...)` and `model.batch`).
+
+    Individual Deposits are accessed as lightweight `PCVDepositView` or `UserDepositView` instances using `ledger[key]`,
+    which have the same method API as the `Deposit` class and update the ledger arrays in place.
+    Copying a ledger copies a single array, rather than deep copying each Deposit instance.
+    """
+
+    fields = ("balance", "asset_value", "yield_accrued", "yield_value", "yield_rate")
+    """Numerical Deposit fields, in the same order as the `Deposit` class"""
+    field_index = {field: index for index, field in enumerate(fields)}
+
+    __slots__ = ("keys", "index", "assets", "deposit_locations", "deposit_types", "data")
+
+    def __init__(self, deposits: Dict[StateVariableKey, Deposit] = None):
+        deposits = deposits or {}
+        self.keys: List[StateVariableKey] = list(deposits.keys())
+        self.index: Dict[StateVariableKey, int] = {key: i for i, key in enumerate(self.keys)}
+        self.assets: List[str] = [deposit.asset for deposit in deposits.values()]
+        self.deposit_locations: List[str] = [
+            deposit.deposit_location for deposit in deposits.values()
+        ]
+        self.deposit_types: List[str] = [deposit._deposit_type for deposit in deposits.values()]
+        # Array with shape (fields, deposits, *shape)
+        self.data: np.ndarray = np.array(
+            [
+                [getattr(deposit, field) for deposit in deposits.values()]
+                for field in DepositLedger.fields
+            ],
+            dtype=np.float64,
+        ).reshape(len(DepositLedger.fields), len(deposits))
+
+    @classmethod
+    def stack(cls, ledgers: List["DepositLedger"]) -> "DepositLedger":
+        """
+        Stack ledgers with the same Deposit keys, e.g. one for each Monte Carlo run, along a new last axis.
+        """
+        ledger = ledgers[0].copy()
+        ledger.data = np.stack([ledger.data for ledger in ledgers], axis=-1)
+        return ledger
+
+    def copy(self) -> "DepositLedger":
+        """
+        Copy the ledger arrays, sharing the immutable Deposit key and asset metadata.
+        """
+        ledger = DepositLedger.__new__(DepositLedger)
+        ledger.keys = self.keys
+        ledger.index = self.index
+        ledger.assets = self.assets
+        ledger.deposit_locations = self.deposit_locations
+        ledger.deposit_types = self.deposit_types
+        ledger.data = self.data.copy()
+        return ledger
+
+    def __getitem__(self, key: StateVariableKey) -> "DepositView":
+        index = self.index[key]
+        view_class = (
+            PCVDepositView if self.deposit_types[index] == "pcv_deposit" else UserDepositView
+        )
+        return view_class(self, index)
+
+    def __contains__(self, key: StateVariableKey) -> bool:
+        return key in self.index
+
+    def indices(self, keys: List[StateVariableKey]) -> np.ndarray:
+        """Ledger indices of the Deposit keys"""
+        return np.array([self.index[key] for key in keys], dtype=int)
+
+    def field(self, field: str, keys: List[StateVariableKey] = None) -> np.ndarray:
+        """
+        Copy of a Deposit field array with shape `(deposits, *shape)`, for all Deposits or the Deposit keys passed.
+        """
+        values = self.data[DepositLedger.field_index[field]]
+        return values.copy() if keys is None else values[self.indices(keys)]
+
+    def sum(self, keys: List[StateVariableKey], field: str = "balance") -> np.ndarray:
+        """
+        Sum of a Deposit field across the Deposit keys passed, e.g. the total balance of a set of Deposits.
+        """
+        return self.data[DepositLedger.field_index[field]][self.indices(keys)].sum(axis=0)
+
+    def accrue_yield(
+        self, keys: List[StateVariableKey], period_in_days, asset_prices
+    ) -> np.ndarray:
+        """
+        Accrue simple interest for the Deposit keys passed at once, see `Deposit.accrue_yield(...)`.
+
+        Args:
+            keys (List[StateVariableKey]): Deposit keys
+            period_in_days (int): Period used to convert annualized yield rates to period yield rates
+            asset_prices: Asset price of each Deposit, with shape `(len(keys), *shape)`
+
+        Returns:
+            The yield accrued for each Deposit in the current timestep
+        """
+        assert np.all(np.asarray(asset_prices) >= 0), "Asset price must be a positive value"
+        assert period_in_days >= 0, "Period in days must be a positive value"
+
+        balance, yield_accrued, yield_value, yield_rate = [
+            DepositLedger.field_index[field]
+            for field in ["balance", "yield_accrued", "yield_value", "yield_rate"]
+        ]
+        indices = self.indices(keys)
+        delta_yield_accrued = self.data[balance, indices] * (
+            self.data[yield_rate, indices] * period_in_days / 365
+        )
+        self.data[yield_accrued, indices] += delta_yield_accrued
+        self.data[yield_value, indices] = self.data[yield_accrued, indices] * asset_prices
+
+        return delta_yield_accrued
+
+
+class DepositView:
+    """## Deposit View
+    A lightweight view of a single Deposit stored in a `DepositLedger`, with the same method API as the `Deposit` class.
+
+    All methods accept an optional `where` mask that selects which elements (e.g. Monte Carlo runs) of a
+    batched ledger are updated, and assertions apply to the selected elements only.
+    """
+
+    __slots__ = ("ledger", "_index")
+
+    _deposit_type: str = None
+
+    def __init__(self, ledger: DepositLedger, index: int):
+        self.ledger = ledger
+        self._index = index
+
+    def _get(self, field: str):
+        return self.ledger.data[DepositLedger.field_index[field], self._index].copy()
+
+    def _set(self, field: str, value, where=True):
+        row = self.ledger.data[DepositLedger.field_index[field]]
+        row[self._index] = value if where is True else np.where(where, value, row[self._index])
+
+    @property
+    def asset(self) -> str:
+        return self.ledger.assets[self._index]
+
+    @property
+    def deposit_location(self) -> str:
+        return self.ledger.deposit_locations[self._index]
+
+    @property
+    def key(self) -> str:
+        return "_".join([self.asset, self.deposit_location, self._deposit_type])
+
+    def deposit(self, amount, asset_price: USD, where=True):
+        """See `Deposit.deposit(...)`"""
+        assert np.all((amount >= 0) | np.logical_not(where)), "Amount must be a positive value"
+        assert np.all(
+            (asset_price >= 0) | np.logical_not(where)
+        ), "Asset price must be a positive value"
+
+        balance = self._get("balance") + amount
+        self._set("balance", balance, where)
+        self._set("asset_value", balance * asset_price, where)
+
+        return self
+
+    def withdraw(self, amount, asset_price: USD, where=True):
+        """See `Deposit.withdraw(...)`"""
+        assert np.all((amount >= 0) | np.logical_not(where)), "Amount must be a positive value"
+        assert np.all(
+            (amount <= self.balance) | np.logical_not(where)
+        ), "Amount must be less than balance"
+        assert np.all(
+            (asset_price >= 0) | np.logical_not(where)
+        ), "Asset price must be a positive value"
+
+        balance = self._get("balance") - amount
+        self._set("balance", balance, where)
+        self._set("asset_value", balance * asset_price, where)
+
+        return self
+
+    def transfer(self, to, amount, from_asset_price=None, to_asset_price=None, where=True):
+        """See `Deposit.transfer(...)`"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if from_asset_price is None:
+                from_asset_price = np.where(
+                    self.balance,
+                    self.asset_value / self.balance,
+                    np.nan if to_asset_price is None else to_asset_price,
+                )
+            if to_asset_price is None:
+                to_asset_price = np.where(to.balance, to.asset_value / to.balance, from_asset_price)
+
+        self.withdraw(amount, from_asset_price, where)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            to.deposit(
+                np.where(to_asset_price, amount * from_asset_price / to_asset_price, amount),
+                to_asset_price,
+                where,
+            )
+
+        return self, to
+
+    def set_balance(self, balance, asset_price: USD, where=True):
+        """See `Deposit.set_balance(...)`"""
+        assert np.all((balance >= 0) | np.logical_not(where)), "Balance must be a positive value"
+        assert np.all(
+            (asset_price >= 0) | np.logical_not(where)
+        ), "Asset price must be a positive value"
+
+        self._set("balance", balance, where)
+        self._set("asset_value", balance * asset_price, where)
+
+        return self
+
+    def accrue_yield(self, period_in_days: int, asset_price: USD, where=True):
+        """See `Deposit.accrue_yield(...)`"""
+        assert np.all(
+            (asset_price >= 0) | np.logical_not(where)
+        ), "Asset price must be a positive value"
+        assert period_in_days >= 0, "Period in days must be a positive value"
+
+        delta_yield_accrued = self._get("balance") * (
+            self._get("yield_rate") * period_in_days / 365
+        )
+        yield_accrued = self._get("yield_accrued") + delta_yield_accrued
+        self._set("yield_accrued", yield_accrued, where)
+        self._set("yield_value", yield_accrued * asset_price, where)
+
+        # Only yield accrued for the selected elements is returned
+        return delta_yield_accrued if where is True else np.where(where, delta_yield_accrued, 0)
+
+    def accrue_yield_compounded(self, period_in_days, asset_price: USD, where=True):
+        """See `Deposit.accrue_yield_compounded(...)`"""
+        self.accrue_yield(period_in_days, asset_price, where)
+        self.transfer_yield(self, self.yield_accrued, asset_price, where)
+
+        return self
+
+    def transfer_yield(self, to, amount, asset_price: USD, where=True):
+        """See `Deposit.transfer_yield(...)`"""
+        assert np.all(
+            (amount <= self.yield_accrued) | np.logical_not(where)
+        ), "Transfer amount greater than yield accrued"
+        assert np.all((amount >= 0) | np.logical_not(where)), "Amount must be a positive value"
+        assert np.all(
+            (asset_price >= 0) | np.logical_not(where)
+        ), "Asset price must be a positive value"
+
+        yield_accrued = self._get("yield_accrued") - amount
+        self._set("yield_accrued", yield_accrued, where)
+        to.deposit(amount, asset_price, where)
+        self._set("yield_value", yield_accrued * asset_price, where)
+
+        return self, to
+
+    def update_asset_value(self, asset_price: USD, where=True):
+        """See `Deposit.update_asset_value(...)`"""
+        self._set("asset_value", self._get("balance") * asset_price, where)
+
+        return self
+
+    @property
+    def balance(self):
+        """Balance in asset units"""
+        return self._get("balance")
+
+    @property
+    def asset_value(self):
+        """Value of balance in USD"""
+        return self._get("asset_value")
+
+    @property
+    def yield_accrued(self):
+        """Yield accrued on balance (simple or compound interest) in asset units"""
+        return self._get("yield_accrued")
+
+    @property
+    def yield_value(self):
+        """Value of yield accrued in USD"""
+        return self._get("yield_value")
+
+    @property
+    def yield_rate(self):
+        """Annualized yield rate (as APR or simple interest rate without compounding)"""
+        return self._get("yield_rate")
+
+    @yield_rate.setter
+    def yield_rate(self, new_yield_rate):
+        assert np.all(new_yield_rate >= 0), new_yield_rate
+        self._set("yield_rate", new_yield_rate)
+
+    def set_yield_rate(self, new_yield_rate, where=True):
+        """
+        Set the annualized yield rate, for the elements selected by the `where` mask.
+        """
+        assert np.all((new_yield_rate >= 0) | np.logical_not(where)), new_yield_rate
+        self._set("yield_rate", new_yield_rate, where)
+
+        return self
+
+
+class PCVDepositView(DepositView):
+    """## PCV Deposit View
+
+    Inherits from DepositView class.
+    """
+
+    __slots__ = ()
+
+    _deposit_type = "pcv_deposit"
+
+
+class UserDepositView(DepositView):
+    """## User Deposit View
+
+    Inherits from DepositView class.
+    """
+
+    __slots__ = ()
+
+    _deposit_type = "user_deposit"
+
+
+class LiquidityPool(NamedTuple):
+    """## Liquidity Pool
+    The configuration of a Uniswap style FEI Liquidity Pool stored in a `LiquidityPoolRegistry`,
+    see the `fei_liquidity_pools` System Parameter.
+    """
+
+    asset: str
+    """The asset paired with FEI, e.g. `stable`, priced using the `<asset>_asset_price` State Variable unless `asset_price_process` is set"""
+    tvl: USD
+    """The initial Liquidity Pool TVL, split equally between FEI and the asset"""
+    trading_fee: Percentage = 0.003
+    """The Uniswap style trading fee collected on incoming assets"""
+    asset_price_process: Optional[Callable[[Run, Timestep], USD]] = None
+    """
+    The asset price process with the signature `process(run, timestep)`, e.g. an `ExogenousProcess`,
+    required for assets without an `<asset>_asset_price` State Variable, e.g. `tribe`
+    """
+
+
+class LiquidityPoolRegistry:
+    """## Liquidity Pool Registry
+    A struct-of-arrays store of a collection of Uniswap style FEI Liquidity Pools,
+    where each field (see `LiquidityPoolRegistry.fields`) is stored as a float64 array indexed by pool key,
+    so that the Constant Function Market Maker updates all pools at once (see `model.parts.liquidity_pools`).
+
+    As with the `DepositLedger`, the pool arrays have shape `(pools, *shape)`, e.g. `(pools,)` for a single run,
+    or `(pools, runs)` for a batch of Monte Carlo runs (see `LiquidityPoolRegistry.stack(...)` and `model.batch`).
+    Registries are updated by creating a new registry using `LiquidityPoolRegistry.replace(...)`.
+    """
+
+    fields = (
+        "fei_balance",
+        "asset_balance",
+        "invariant",
+        "trading_fee",
+        "asset_price_reference",
+        "tvl",
+        "impermanent_loss",
+        "trading_fees",
+        "fei_source_sink",
+    )
+    """Numerical Liquidity Pool fields: pool reserves and configuration, followed by the metrics of the last update"""
+    field_index = {field: index for index, field in enumerate(fields)}
+
+    __slots__ = ("keys", "index", "assets", "asset_price_processes", "data")
+
+    def __init__(
+        self,
+        pools: Dict[str, LiquidityPool] = None,
+        fei_price: USD = 1.0,
+        asset_prices: Dict[str, USD] = None,
+    ):
+        """
+        Create a registry of Liquidity Pools with balanced reserves at the given FEI price,
+        and the initial asset price of each pool by pool key.
+
+        NOTE Registry pools only hold user-supplied liquidity, which is not added or removed during the simulation,
+        so liquidity tokens are not tracked.
+        """
+        pools = pools or {}
+        asset_prices = asset_prices or {}
+        self.keys: List[str] = list(pools.keys())
+        self.index: Dict[str, int] = {key: i for i, key in enumerate(self.keys)}
+        self.assets: List[str] = [pool.asset for pool in pools.values()]
+        self.asset_price_processes: List[Optional[Callable]] = [
+            pool.asset_price_process for pool in pools.values()
+        ]
+
+        data = np.zeros((len(LiquidityPoolRegistry.fields), len(pools)), dtype=np.float64)
+        for index, (key, pool) in enumerate(pools.items()):
+            asset_price = asset_prices[key]
+            fei_balance = pool.tvl / 2 / fei_price
+            asset_balance = pool.tvl / 2 / asset_price
+            data[:, index] = [
+                fei_balance,
+                asset_balance,
+                fei_balance * asset_balance,
+                pool.trading_fee,
+                asset_price,
+                pool.tvl,
+                0.0,
+                0.0,
+                0.0,
+            ]
+        self.data: np.ndarray = data
+
+    @classmethod
+    def stack(cls, registries: List["LiquidityPoolRegistry"]) -> "LiquidityPoolRegistry":
+        """
+        Stack registries with the same pool keys, e.g. one for each Monte Carlo run, along a new last axis.
+        """
+        registry = registries[0].copy()
+        registry.data = np.stack([registry.data for registry in registries], axis=-1)
+        return registry
+
+    def copy(self) -> "LiquidityPoolRegistry":
+        """
+        Copy the registry arrays, sharing the immutable pool key and asset metadata.
+        """
+        registry = LiquidityPoolRegistry.__new__(LiquidityPoolRegistry)
+        registry.keys = self.keys
+        registry.index = self.index
+        registry.assets = self.assets
+        registry.asset_price_processes = self.asset_price_processes
+        registry.data = self.data.copy()
+        return registry
+
+    def replace(self, **fields) -> "LiquidityPoolRegistry":
+        """
+        Create a new registry with the given field arrays of shape `(pools, *shape)` replaced.
+        """
+        registry = self.copy()
+        for field, values in fields.items():
+            registry.data[LiquidityPoolRegistry.field_index[field]] = values
+        return registry
+
+    def field(self, field: str) -> np.ndarray:
+        """Copy of a Liquidity Pool field array with shape `(pools, *shape)`"""
+        return self.data[LiquidityPoolRegistry.field_index[field]].copy()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __eq__(self, other):
+        # NOTE Registries compare by value, as with Deposits
+        if not isinstance(other, LiquidityPoolRegistry):
+            return NotImplemented
+        return (self.keys, self.assets) == (other.keys, other.assets) and np.array_equal(
+            self.data, other.data, equal_nan=True
+        )
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(keys={self.keys}, assets={self.assets})"
@@ -8,6 +8,9 @@ import logging
 import datetime
 from dataclasses import field
 from functools import partial
+from typing import List
+
+from model.types import Lookback, RingBuffer
 
 
 def _update_from_signal(
@@ -85,6 +88,58 @@ def update_timestamp(params, substep, state_history, previous_state, policy_inpu
     return "timestamp", timestamp
 
 
+def lookback(key, value, window, history=RingBuffer):
+    """
+    A Policy decorator to declare the State History a Policy looks back on, see `model.types.Lookback`.
+
+    A bounded State History is kept in the `key` State Variable, rather than the Policy reading the full `state_history`.
+
+    Args:
+        key (str): State History State Variable key, e.g. `volatile_asset_price_history`
+        value (str or Callable): State Variable key, or function `value(params, state)` of the value to record
+        window (str): System Parameter key of the number of timesteps to look back
+        history (type, optional): State History class, `RingBuffer` or subclass. Defaults to `RingBuffer`.
+    Returns:
+        Callable: A decorator that adds the Lookback to the Policy's `lookbacks` attribute
+    """
+
+    def decorator(policy):
+        policy.lookbacks = getattr(policy, "lookbacks", ()) + (
+            Lookback(key, value, window, history),
+        )
+        return policy
+
+    return decorator
+
+
+def get_lookbacks(state_update_blocks) -> List[Lookback]:
+    """Get all Lookbacks declared by the Policies of the given State Update Blocks."""
+    return [
+        lookback
+        for block in state_update_blocks
+        for policy in block["policies"].values()
+        for lookback in getattr(policy, "lookbacks", ())
+    ]
+
+
+def _update_history(lookback, params, substep, state_history, previous_state, policy_input):
+    """A private function used to generate the partial function returned by `update_history(...)`."""
+    value = (
+        previous_state[lookback.value]
+        if isinstance(lookback.value, str)
+        else lookback.value(params, previous_state)
+    )
+    return lookback.key, previous_state[lookback.key].append(value)
+
+
+def update_history(lookback):
+    """
+    A State Update Function to record the value of a Lookback in its State History `RingBuffer`.
+    Used in the first State Update Block of each timestep, so the State History holds the values of the previous `window` timesteps.
+    """
+    return partial(_update_history, lookback)
+
+
 def local_variables(_locals):
     """Return a dictionary of all local variables, useful for debugging."""
     return {key: _locals[key] for key in [_key for _key in _locals.keys() if "__" not in _key]}
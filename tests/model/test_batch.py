@@ -0,0 +1,212 @@
+import copy
+import pytest
+import numpy as np
+
+from experiments.default_experiment import experiment
+from experiments.run import run, run_batched
+from model.exogenous_processes import ExogenousProcess
+from model.types import LiquidityPool, LiquidityPoolRegistry
+
+
+@pytest.fixture
+def batched_experiment():
+    batched_experiment = copy.deepcopy(experiment)
+    batched_experiment.engine.drop_substeps = True
+    simulation = batched_experiment.simulations[0]
+    simulation.runs = 2
+    simulation.timesteps = 120
+    return batched_experiment
+
+
+def test_batched_engine_equivalence(batched_experiment):
+    """
+    Check that the batched engine results match the radCAD engine results
+    """
+    df, _exceptions = run(copy.deepcopy(batched_experiment))
+    df_batched, _exceptions = run_batched(copy.deepcopy(batched_experiment))
+
+    assert df.shape == df_batched.shape
+    assert set(df.columns) == set(df_batched.columns)
+
+    for column in df.columns:
+        if df[column].dtype.kind in "fi":
+            assert np.allclose(
+                df[column].values.astype(float),
+                df_batched[column].values.astype(float),
+                equal_nan=True,
+            ), column
+
+
+@pytest.mark.parametrize("common_random_numbers", [False, True])
+def test_common_random_numbers(batched_experiment, common_random_numbers):
+    """
+    Check that with common random numbers, each run sees the same realizations across parameter sweep subsets
+    """
+    batched_experiment.simulations[0].model.params.update(
+        {
+            "common_random_numbers": [common_random_numbers],
+            "target_stable_backing_ratio": [0.2, 0.5],
+        }
+    )
+    df, _exceptions = run_batched(batched_experiment)
+
+    for variable in ["volatile_asset_price", "stable_asset_price", "fei_money_market_utilization"]:
+        subset_0 = df.query("subset == 0").sort_values(["run", "timestep"])[variable].values
+        subset_1 = df.query("subset == 1").sort_values(["run", "timestep"])[variable].values
+        assert np.array_equal(subset_0, subset_1) == common_random_numbers, variable
+
+
+def test_importance_sampling(batched_experiment):
+    """
+    Check that each importance sampled run records its likelihood ratio weight
+    """
+    batched_experiment.simulations[0].model.params.update(
+        {"importance_sampling_tilts": [{"volatile_asset_price_process": -0.1}]}
+    )
+    df, _exceptions = run_batched(batched_experiment)
+
+    weights = df.groupby("run")["likelihood_ratio_weight"]
+    assert (weights.nunique() == 1).all()
+    assert weights.first().nunique() == 2
+    assert not np.allclose(weights.first(), 1)
+
+
+def test_run_exceptions(batched_experiment):
+    """
+    Check that runs failing with an exception are stopped, and reported, the same as in the radCAD engine
+    """
+    batched_experiment.engine.raise_exceptions = False
+    simulation = batched_experiment.simulations[0]
+    simulation.runs = 4
+    # Insufficient PCV in the PSM PCV Deposits for redemption in some runs
+    pcv_deposits = copy.deepcopy(simulation.model.params["pcv_deposits"][0])
+    for key, balance in [
+        ("stable_idle_pcv_deposit", 2e6),
+        ("volatile_idle_pcv_deposit", 0),
+        ("volatile_yield_bearing_pcv_deposit", 0),
+    ]:
+        pcv_deposits[key].set_balance(balance, asset_price=1.0)
+    simulation.model.params.update({"pcv_deposits": [pcv_deposits]})
+
+    df, exceptions = run(copy.deepcopy(batched_experiment))
+    df_batched, exceptions_batched = run_batched(copy.deepcopy(batched_experiment))
+
+    failed_runs = [exception["run"] for exception in exceptions if exception["exception"]]
+    assert 0 < len(failed_runs) < simulation.runs
+    assert [
+        (exception["run"], repr(exception["exception"])) for exception in exceptions_batched
+    ] == [(exception["run"], repr(exception["exception"])) for exception in exceptions]
+
+    # Failed runs return partial results up to the last completed timestep
+    assert df_batched.groupby("run")["timestep"].max().to_dict() == (
+        df.groupby("run")["timestep"].max().to_dict()
+    )
+    for column in ["total_pcv", "total_user_circulating_fei", "fei_minted_redeemed"]:
+        assert np.allclose(df[column].values, df_batched[column].values, equal_nan=True), column
+
+    batched_experiment.engine.raise_exceptions = True
+    with pytest.raises(Exception, match="Insufficient PCV for redemption"):
+        run_batched(copy.deepcopy(batched_experiment))
+
+
+def test_pcv_rebalancing_execution(batched_experiment):
+    """
+    Check that slippage-aware PCV rebalancing execution matches between engines, within the slippage threshold
+    """
+    batched_experiment.simulations[0].model.params.update(
+        {
+            "rebalancing_period": [30],
+            "pcv_rebalancing_execution_duration": [14],
+            "pcv_rebalancing_slippage_threshold": [0.005],
+        }
+    )
+    df, _exceptions = run(copy.deepcopy(batched_experiment))
+    df_batched, _exceptions = run_batched(copy.deepcopy(batched_experiment))
+
+    for column in [
+        "pcv_rebalancing_slippage",
+        "pcv_rebalancing_order_stable_asset_balance",
+        "pcv_rebalancing_order_timesteps_remaining",
+        "total_stable_asset_pcv",
+        "total_volatile_asset_pcv",
+        "liquidity_pool_invariant",
+        "fei_minted_redeemed",
+        "volatile_liquidity_pool_pcv_deposit_balance",
+        "fei_liquidity_pool_user_deposit_balance",
+    ]:
+        assert np.allclose(
+            df[column].values.astype(float), df_batched[column].values.astype(float)
+        ), column
+
+    slippage = df_batched["pcv_rebalancing_slippage"]
+    assert slippage.max() > 0 and np.all(slippage <= 0.005 + 1e-12)
+    assert df_batched["pcv_rebalancing_order_timesteps_remaining"].max() == 13
+
+    # Executed tranches are traded through the Liquidity Pool,
+    # and the FEI minted or redeemed in the PSM is included in addition to the pool arbitrage
+    executed = slippage > 0
+    fei_minted_redeemed_trade = (
+        df_batched["fei_minted_redeemed"] + df_batched["liquidity_pool_fei_source_sink"]
+    )
+    assert np.all(fei_minted_redeemed_trade[executed].abs() > 0)
+    assert np.allclose(fei_minted_redeemed_trade[~executed], 0)
+
+
+def test_liquidity_pool_registry(batched_experiment):
+    """
+    Check that additional FEI Liquidity Pools match between engines, and source or sink FEI
+    """
+    fei_liquidity_pools = {
+        f"fei_{asset}_{i}_liquidity_pool": LiquidityPool(asset=asset, tvl=1e6 * (i + 1))
+        for i in range(10)
+        for asset in ["stable", "volatile"]
+    }
+    # An asset without an `<asset>_asset_price` State Variable, priced using a process
+    timesteps = batched_experiment.simulations[0].timesteps
+    fei_liquidity_pools["fei_tribe_liquidity_pool"] = LiquidityPool(
+        asset="tribe",
+        tvl=5e6,
+        asset_price_process=ExogenousProcess(
+            np.linspace(0.5, 1.5, 4 * (timesteps + 1)).reshape(4, timesteps + 1)
+        ),
+    )
+    batched_experiment.simulations[0].model.params.update(
+        {"fei_liquidity_pools": [{}, fei_liquidity_pools]}
+    )
+    df, _exceptions = run(copy.deepcopy(batched_experiment))
+    df_batched, _exceptions = run_batched(copy.deepcopy(batched_experiment))
+
+    columns = [
+        pool_key + "_" + field
+        for pool_key in fei_liquidity_pools
+        for field in LiquidityPoolRegistry.fields
+    ] + ["liquidity_pool_fei_source_sink", "fei_minted_redeemed", "liquidity_pool_tvl"]
+    for column in columns:
+        assert np.allclose(
+            df[column].values.astype(float),
+            df_batched[column].values.astype(float),
+            equal_nan=True,
+        ), column
+
+    df_pools = df_batched.query("subset == 1 and timestep > 0")
+    fei_source_sink = df_pools[[key + "_fei_source_sink" for key in fei_liquidity_pools]]
+    assert np.all(fei_source_sink.abs().sum(axis=1) > 0)
+    # Trading fees are retained in each pool
+    invariant = df_pools[[key + "_invariant" for key in fei_liquidity_pools]]
+    assert np.all(invariant.groupby(df_pools["run"]).diff().dropna() >= -1e-6 * invariant.max())
+
+
+def test_liquidity_pool_registry_asset_price(batched_experiment):
+    """
+    Check that a Liquidity Pool asset without a price State Variable or process fails with a clear error
+    """
+    batched_experiment.simulations[0].timesteps = 2
+    batched_experiment.simulations[0].model.params.update(
+        {
+            "fei_liquidity_pools": [
+                {"fei_tribe_liquidity_pool": LiquidityPool(asset="tribe", tvl=1e6)}
+            ]
+        }
+    )
+    with pytest.raises(ValueError, match="tribe_asset_price"):
+        run_batched(batched_experiment)
@@ -0,0 +1,103 @@
+import copy
+import pickle
+import numpy as np
+import pytest
+
+from model.exogenous_processes import ExogenousProcess, LazyExogenousProcess, load_cached_samples
+
+
+def test_exogenous_process_sampling():
+    samples = np.arange(12, dtype=float).reshape(3, 4)
+    process = ExogenousProcess(samples.tolist())
+
+    # Test process is called in the same way as `lambda run, timestep: samples[run - 1][timestep]`
+    assert process(1, 0) == 0.0
+    assert process(3, 2) == samples[2][2]
+    assert np.array_equal(process.sample(np.array([1, 2, 3]), 1), samples[:, 1])
+    assert np.array_equal(process[1], samples[1])
+    assert np.array_equal(process[:, 3], samples[:, 3])
+
+    # Test samples are immutable
+    assert not process.samples.flags.writeable
+    assert copy.deepcopy(process) is process
+
+    # Test constant process broadcasts across runs and timesteps
+    constant = ExogenousProcess.constant(1.0)
+    assert constant(100, 365) == 1.0
+    assert np.array_equal(constant.sample(np.array([1, 2]), 10), [1.0, 1.0])
+    assert constant.to_array(2, 3).shape == (2, 3)
+
+
+def test_exogenous_process_pickle():
+    samples = np.random.default_rng(1).normal(size=(10, 100))
+    process = ExogenousProcess(samples)
+    shared_process = process.share()
+
+    assert not process.is_shared
+    assert shared_process.is_shared
+    assert np.array_equal(shared_process.samples, samples)
+
+    # Test shared process is pickled by reference to the shared buffer
+    assert len(pickle.dumps(shared_process)) < len(pickle.dumps(process)) // 10
+    unpickled_process = pickle.loads(pickle.dumps(shared_process))
+    assert unpickled_process.samples is shared_process.samples
+    assert unpickled_process(10, 99) == samples[9][99]
+
+
+def generate_samples(runs, timesteps, seed):
+    return np.array(
+        [
+            np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(run,))).normal(
+                size=timesteps
+            )
+            for run in range(runs)
+        ]
+    )
+
+
+def test_lazy_exogenous_process(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEI_MODEL_CACHE_DIR", str(tmp_path))
+    process = LazyExogenousProcess(generate_samples, timesteps=10, seed=1)
+
+    # Test samples are generated on first access, sized to the runs requested
+    assert process.runs == 0
+    first_sample = process(1, 0)
+    assert process.runs == 1
+    assert process(3, 9) == generate_samples(3, 10, 1)[2][9]
+    assert process.runs == 4
+    assert process(1, 0) == first_sample
+    assert np.array_equal(process.sample(np.array([1, 2, 3]), 5), generate_samples(3, 10, 1)[:, 5])
+
+    # Test samples are cached on disk, and memory-mapped by other processes
+    assert process.is_shared
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+    cached_process = LazyExogenousProcess(generate_samples, timesteps=10, seed=1)
+    assert cached_process(3, 9) == process(3, 9)
+    assert cached_process.samples is process.samples
+
+    # Test process is pickled by reference to the cached samples
+    unpickled_process = pickle.loads(pickle.dumps(process))
+    assert isinstance(unpickled_process, LazyExogenousProcess)
+    assert unpickled_process.samples is process.samples
+
+
+def test_load_cached_samples(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEI_MODEL_CACHE_DIR", str(tmp_path))
+
+    # Test large arrays that differ only in elements truncated from their repr have different cache keys
+    weights = np.zeros(2000)
+    other_weights = weights.copy()
+    other_weights[1000] = 1
+    assert repr(weights) == repr(other_weights)
+    samples = load_cached_samples({"weights": weights}, lambda: np.zeros(3))
+    other_samples = load_cached_samples({"weights": other_weights}, lambda: np.ones(3))
+    assert np.array_equal(samples, np.zeros(3))
+    assert np.array_equal(other_samples, np.ones(3))
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+
+    # Test cache keys are canonical
+    cached_samples = load_cached_samples({"weights": weights.copy()}, lambda: np.ones(3))
+    assert np.array_equal(cached_samples, samples)
+
+    with pytest.raises(TypeError):
+        load_cached_samples({"generator": object()}, lambda: np.zeros(3))
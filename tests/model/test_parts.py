@@ -3,6 +3,18 @@ import numpy as np
 
 from experiments.default_experiment import experiment
 from experiments.run import run
+from model.parts.fei_capital_allocation import (
+    compute_capital_allocation_net_balance_change,
+    get_rebalance_solver,
+)
+from model.exogenous_processes import ExogenousProcess
+from model.parts.liquidity_pools import (
+    constant_function_market_maker,
+    get_liquidity_pool_asset_prices,
+)
+from model.parts.pcv_management import get_pcv_rebalancing_trade, get_pcv_rebalancing_tranche
+from model.types import LiquidityPool, LiquidityPoolRegistry
+import model.parts.uniswap as uniswap
 
 
 @pytest.fixture
@@ -79,3 +91,234 @@ def test_money_market_utilization(df):
     assert (
         np.isclose(df.fei_money_market_utilization, calculated_utilization_rate)
     ).all(), "Money market utilization rate inconsistent"
+
+
+def test_capital_allocation_rebalance_solver():
+    number_of_deposits = 4
+    solver = get_rebalance_solver(number_of_deposits)
+    assert get_rebalance_solver(number_of_deposits) is solver
+
+    rng = np.random.default_rng(1)
+    total_fei_deposit_balance_change = rng.normal(0, 1e6, (3, number_of_deposits))
+    total_fei_deposit_balance_change -= total_fei_deposit_balance_change.mean(axis=1, keepdims=True)
+
+    # Test batched solution matches solution for each row
+    rebalance_matrix = solver.solve(total_fei_deposit_balance_change)
+    for index, balance_change in enumerate(total_fei_deposit_balance_change):
+        assert np.allclose(rebalance_matrix[index], solver.solve(balance_change))
+
+    # Test net flow of rebalance matrix meets the balance change of each Deposit
+    net_flow = rebalance_matrix.sum(axis=-1) - rebalance_matrix.sum(axis=-2)
+    assert np.allclose(net_flow, total_fei_deposit_balance_change)
+
+
+def test_capital_allocation_net_balance_change():
+    current_deposit_balances = np.array([[0, 30e6, 0, 195e6], [10e6, 10e6, 10e6, 10e6]])
+    total_fei_deposit_balance_change = np.array([[-5e6, 10e6, 5e6, -10e6], [-1e6, 2e6, -3e6, 2e6]])
+
+    net_balance_change = compute_capital_allocation_net_balance_change(
+        current_deposit_balances, total_fei_deposit_balance_change
+    )
+
+    # Test outflows are clipped against available balances, and total FEI is conserved
+    assert np.all(current_deposit_balances + net_balance_change >= 0)
+    assert np.allclose(net_balance_change.sum(axis=-1), 0)
+    assert np.allclose(net_balance_change[0], [0, 20e6 / 3, 10e6 / 3, -10e6])
+    # Test feasible balance changes are applied unchanged
+    assert np.allclose(net_balance_change[1], total_fei_deposit_balance_change[1])
+
+
+def test_pcv_rebalancing_tranche():
+    fei_balance, volatile_asset_balance = 100e6, 50e3
+    trade_fee, slippage_threshold = 0.003, 0.02
+    # Volatile to stable: a small tranche, and a tranche larger than the slippage threshold allows
+    # Stable to volatile: a small tranche, redeemed for FEI at the stable asset price
+    stable_asset_balance_change = np.array([200 * 2000, 20e3 * 2000, -1e6, 0])
+    volatile_asset_balance_change = np.array([-200, -20e3, 1e6 / 2000, 0])
+
+    fill, slippage = get_pcv_rebalancing_tranche(
+        stable_asset_balance_change,
+        volatile_asset_balance_change,
+        stable_asset_price=1.0,
+        fei_price=1.0,
+        fei_balance=fei_balance,
+        volatile_asset_balance=volatile_asset_balance,
+        trade_fee=trade_fee,
+        slippage_threshold=slippage_threshold,
+    )
+
+    # Test small tranches are executed in full, priced using the Uniswap input price
+    assert np.allclose(fill, [1, fill[1], 1, 0]) and 0 < fill[1] < 1
+    _dx, dy = uniswap.get_input_price(200, volatile_asset_balance, fei_balance, trade_fee)
+    assert np.isclose(slippage[0], 1 + dy / (200 * fei_balance / volatile_asset_balance))
+    _dx, dy = uniswap.get_input_price(1e6, fei_balance, volatile_asset_balance, trade_fee)
+    assert np.isclose(slippage[2], 1 + dy / (1e6 * volatile_asset_balance / fei_balance))
+    # Test large tranches are executed up to the slippage threshold
+    assert np.isclose(slippage[1], slippage_threshold)
+    assert np.all(slippage <= slippage_threshold + 1e-12) and slippage[3] == 0
+
+
+def test_pcv_rebalancing_trade():
+    fei_balance, volatile_asset_balance = 100e6, 50e3
+    volatile_asset_price, trade_fee = 2000.0, 0.003
+    # Volatile to stable, and stable to volatile tranches of 1e6 USD
+    (
+        updated_fei_balance,
+        updated_volatile_asset_balance,
+        volatile_asset_balance_change,
+        fei_minted_redeemed,
+    ) = get_pcv_rebalancing_trade(
+        np.array([1e6, -1e6]),
+        np.array([-500, 500]),
+        stable_asset_price=1.0,
+        fei_price=1.0,
+        fei_balance=fei_balance,
+        volatile_asset_balance=volatile_asset_balance,
+        trade_fee=trade_fee,
+    )
+
+    # Test the tranches are applied to the pool reserves, with the FEI redeemed or minted in the PSM
+    _dx, dy = uniswap.get_input_price(500, volatile_asset_balance, fei_balance, trade_fee)
+    assert np.isclose(updated_volatile_asset_balance[0], volatile_asset_balance + 500)
+    assert np.isclose(updated_fei_balance[0], fei_balance + dy)
+    assert volatile_asset_balance_change[0] == -500 and fei_minted_redeemed[0] == dy
+    _dx, dy = uniswap.get_input_price(1e6, fei_balance, volatile_asset_balance, trade_fee)
+    assert np.isclose(updated_fei_balance[1], fei_balance + 1e6)
+    assert np.isclose(updated_volatile_asset_balance[1], volatile_asset_balance + dy)
+    assert volatile_asset_balance_change[1] == -dy and fei_minted_redeemed[1] == 1e6
+    # Test the trading fee is retained in the pool
+    invariant = updated_fei_balance * updated_volatile_asset_balance
+    assert np.all(invariant > fei_balance * volatile_asset_balance)
+
+    # Test arbitrage restores the pool to the asset price, settling the trades in the PSM at a loss to the PCV
+    pools = constant_function_market_maker(
+        fei_balance=updated_fei_balance,
+        asset_balance=updated_volatile_asset_balance,
+        invariant=invariant,
+        trading_fee=trade_fee,
+        asset_price=volatile_asset_price,
+        asset_price_reference=volatile_asset_price,
+        fei_price=1.0,
+        dt=1,
+    )
+    assert np.allclose(
+        pools["asset_balance"] * volatile_asset_price / pools["fei_balance"], 1, rtol=1e-3
+    )
+    stable_asset_received, stable_asset_paid = (
+        pools["delta_fei_balance"][0],
+        -pools["delta_fei_balance"][1],
+    )
+    assert 0.98e6 < stable_asset_received < 1e6
+    assert stable_asset_paid > volatile_asset_balance_change[1] * volatile_asset_price
+    # Test the slippage and fees accrue to the Liquidity Providers
+    assert np.all(pools["fei_balance"] > fei_balance)
+    assert np.all(pools["asset_balance"] > volatile_asset_balance)
+
+
+def test_uniswap_array_math():
+    rng = np.random.default_rng(1)
+    x_balance, y_balance = rng.uniform(1e3, 1e6, size=(2, 10))
+    voucher_balance = np.where(np.arange(10) % 3, rng.uniform(1e3, 1e6, size=10), 0)
+    trade_sizes = rng.uniform(0, 1e4, size=10)
+
+    # Test array arguments match the scalar results element-wise
+    for function, args in [
+        (uniswap.add_liquidity, (x_balance, y_balance, voucher_balance, trade_sizes, trade_sizes)),
+        (uniswap.remove_liquidity, (x_balance, y_balance, voucher_balance + 1, trade_sizes)),
+        (uniswap.get_input_price, (trade_sizes, x_balance, y_balance, 0.003)),
+        (uniswap.get_output_price, (trade_sizes, x_balance, y_balance, 0.003)),
+        (
+            uniswap.collateral_to_token,
+            (trade_sizes, x_balance * (voucher_balance > 0), y_balance, 0.003),
+        ),
+        (
+            uniswap.token_to_collateral,
+            (trade_sizes, x_balance, y_balance * (voucher_balance > 0), 0.003),
+        ),
+        (uniswap.get_slippage, (trade_sizes * (voucher_balance > 0), x_balance, y_balance, 0.003)),
+        (uniswap.get_price_impact, (trade_sizes, x_balance, y_balance, 0.003)),
+    ]:
+        expected = [function(*[arg[i] if np.ndim(arg) else arg for arg in args]) for i in range(10)]
+        assert np.allclose(np.transpose(function(*args)), expected), function.__name__
+
+    # Test the largest input within a slippage threshold
+    max_input_amount = uniswap.get_max_input_amount(0.02, x_balance, 0.003)
+    assert np.allclose(uniswap.get_slippage(max_input_amount, x_balance, y_balance, 0.003), 0.02)
+    assert np.all(uniswap.get_max_input_amount(0.002, x_balance, 0.003) == 0)
+
+    # Test slippage and price impact curves of each pool, increasing with trade size
+    curves = uniswap.get_trade_curves(x_balance, y_balance, trade_fee=0.003, points=11)
+    assert all(curve.shape == (10, 11) for curve in curves.values())
+    assert np.allclose(curves["slippage"][:, 0], 0.003) and np.all(np.diff(curves["slippage"]) > 0)
+    assert np.all(np.diff(curves["price_impact"]) > 0)
+    assert np.allclose(
+        curves["effective_price"],
+        (1 - curves["slippage"]) * (y_balance / x_balance)[:, np.newaxis],
+    )
+
+
+def test_constant_function_market_maker():
+    rng = np.random.default_rng(1)
+    fei_balance, asset_balance = rng.uniform(1e6, 1e8, size=(2, 20))
+    pools = dict(
+        fei_balance=fei_balance,
+        asset_balance=asset_balance,
+        invariant=fei_balance * asset_balance,
+        trading_fee=rng.choice([0.0005, 0.003, 0.01], size=20),
+        asset_price=rng.uniform(0.5, 2, size=20),
+        asset_price_reference=1.0,
+    )
+
+    # Test all pools are rebalanced at once, matching each pool rebalanced alone
+    updated_pools = constant_function_market_maker(**pools, fei_price=1.0, dt=1)
+    for i in range(20):
+        updated_pool = constant_function_market_maker(
+            **{key: value[i] if np.ndim(value) else value for key, value in pools.items()},
+            fei_price=1.0,
+            dt=1,
+        )
+        for key, value in updated_pool.items():
+            assert np.isclose(updated_pools[key][i], value), key
+
+    # Test pools are rebalanced to the asset price, with trading fees retained in the pool
+    assert np.allclose(
+        updated_pools["asset_balance"] * pools["asset_price"] / updated_pools["fei_balance"],
+        1,
+        rtol=0.02,
+    )
+    assert np.all(updated_pools["invariant"] >= pools["invariant"])
+    assert np.all(updated_pools["trading_fees"] > 0)
+
+
+def test_liquidity_pool_asset_prices():
+    timesteps = 10
+    samples = np.linspace(0.5, 1.5, 3 * timesteps).reshape(3, timesteps)
+    registry = LiquidityPoolRegistry(
+        {
+            "fei_stable_liquidity_pool": LiquidityPool(asset="stable", tvl=1e6),
+            "fei_tribe_liquidity_pool": LiquidityPool(
+                asset="tribe", tvl=1e6, asset_price_process=ExogenousProcess(samples)
+            ),
+            "fei_rai_liquidity_pool": LiquidityPool(
+                asset="rai", tvl=1e6, asset_price_process=lambda run, timestep: 3.0 * run
+            ),
+        },
+        asset_prices={
+            "fei_stable_liquidity_pool": 1.0,
+            "fei_tribe_liquidity_pool": samples[0, 0],
+            "fei_rai_liquidity_pool": 3.0,
+        },
+    )
+
+    # Test asset prices for a single run, and for an array of runs, match the State Variable or process
+    asset_prices = get_liquidity_pool_asset_prices(
+        {"run": 2, "timestep": 4, "stable_asset_price": 0.99}, registry, dt=2
+    )
+    assert np.allclose(asset_prices, [0.99, samples[1, 8], 6.0])
+
+    runs = np.array([1, 2, 3])
+    asset_prices = get_liquidity_pool_asset_prices(
+        {"run": runs, "timestep": 4, "stable_asset_price": np.full(3, 0.99)}, registry, dt=2
+    )
+    assert asset_prices.shape == (3, 3)
+    assert np.allclose(asset_prices, [[0.99] * 3, samples[:, 8], 3.0 * runs])
@@ -0,0 +1,53 @@
+import pickle
+import numpy as np
+
+from model.scenario_library import ScenarioLibrary
+from model.stochastic_processes import (
+    create_stochastic_process_realizations,
+    get_volatile_asset_price_scenario_library,
+    volatile_asset_price_scenarios,
+)
+
+
+def test_scenario_library(tmp_path):
+    library = ScenarioLibrary(str(tmp_path))
+    samples = np.random.default_rng(1).normal(size=(4, 10))
+
+    # Test scenarios are saved with metadata, and loaded as memory-mapped processes
+    process = library.save("scenario", samples, mu=0, sigma=1)
+    assert library.names() == ["scenario"]
+    assert library.metadata("scenario") == {"mu": 0, "sigma": 1, "shape": [4, 10]}
+    assert isinstance(library.load("scenario"), np.memmap)
+    assert process.is_shared
+    assert process(4, 9) == samples[3][9]
+    assert pickle.loads(pickle.dumps(process)).samples is process.samples
+
+    # Test scenarios are only regenerated if the metadata changes, or more runs are required
+    def generate():
+        raise AssertionError("Scenario regenerated")
+
+    assert (
+        library.get_or_generate("scenario", generate, runs=2, mu=0, sigma=1)(1, 0) == samples[0][0]
+    )
+    process = library.get_or_generate("scenario", lambda: samples[:1] + 1, runs=1, mu=1, sigma=1)
+    assert process.shape == (1, 10)
+    assert process(2, 0) == samples[0][0] + 1
+
+
+def test_volatile_asset_price_scenario_library(tmp_path):
+    library = get_volatile_asset_price_scenario_library(runs=2, directory=str(tmp_path))
+    assert library.names() == sorted(volatile_asset_price_scenarios)
+
+    bearish_price_trend = create_stochastic_process_realizations(
+        "geometric_brownian_motion_process",
+        mu=-0.5,
+        sigma=0.02,
+        initial_price=2000,
+        runs=2,
+        seed=1,
+        name="bearish_price_trend",
+    )
+    assert np.array_equal(library.load("bearish_price_trend"), bearish_price_trend)
+    assert np.array_equal(
+        library.to_dataframe(run=2)["bearish_price_trend"], bearish_price_trend[1]
+    )
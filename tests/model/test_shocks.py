@@ -0,0 +1,73 @@
+import copy
+import pickle
+import numpy as np
+
+from experiments.default_experiment import experiment
+from experiments.run import run_batched
+from model.exogenous_processes import ExogenousProcess
+from model.shocks import (
+    Depeg,
+    PriceGap,
+    ShockedProcess,
+    UtilizationSpike,
+    VolatilitySpike,
+    apply_shocks,
+)
+
+
+def test_shocks():
+    samples = np.random.default_rng(1).lognormal(size=(4, 20))
+    process = ExogenousProcess(samples)
+
+    # Test price gap recovers after the shock
+    shocked_process = apply_shocks(process, [PriceGap(onset=5, magnitude=-0.5, duration=3)], 20)
+    assert np.allclose(shocked_process[:, 5:8], samples[:, 5:8] * 0.5)
+    assert np.array_equal(shocked_process[:, :5], samples[:, :5])
+    assert np.array_equal(shocked_process[:, 8:], samples[:, 8:])
+
+    # Test volatility spike scales log returns during the shock, and the price level change persists
+    shocked_process = apply_shocks(process, [VolatilitySpike(onset=5, magnitude=3, duration=3)], 20)
+    log_returns = np.diff(np.log(samples), axis=1)
+    shocked_log_returns = np.diff(np.log(shocked_process.samples), axis=1)
+    assert np.allclose(shocked_log_returns[:, 4:7], 3 * log_returns[:, 4:7])
+    assert np.allclose(shocked_log_returns[:, 7:], log_returns[:, 7:])
+    assert np.allclose(shocked_process[:, :5], samples[:, :5])
+
+    # Test depeg and utilization spike, until the end of the process
+    constant_process = ExogenousProcess.constant(0.9)
+    shocked_process = apply_shocks(constant_process, [Depeg(onset=10, magnitude=0.05)], 20)
+    assert shocked_process(3, 9) == 0.9 and np.isclose(shocked_process(3, 19), 0.85)
+    shocked_process = apply_shocks(
+        constant_process, [UtilizationSpike(onset=10, magnitude=0.5, duration=5)], 20
+    )
+    assert shocked_process(1, 12) == 1 and shocked_process(1, 15) == 0.9
+
+    # Test shocked process is reused, and pickled by reference to the underlying process
+    assert apply_shocks(shocked_process, shocked_process.shocks, 20) is shocked_process
+    assert apply_shocks(shocked_process, [], 20) is constant_process
+    unpickled_process = pickle.loads(pickle.dumps(shocked_process))
+    assert isinstance(unpickled_process, ShockedProcess)
+    assert unpickled_process(1, 12) == 1
+
+
+def test_shock_parameter_sweep():
+    shock_experiment = copy.deepcopy(experiment)
+    simulation = shock_experiment.simulations[0]
+    simulation.runs = 2
+    simulation.timesteps = 60
+    shock = PriceGap(onset=30, magnitude=-0.5, duration=10)
+    simulation.model.params.update(
+        {
+            "common_random_numbers": [True],
+            "exogenous_process_shocks": [{}, {"volatile_asset_price_process": [shock]}],
+        }
+    )
+    df, _exceptions = run_batched(shock_experiment)
+
+    price = df.pivot_table(
+        index=["run", "timestep"], columns="subset", values="volatile_asset_price"
+    )
+    timestep = price.index.get_level_values("timestep")
+    in_shock = (timestep >= 30) & (timestep < 40)
+    assert np.allclose(price[1][in_shock], price[0][in_shock] * 0.5)
+    assert np.allclose(price[1][~in_shock], price[0][~in_shock])
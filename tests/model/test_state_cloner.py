@@ -0,0 +1,109 @@
+import copy
+import dataclasses
+import pickle
+import pytest
+import numpy as np
+from dataclasses import make_dataclass
+from typing import List
+
+from experiments.default_experiment import experiment
+from experiments.run import run
+import model.initialization as initialization
+from model.state_update_blocks import lookbacks
+from model.types import FEI, PCVDeposit, FrozenPCVDeposit
+from model.state_cloner import StateDict, generate_state_schema
+
+
+StateVariablesWithDeposits = make_dataclass(
+    "StateVariablesWithDeposits",
+    fields=[
+        ("total_fei_supply", FEI, 1.0),
+        ("active_psm_pcv_deposit_keys", List[str], None),
+        ("capital_allocation_target_weights", np.ndarray, None),
+        ("fei_idle_pcv_deposit", PCVDeposit, None),
+        ("stable_idle_pcv_deposit", FrozenPCVDeposit, None),
+    ],
+)
+
+
+@pytest.fixture
+def state():
+    state = StateDict(
+        {
+            "total_fei_supply": 1.0,
+            "active_psm_pcv_deposit_keys": ["stable_idle_pcv_deposit"],
+            "capital_allocation_target_weights": np.array([0.5, 0.5]),
+            "fei_idle_pcv_deposit": PCVDeposit(asset="fei", deposit_location="idle"),
+            "stable_idle_pcv_deposit": FrozenPCVDeposit(asset="stable", deposit_location="idle"),
+            "simulation": 0,
+            "subset": 0,
+            "run": 1,
+            "substep": 0,
+            "timestep": 0,
+        }
+    )
+    state.set_schema(generate_state_schema(StateVariablesWithDeposits))
+    return state
+
+
+def test_state_cloner_copy(state):
+    state["unknown_state_variable"] = {"a": [1]}
+    cloned = state.copy()
+
+    assert isinstance(cloned, StateDict)
+    assert list(cloned) == list(state)
+    assert cloned.schema == state.schema
+
+    # Immutable State Variables are copied by reference
+    assert cloned["stable_idle_pcv_deposit"] is state["stable_idle_pcv_deposit"]
+
+    # Mutable State Variables are copied, and isolated from the original State
+    cloned["fei_idle_pcv_deposit"].deposit(100, 1.0)
+    cloned["capital_allocation_target_weights"][0] = 1.0
+    cloned["active_psm_pcv_deposit_keys"].append("volatile_idle_pcv_deposit")
+    cloned["unknown_state_variable"]["a"].append(2)
+
+    assert state["fei_idle_pcv_deposit"].balance == 0
+    assert state["capital_allocation_target_weights"][0] == 0.5
+    assert state["active_psm_pcv_deposit_keys"] == ["stable_idle_pcv_deposit"]
+    assert state["unknown_state_variable"] == {"a": [1]}
+
+
+def test_state_cloner_pickle(state):
+    for state_copy in [copy.deepcopy(state), pickle.loads(pickle.dumps(state, -1))]:
+        assert isinstance(state_copy, StateDict)
+        assert state_copy.schema == state.schema
+        assert state_copy.copy().keys() == state.keys()
+
+
+def test_state_variables_with_deposits_defaults(monkeypatch):
+    """
+    Check the `StateVariablesWithDeposits` dataclass created in `model.initialization` has no unhashable field defaults,
+    which are not allowed by `dataclasses` from Python 3.11
+    """
+    created = []
+
+    def make_dataclass_checked(*args, **kwargs):
+        state_variables_class = dataclasses.make_dataclass(*args, **kwargs)
+        for field in dataclasses.fields(state_variables_class):
+            assert (
+                field.default is dataclasses.MISSING or field.default.__class__.__hash__ is not None
+            ), f"Unhashable default for field {field.name}"
+        created.append(state_variables_class)
+        return state_variables_class
+
+    monkeypatch.setattr(initialization, "make_dataclass", make_dataclass_checked)
+
+    simulation_experiment = copy.deepcopy(experiment)
+    simulation_experiment.simulations[0].runs = 1
+    simulation_experiment.simulations[0].timesteps = 1
+    run(simulation_experiment)
+
+    assert created
+    # State History instances are not shared between dataclass instances
+    state_variables_class = created[0]
+    assert all(
+        getattr(state_variables_class(), lookback.key)
+        is not getattr(state_variables_class(), lookback.key)
+        for lookback in lookbacks
+    )
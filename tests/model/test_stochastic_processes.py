@@ -0,0 +1,338 @@
+import pytest
+import numpy as np
+from stochastic import processes
+
+from model.stochastic_processes import (
+    correlated_stochastic_processes,
+    create_likelihood_ratio_weights,
+    create_stochastic_process_realizations,
+    get_seed_sequence,
+    load_historical_log_returns,
+    stochastic_process,
+)
+
+
+timesteps = 50
+runs = 2000
+
+
+def sample_stochastic_package(process, rng, mu, sigma, initial_price=1):
+    """Sample the equivalent process of the `stochastic` package, as previously configured"""
+    n = timesteps + 1
+    if process == "geometric_brownian_motion_process":
+        gbm = processes.continuous.GeometricBrownianMotion(drift=mu, volatility=sigma, t=n, rng=rng)
+        gbm._brownian_motion.rng = rng
+        return gbm.sample(n, initial=initial_price)[:n]
+    elif process == "brownian_motion_process":
+        bm = processes.continuous.BrownianMotion(drift=mu, scale=sigma, t=n, rng=rng)
+        return initial_price + bm.sample(n)[:n]
+    else:
+        return mu + sigma * processes.noise.GaussianNoise(t=timesteps, rng=rng).sample(n)
+
+
+@pytest.mark.parametrize(
+    "process,kwargs",
+    [
+        ("geometric_brownian_motion_process", dict(mu=-0.5, sigma=0.02, initial_price=2000)),
+        ("brownian_motion_process", dict(mu=-50, sigma=20, initial_price=2000)),
+        ("gaussian_noise_process", dict(mu=0.7, sigma=0.05)),
+    ],
+)
+def test_stochastic_process_realizations(process, kwargs):
+    samples = create_stochastic_process_realizations(
+        process, timesteps=timesteps, dt=1, runs=runs, seed=1, **kwargs
+    )
+    assert samples.shape == (runs, timesteps + 1)
+
+    # Test realizations are independent of the number of runs
+    assert np.array_equal(
+        samples[:10],
+        create_stochastic_process_realizations(
+            process, timesteps=timesteps, dt=1, runs=10, seed=1, **kwargs
+        ),
+    )
+
+    # Test realizations are equivalent in distribution to the `stochastic` package processes
+    rng = np.random.default_rng(2)
+    expected_samples = np.array(
+        [sample_stochastic_package(process, rng, **kwargs) for _ in range(runs)]
+    )
+    mean, expected_mean = samples.mean(axis=0), expected_samples.mean(axis=0)
+    std, expected_std = samples.std(axis=0), expected_samples.std(axis=0)
+    standard_error = np.sqrt((std**2 + expected_std**2) / runs)
+    assert np.all(np.abs(mean - expected_mean) <= 5 * standard_error + 1e-9)
+    assert np.allclose(std, expected_std, rtol=0.1, atol=1e-9)
+
+
+def test_stochastic_process_seeding(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEI_MODEL_CACHE_DIR", str(tmp_path))
+    process = stochastic_process("gaussian_noise_process", timesteps=timesteps, mu=0, sigma=1)
+
+    # Test seed sequences are independent of global state and order of creation
+    assert get_seed_sequence(1, "a", 0, 1).generate_state(4).tolist() == (
+        get_seed_sequence(1, "a", 0, 1).generate_state(4).tolist()
+    )
+    assert get_seed_sequence(1, "a", 0, 1).generate_state(4).tolist() != (
+        get_seed_sequence(1, "b", 0, 1).generate_state(4).tolist()
+    )
+
+    # Test each (seed, name, subset, run) has an independent, reproducible realization
+    subset_0 = process.seeded(seed=1, name="utilization_rate", subset=0)
+    subset_1 = process.seeded(seed=1, name="utilization_rate", subset=1)
+    assert subset_0.seeded(seed=1, name="utilization_rate", subset=0) is subset_0
+    assert subset_0(1, 10) != subset_1(1, 10)
+    assert subset_0(1, 10) != subset_0(2, 10)
+    assert (
+        subset_0(2, 10)
+        == create_stochastic_process_realizations(
+            "gaussian_noise_process",
+            timesteps=timesteps,
+            runs=2,
+            seed=1,
+            name="utilization_rate",
+            subset=0,
+            mu=0,
+            sigma=1,
+        )[1][10]
+    )
+
+
+def test_correlated_stochastic_processes(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEI_MODEL_CACHE_DIR", str(tmp_path))
+    correlation = [[1, 0.5, 0.8], [0.5, 1, 0.3], [0.8, 0.3, 1]]
+    kwargs = dict(mu=[0, 0, -0.5], sigma=[0.01, 0.01, 0.05], initial_price=[1, 1, 2000])
+    samples = create_stochastic_process_realizations(
+        "correlated_geometric_brownian_motion_process",
+        timesteps=timesteps,
+        runs=runs,
+        seed=1,
+        name="correlated_asset_price_processes",
+        correlation=correlation,
+        **kwargs,
+    )
+    assert samples.shape == (3, runs, timesteps + 1)
+
+    # Test log-price increments have the given correlation
+    increments = np.diff(np.log(samples), axis=-1).reshape(3, -1)
+    assert np.allclose(np.corrcoef(increments), correlation, atol=0.01)
+
+    # Test a single asset is equivalent to the Geometric Brownian Motion process
+    assert np.allclose(
+        create_stochastic_process_realizations(
+            "correlated_geometric_brownian_motion_process",
+            timesteps=timesteps,
+            runs=10,
+            seed=1,
+            name="asset",
+            mu=[0.5],
+            sigma=[0.02],
+            correlation=[[1]],
+            initial_price=[2000],
+        )[0],
+        create_stochastic_process_realizations(
+            "geometric_brownian_motion_process",
+            timesteps=timesteps,
+            runs=10,
+            seed=1,
+            name="asset",
+            mu=0.5,
+            sigma=0.02,
+            initial_price=2000,
+        ),
+    )
+
+    # Test processes stay jointly generated when seeded for each subset
+    processes = [
+        process.seeded(seed=1, name=f"asset_{i}", subset=0)
+        for i, process in enumerate(
+            correlated_stochastic_processes(timesteps=timesteps, correlation=correlation, **kwargs)
+        )
+    ]
+    assert [process(2, 10) for process in processes] == samples[:, 1, 10].tolist()
+
+
+def test_regime_switching_and_jump_diffusion_processes():
+    # Test regimes converge to the stationary distribution of the Markov chain
+    transition_matrix = [[0.95, 0.05], [0.2, 0.8]]
+    samples = create_stochastic_process_realizations(
+        "regime_switching_geometric_brownian_motion_process",
+        timesteps=timesteps,
+        runs=runs,
+        seed=1,
+        mu=[0.001, -0.01],
+        sigma=[1e-9, 1e-9],
+        transition_matrix=transition_matrix,
+        initial_price=2000,
+    )
+    assert samples.shape == (runs, timesteps + 1)
+    assert np.all(samples[:, 0] == 2000)
+    crash_regime = np.diff(np.log(samples), axis=1) < 0
+    assert abs(crash_regime[:, 20:].mean() - 0.05 / 0.25) < 0.01
+
+    # Test log returns have the moments of the compensated Merton jump-diffusion
+    kwargs = dict(mu=0.001, sigma=0.02, jump_intensity=0.05, jump_mean=-0.1, jump_sigma=0.05)
+    samples = create_stochastic_process_realizations(
+        "jump_diffusion_process", timesteps=timesteps, runs=runs, seed=1, **kwargs
+    )
+    log_returns = np.diff(np.log(samples), axis=1)
+    jump_compensation = kwargs["jump_intensity"] * (np.exp(-0.1 + 0.05**2 / 2) - 1)
+    expected_mean = 0.001 - 0.02**2 / 2 - jump_compensation + 0.05 * -0.1
+    expected_variance = 0.02**2 + 0.05 * (0.1**2 + 0.05**2)
+    assert abs(log_returns.mean() - expected_mean) < 5 * np.sqrt(
+        expected_variance / log_returns.size
+    )
+    assert np.isclose(log_returns.var(), expected_variance, rtol=0.05)
+    # Fat tails: positive excess kurtosis
+    assert ((log_returns - log_returns.mean()) ** 4).mean() / log_returns.var() ** 2 > 4
+
+
+def test_ornstein_uhlenbeck_process():
+    samples = create_stochastic_process_realizations(
+        "ornstein_uhlenbeck_process",
+        timesteps=timesteps,
+        runs=runs,
+        seed=1,
+        mu=0.7,
+        theta=0.1,
+        sigma=0.02,
+    )
+    phi = np.exp(-0.1)
+    stationary_std = 0.02 / np.sqrt(2 * 0.1)
+    assert abs(samples.mean() - 0.7) < 0.01
+    assert np.allclose(samples.std(axis=0), stationary_std, rtol=0.1)
+    deviations = samples - 0.7
+    autocorrelation = (deviations[:, 1:] * deviations[:, :-1]).mean() / deviations.var()
+    assert abs(autocorrelation - phi) < 0.02
+
+    # Test initial value and bounds
+    samples = create_stochastic_process_realizations(
+        "ornstein_uhlenbeck_process",
+        timesteps=timesteps,
+        runs=10,
+        seed=1,
+        mu=0.9,
+        theta=0.1,
+        sigma=0.1,
+        initial_value=0.5,
+        lower=0,
+        upper=1,
+    )
+    assert np.all(samples[:, 0] == 0.5)
+    assert samples.min() >= 0 and samples.max() <= 1
+
+
+def test_dirichlet_process(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEI_MODEL_CACHE_DIR", str(tmp_path))
+    alpha = [1, 2, 3, 4]
+    samples = create_stochastic_process_realizations(
+        "dirichlet_process", timesteps=timesteps, runs=runs, seed=1, alpha=alpha
+    )
+    assert samples.shape == (runs, timesteps + 1, 4)
+    assert np.allclose(samples.sum(axis=-1), 1) and samples.min() > 0
+
+    # Test moments of the Dirichlet distribution
+    alpha_0 = sum(alpha)
+    expected_mean = np.array(alpha) / alpha_0
+    expected_var = expected_mean * (1 - expected_mean) / (alpha_0 + 1)
+    assert np.allclose(samples.mean(axis=(0, 1)), expected_mean, atol=0.005)
+    assert np.allclose(samples.var(axis=(0, 1)), expected_var, rtol=0.05)
+
+    # Test the vector-valued process is keyed by (run, timestep), independently seeded per run
+    process = stochastic_process("dirichlet_process", timesteps=timesteps, alpha=alpha).seeded(
+        seed=1, name="dirichlet_process", subset=0
+    )
+    assert np.array_equal(process(3, 10), samples[2, 10])
+    assert np.array_equal(process.sample(np.array([1, 2]), 5), samples[:2, 5])
+    assert process.to_array(4, timesteps + 1).shape == (4, timesteps + 1, 4)
+    assert not np.array_equal(process(1, 10), process(2, 10))
+
+
+@pytest.mark.parametrize("method", ["moving", "stationary"])
+def test_block_bootstrap_process(tmp_path, monkeypatch, method):
+    monkeypatch.setenv("FEI_MODEL_CACHE_DIR", str(tmp_path))
+    log_returns = load_historical_log_returns("eth_usd")
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+
+    samples = create_stochastic_process_realizations(
+        "block_bootstrap_process",
+        timesteps=timesteps,
+        runs=100,
+        seed=1,
+        dataset="eth_usd",
+        method=method,
+        block_length=5,
+        initial_price=2000,
+    )
+    assert samples.shape == (100, timesteps + 1)
+    assert np.all(samples[:, 0] == 2000)
+
+    # Test each log return is resampled from the historical log returns, in blocks
+    bootstrap_log_returns = np.diff(np.log(samples), axis=1)
+    indices = np.abs(bootstrap_log_returns[..., np.newaxis] - log_returns).argmin(axis=-1)
+    assert np.allclose(log_returns[indices], bootstrap_log_returns)
+    consecutive = np.diff(indices, axis=1) == 1
+    if method == "moving":
+        assert np.all(consecutive[:, np.arange(timesteps - 1) % 5 != 4])
+    else:
+        assert abs(consecutive.mean() - (1 - 1 / 5)) < 0.05
+
+
+def test_variance_reduction_sampling():
+    kwargs = dict(timesteps=timesteps, mu=0, sigma=0.02, initial_price=2000)
+
+    # Test antithetic pairs of runs have negated Brownian motion increments
+    samples = create_stochastic_process_realizations(
+        "geometric_brownian_motion_process", runs=4, seed=1, sampling="antithetic", **kwargs
+    )
+    increments = np.diff(np.log(samples), axis=1)
+    line = np.diff(-(0.02**2) / 2 * np.arange(timesteps + 1) / (timesteps + 1))
+    assert np.allclose(increments[1] - line, -(increments[0] - line))
+    assert not np.allclose(increments[2] - line, -(increments[1] - line))
+
+    # Test the variance of the mean estimate of each sampling method, across seeds
+    def estimate_variance(sampling):
+        estimates = [
+            create_stochastic_process_realizations(
+                "geometric_brownian_motion_process", runs=64, seed=seed, sampling=sampling, **kwargs
+            )[:, -1].mean()
+            for seed in range(1, 41)
+        ]
+        return np.var(estimates)
+
+    monte_carlo_variance = estimate_variance("monte_carlo")
+    assert estimate_variance("antithetic") < monte_carlo_variance / 4
+    assert estimate_variance("sobol") < monte_carlo_variance / 4
+
+    # Test sampling method is set when seeding a process
+    process = stochastic_process("gaussian_noise_process", timesteps=timesteps, mu=0, sigma=1)
+    assert process.seeded(seed=1, name="process", subset=0).parameters.get("sampling") is None
+    antithetic_process = process.seeded(seed=1, name="process", subset=0, sampling="antithetic")
+    assert antithetic_process.parameters["sampling"] == "antithetic"
+
+
+def test_importance_sampling(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEI_MODEL_CACHE_DIR", str(tmp_path))
+    kwargs = dict(timesteps=timesteps, mu=0, sigma=1, initial_price=1)
+    # Probability of 1e-4 of the final value falling below the threshold
+    threshold = -3.719 * np.sqrt(timesteps)
+    tilt = -3.719 / np.sqrt(timesteps)
+
+    samples = create_stochastic_process_realizations(
+        "brownian_motion_process", runs=runs, seed=1, tilt=tilt, **kwargs
+    )
+    weights = create_likelihood_ratio_weights(
+        "brownian_motion_process", runs=runs, seed=1, tilt=tilt, **kwargs
+    )
+    assert weights.shape == (runs,)
+
+    # Test weighted estimates are unbiased under the untilted distribution
+    assert abs(weights.mean() - 1) < 5 * weights.std() / np.sqrt(runs)
+    events = weights * (samples[:, -1] - samples[:, 0] < threshold)
+    assert abs(events.mean() - 1e-4) < 5 * events.std() / np.sqrt(runs)
+    assert events.std() / np.sqrt(runs) < 1e-5
+
+    # Test likelihood ratio weights of a seeded process
+    process = stochastic_process("brownian_motion_process", **kwargs)
+    process = process.seeded(seed=1, name="brownian_motion_process", subset=0, tilt=tilt)
+    assert np.isclose(process.likelihood_ratio_weight(3), weights[2])
+    assert process(3, timesteps) == samples[2][timesteps]
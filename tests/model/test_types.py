@@ -1,5 +1,14 @@
 import pytest
-from model.types import PCVDeposit
+import pickle
+import numpy as np
+from dataclasses import FrozenInstanceError
+from model.types import (
+    PCVDeposit,
+    DepositLedger,
+    RingBuffer,
+    RollingRegressionBuffer,
+    RollingStatisticsBuffer,
+)
 
 
 initial_balance = 100
@@ -55,3 +64,179 @@ def test_deposit_addition(deposit_A, deposit_B):
 
     assert deposit_C.balance == deposit_A.balance + deposit_B.balance
     assert deposit_C.asset_value == deposit_A.asset_value + deposit_B.asset_value
+
+
+def test_frozen_deposit_transfer(deposit_A, deposit_B):
+    frozen_A = deposit_A.freeze()
+    frozen_B = deposit_B.freeze()
+    assert frozen_A.key == deposit_A.key
+
+    # Test FrozenDeposit transfer() method matches Deposit transfer() method, without mutating the original instances
+    updated_A, updated_B = frozen_A.transfer(frozen_B, frozen_A.balance)
+    deposit_A.transfer(deposit_B, deposit_A.balance)
+
+    assert updated_A == deposit_A.freeze()
+    assert updated_B == deposit_B.freeze()
+    assert frozen_A.balance == initial_balance
+    assert frozen_B.balance == initial_balance
+
+    with pytest.raises(FrozenInstanceError):
+        frozen_A.yield_rate = 0.1
+
+    # Test FrozenDeposit is preserved through pickling, as used by radCAD
+    assert pickle.loads(pickle.dumps(updated_B, -1)) == updated_B
+
+
+@pytest.fixture
+def deposit_ledger(deposit_A, deposit_B):
+    return DepositLedger({"fei_A_pcv_deposit": deposit_A, "fei_B_pcv_deposit": deposit_B})
+
+
+def test_deposit_ledger_view_transfer(deposit_A, deposit_B, deposit_ledger):
+    view_A = deposit_ledger["fei_A_pcv_deposit"]
+    view_B = deposit_ledger["fei_B_pcv_deposit"]
+    assert view_A.key == deposit_A.key
+
+    # Test DepositView transfer() method matches Deposit transfer() method
+    view_A.transfer(view_B, view_A.balance)
+    deposit_A.transfer(deposit_B, deposit_A.balance)
+
+    for field in DepositLedger.fields:
+        assert np.isclose(getattr(view_A, field), getattr(deposit_A, field), equal_nan=True)
+        assert np.isclose(getattr(view_B, field), getattr(deposit_B, field), equal_nan=True)
+
+    with pytest.raises(Exception) as e_info:
+        view_A.transfer(view_B, 100)
+    assert str(e_info.value) == "Amount must be less than balance"
+
+
+def test_deposit_ledger_copy(deposit_ledger):
+    deposit_ledger_copy = deposit_ledger.copy()
+    deposit_ledger_copy["fei_A_pcv_deposit"].withdraw(initial_balance, initial_asset_price)
+
+    assert deposit_ledger_copy["fei_A_pcv_deposit"].balance == 0
+    assert deposit_ledger["fei_A_pcv_deposit"].balance == initial_balance
+
+
+def test_deposit_ledger_batched_accrue_yield(deposit_ledger):
+    runs = 3
+    deposit_ledger = DepositLedger.stack([deposit_ledger] * runs)
+    keys = ["fei_A_pcv_deposit", "fei_B_pcv_deposit"]
+    deposit_ledger["fei_A_pcv_deposit"].yield_rate = np.array([0.0, 0.1, 0.2])
+
+    yield_accrued = deposit_ledger.accrue_yield(
+        keys, period_in_days=365, asset_prices=np.full((len(keys), runs), initial_asset_price)
+    )
+
+    assert yield_accrued.shape == (len(keys), runs)
+    assert np.allclose(yield_accrued[0], initial_balance * np.array([0.0, 0.1, 0.2]))
+    assert np.allclose(deposit_ledger.sum(keys, "yield_accrued"), yield_accrued.sum(axis=0))
+
+    # Test DepositView where mask
+    deposit_ledger["fei_A_pcv_deposit"].transfer_yield(
+        to=deposit_ledger["fei_B_pcv_deposit"],
+        amount=deposit_ledger["fei_A_pcv_deposit"].yield_accrued,
+        asset_price=initial_asset_price,
+        where=np.array([False, False, True]),
+    )
+    assert np.allclose(
+        deposit_ledger["fei_B_pcv_deposit"].balance, initial_balance + np.array([0.0, 0.0, 20.0])
+    )
+
+
+def test_ring_buffer():
+    ring_buffer = RingBuffer(window=3)
+    assert len(ring_buffer) == 0
+
+    for value in range(5):
+        updated_ring_buffer = ring_buffer.append(value)
+        # Test RingBuffer is not updated in place
+        assert len(ring_buffer) == min(value, 3)
+        ring_buffer = updated_ring_buffer
+
+    assert np.array_equal(ring_buffer.to_array(), [2, 3, 4])
+    assert np.array_equal(RingBuffer(window=3).append([1, 2]).to_array(), [[1, 2]])
+    assert pickle.loads(pickle.dumps(ring_buffer, -1)) == ring_buffer
+
+    # Test appending to an older RingBuffer does not update more recent buffers
+    older_ring_buffer = ring_buffer
+    ring_buffer = ring_buffer.append(5)
+    assert np.array_equal(older_ring_buffer.append(6).to_array(), [3, 4, 6])
+    assert np.array_equal(ring_buffer.append(7).to_array(), [4, 5, 7])
+
+
+@pytest.mark.parametrize("history", [RingBuffer, RollingRegressionBuffer, RollingStatisticsBuffer])
+def test_ring_buffer_append_cost(history):
+    # Test values are appended in place, and copied to a new log at most once every `window` appends,
+    # so that the number of values copied per append is independent of the window length
+    appends = 1_000
+    for window in [3, 30, 90]:
+        ring_buffer = history(window=window)
+        logs = {}
+        for value in range(appends):
+            ring_buffer = ring_buffer.append(value)
+            logs[id(ring_buffer.log)] = ring_buffer.log
+        values_copied = len(logs) * (window - 1)
+        assert values_copied <= appends
+
+
+def test_rolling_regression_buffer_slope():
+    window = 14
+    rng = np.random.default_rng(1)
+    prices = 2_000 * np.exp(np.cumsum(rng.normal(0, 0.02, 1_000)))
+
+    rolling_regression_buffer = RollingRegressionBuffer(window=window)
+    for price in prices:
+        rolling_regression_buffer = rolling_regression_buffer.append(price)
+        values = rolling_regression_buffer.to_array()
+
+        # Test slope with rolling sufficient statistics matches Numpy polyfit
+        if len(values) > 2:
+            assert np.isclose(
+                rolling_regression_buffer.slope(),
+                np.polyfit(range(len(values)), values, 1)[0],
+            )
+            assert np.isclose(
+                rolling_regression_buffer.slope(exclude_latest=True),
+                np.polyfit(range(len(values) - 1), values[:-1], 1)[0],
+            )
+
+
+def test_rolling_statistics_buffer():
+    window = 30
+    rng = np.random.default_rng(1)
+    yield_rates = rng.uniform(0, 0.2, (200, 4))
+
+    rolling_statistics_buffer = RollingStatisticsBuffer(window=window)
+    for yield_rate in yield_rates:
+        rolling_statistics_buffer = rolling_statistics_buffer.append(yield_rate)
+        values = rolling_statistics_buffer.to_array()
+
+        # Test windowed Welford statistics match Numpy
+        assert np.allclose(rolling_statistics_buffer.mean, np.mean(values, axis=0))
+        assert np.allclose(rolling_statistics_buffer.sum(), np.sum(values, axis=0))
+        assert np.allclose(rolling_statistics_buffer.std(), np.std(values, axis=0))
+
+
+@pytest.mark.parametrize("history", [RingBuffer, RollingRegressionBuffer, RollingStatisticsBuffer])
+def test_ring_buffer_select(history):
+    rng = np.random.default_rng(1)
+    values = rng.uniform(0, 1, (50, 4))
+
+    buffer = history(window=30)
+    for value in values:
+        buffer = buffer.append(value)
+    selected_buffer = buffer.select(np.array([1, 3]))
+    selected_buffer_reference = history(window=30)
+    for value in values[:, [1, 3]]:
+        selected_buffer_reference = selected_buffer_reference.append(value)
+
+    # Test the selected runs match a buffer of the selected runs alone, and are independent of the original buffer
+    assert selected_buffer == selected_buffer_reference
+    for field in history._fields[len(RingBuffer._fields) :]:
+        assert np.allclose(
+            getattr(selected_buffer, field), getattr(selected_buffer_reference, field)
+        )
+    selected_buffer = selected_buffer.append(np.zeros(2))
+    assert np.array_equal(buffer.to_array(), values[-30:])
+    assert np.array_equal(selected_buffer.to_array()[-1], np.zeros(2))